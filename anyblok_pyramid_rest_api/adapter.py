@@ -10,12 +10,18 @@
 # v. 2.0. If a copy of the MPL was not distributed with this file,You can
 # obtain one at http://mozilla.org/MPL/2.0/.
 from logging import getLogger
+from types import MappingProxyType
 
 logger = getLogger(__name__)
 
 
+EMPTY = MappingProxyType({})
+
+
 class Adapter:
 
+    DECORATORS = {}
+
     def __init__(self, registry, Model):
         self.registry = registry
         self.Model = Model
@@ -24,43 +30,118 @@ class Adapter:
         self.orders_by = {}
         self._tags = {}
         self.grouped_tags = {}
+        self.operators = {}
+        self.methods = {}
 
-    def load_decorators(self):
-        for attr, value in self.__class__.__dict__.items():
+    @classmethod
+    def get_decorators(cls):
+        """Return the tables of the decorated methods of the adapter class
+
+        The tables are built once by adapter class, from the methods of
+        the class and of its bases, and they are read only
+
+        :rtype: dict {name of the table: mapping}
+        """
+        decorators = Adapter.DECORATORS.get(cls)
+        if decorators is None:
+            decorators = Adapter.DECORATORS[cls] = cls.build_decorators()
+
+        return decorators
+
+    @classmethod
+    def build_decorators(cls):
+        # the bases first, the decorators of the subclasses win; a method
+        # overloaded without decorator keeps the one of its base
+        attributes = [
+            item for klass in reversed(cls.__mro__)
+            for item in klass.__dict__.items()]
+
+        filters = {}
+        orders_by = {}
+        tags = {}
+        grouped_tags = {}
+        operators = {}
+        methods = set()
+        for attr, value in attributes:
             if hasattr(value, 'is_filter'):
-                key, operators = value.is_filter
-                self.filters[key] = {operator: attr for operator in operators}
+                key, _operators = value.is_filter
+                filters.setdefault(key, {}).update(
+                    {operator: attr for operator in _operators})
             elif hasattr(value, 'is_order_by'):
-                self.orders_by[value.is_order_by] = attr
+                orders_by[value.is_order_by] = attr
             elif hasattr(value, 'is_tag'):
-                self._tags[value.is_tag] = attr
+                tags[value.is_tag] = attr
             elif hasattr(value, 'is_tags'):
                 for tag in value.is_tags:
-                    self.grouped_tags[tag] = attr
+                    grouped_tags[tag] = attr
+            elif hasattr(value, 'is_operator'):
+                name, kind = value.is_operator
+                operators[name] = (kind, attr)
+            else:
+                continue
+
+            methods.add(attr)
+
+        return {
+            'filters': MappingProxyType({
+                key: MappingProxyType(value)
+                for key, value in filters.items()}),
+            'orders_by': MappingProxyType(orders_by),
+            'tags': MappingProxyType(tags),
+            'grouped_tags': MappingProxyType(grouped_tags),
+            'operators': MappingProxyType(operators),
+            'methods': frozenset(methods),
+        }
+
+    def load_decorators(self):
+        decorators = self.get_decorators()
+        self.filters = decorators['filters']
+        self.orders_by = decorators['orders_by']
+        self._tags = decorators['tags']
+        self.grouped_tags = decorators['grouped_tags']
+        self.operators = decorators['operators']
+        # the methods are bound once, the adapter is shared by the requests
+        self.methods = {
+            attr: getattr(self, attr) for attr in decorators['methods']}
+        self.loaded = True
+
+    def get_method(self, attr):
+        method = self.methods.get(attr)
+        if method is None:
+            method = getattr(self, attr)
+
+        return method
 
     def has_filter_for(self, key, operator):
-        return True if self.filters.get(key, {}).get(operator) else False
+        return operator in self.filters.get(key, EMPTY)
 
     def get_filter_for(self, key, operator):
-        return getattr(self, self.filters[key][operator])
+        return self.get_method(self.filters[key][operator])
 
     def has_order_by_for(self, key):
-        return True if self.orders_by.get(key) else False
+        return key in self.orders_by
 
     def get_order_by_for(self, key):
-        return getattr(self, self.orders_by[key])
+        return self.get_method(self.orders_by[key])
 
     def has_tag_for(self, tag):
-        return True if self._tags.get(tag) else False
+        return tag in self._tags
 
     def has_grouped_tag_for(self, tag):
-        return True if self.grouped_tags.get(tag) else False
+        return tag in self.grouped_tags
 
     def get_tag_for(self, tag):
-        return getattr(self, self._tags[tag])
+        return self.get_method(self._tags[tag])
 
     def get_grouped_tag_for(self, group):
-        return getattr(self, group)
+        return self.get_method(group)
+
+    def has_operator_for(self, name):
+        return name in self.operators
+
+    def get_operator_for(self, name):
+        kind, attr = self.operators[name]
+        return kind, self.get_method(attr)
 
     @classmethod
     def filter(cls, key, operators):
@@ -96,3 +177,23 @@ class Adapter:
             return method
 
         return wrapper
+
+    @classmethod
+    def operator(cls, name, kind='value'):
+        """Add an operator for all the filters of the model
+
+        ::
+
+            @Adapter.operator('contains', kind='pattern')
+            def contains_operator(self, column, value):
+                return column.contains(value, autoescape=True)
+
+        :param name: name of the operator, ``filter[key][name]=value``
+        :param kind: how the value is prepared: ``value``, ``pattern``,
+                     ``values`` or ``boolean``
+        """
+        def wrapper(method):
+            method.is_operator = (name, kind)
+            return method
+
+        return wrapper
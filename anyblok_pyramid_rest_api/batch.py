@@ -0,0 +1,228 @@
+# This file is a part of the AnyBlok / Pyramid / REST api project
+#
+# This Source Code Form is subject to the terms of the Mozilla Public License,
+# v. 2.0. If a copy of the MPL was not distributed with this file,You can
+# obtain one at http://mozilla.org/MPL/2.0/.
+"""Batch service: several REST operations in one HTTP request
+
+The service is added by the pyramid setting ``rest_api.batch = true``, or
+by ``config.include('anyblok_pyramid_rest_api.batch')``. The body is the
+ordered list of the operations::
+
+    POST /batch
+    [
+        {"method": "POST", "path": "/customers", "body": [{"name": "bob"}]},
+        {"method": "GET", "path": "/customers?filter[name][eq]=bob"},
+        {"method": "DELETE", "path": "/customers/1", "savepoint": true}
+    ]
+
+The operations are executed by sub requests on the views of the resources,
+in the transaction of the batch request, and the response is the ordered
+list of their results ``{"status": ..., "body": ...}``.
+
+When an operation fails, its changes and the changes of the previous
+operations are rolled back, the next operations are not executed (status
+424) and the status of the batch is 400. An operation with a savepoint only
+rolls back its own changes, the batch goes on.
+
+The finished callbacks of the operations, like the invalidation of the
+response caches, are called once the batch request is finished.
+
+Settings:
+
+* ``rest_api.batch.path``: path of the service, default ``/batch``
+* ``rest_api.batch.max_operations``: default ``100``
+* ``rest_api.batch.savepoints``: savepoint by default for the operations,
+  default ``false``
+"""
+from cornice import Service
+from marshmallow import Schema, ValidationError, fields, validate
+from pyramid.httpexceptions import HTTPException, HTTPInternalServerError
+from pyramid.request import Request
+from pyramid.settings import asbool
+from logging import getLogger
+import json
+
+logger = getLogger(__name__)
+
+BATCH_METHODS = ('GET', 'POST', 'PUT', 'PATCH', 'DELETE')
+# the headers of the batch request which are not given to the operations
+SKIPPED_HEADERS = ('Content-Length', 'Content-Type')
+
+
+class BatchOperationSchema(Schema):
+    method = fields.String(
+        required=True, validate=validate.OneOf(BATCH_METHODS))
+    path = fields.String(required=True, validate=validate.Regexp('/'))
+    body = fields.Raw(allow_none=True)
+    savepoint = fields.Boolean(allow_none=True)
+
+
+def get_batch_settings(request):
+    settings = request.registry.settings
+    return dict(
+        path=settings.get('rest_api.batch.path', '/batch'),
+        max_operations=int(
+            settings.get('rest_api.batch.max_operations', 100)),
+        savepoints=asbool(settings.get('rest_api.batch.savepoints', False)),
+    )
+
+
+def batch_validator(request, **kwargs):
+    settings = get_batch_settings(request)
+    try:
+        operations = BatchOperationSchema(many=True).load(request.json_body)
+    except ValueError:
+        request.errors.add('body', 'Validation error for body',
+                           'The body is not a valid JSON')
+        return
+    except ValidationError as err:
+        request.errors.add('body', 'Validation error for body', err.messages)
+        return
+
+    if len(operations) > settings['max_operations']:
+        request.errors.add(
+            'body', 'Validation error for body',
+            'The batch is limited to %d operations' % (
+                settings['max_operations']))
+        return
+
+    for operation in operations:
+        if operation['path'].split('?')[0] == settings['path']:
+            request.errors.add('body', 'Validation error for body',
+                               'A batch can not be executed in a batch')
+            return
+
+        operation.setdefault('body', None)
+        if operation.get('savepoint') is None:
+            operation['savepoint'] = settings['savepoints']
+
+    request.validated['body'] = operations
+
+
+def get_subrequest(request, operation):
+    """Return the sub request of the operation, with the headers of the
+    batch request to keep the authentication
+
+    :param request: Pyramid request of the batch
+    :param operation: dict {method, path, body, savepoint}
+    """
+    headers = {key: value for key, value in request.headers.items()
+               if key not in SKIPPED_HEADERS}
+    subrequest = Request.blank(
+        operation['path'], base_url=request.application_url,
+        headers=headers, method=operation['method'])
+    if operation['body'] is not None:
+        subrequest.content_type = 'application/json'
+        subrequest.body = json.dumps(operation['body']).encode('utf-8')
+
+    return subrequest
+
+
+def defer_finished_callbacks(request, subrequest):
+    """Give the finished callbacks of the sub request to the batch request
+
+    The callbacks of the sub request (ex: the invalidation of the response
+    caches) are called when the batch request is finished, once its
+    transaction is committed or aborted, not at the end of the operation
+
+    :param request: Pyramid request of the batch
+    :param subrequest: Pyramid request of the operation
+    """
+    def add_finished_callback(callback):
+        request.add_finished_callback(lambda request: callback(subrequest))
+
+    subrequest.add_finished_callback = add_finished_callback
+
+
+def get_result(response):
+    """Return the result of an operation from its response
+
+    :rtype: dict {status, body}
+    """
+    body = None
+    if isinstance(response, HTTPException) and not response.body:
+        body = {'message': response.detail or response.title}
+    elif response.body:
+        if response.content_type == 'application/json':
+            body = response.json_body
+        else:
+            body = response.text
+
+    return {'status': response.status_int, 'body': body}
+
+
+def execute_operation(request, operation):
+    """Execute the operation by a sub request on the views of the resources
+
+    :param request: Pyramid request of the batch
+    :param operation: dict {method, path, body, savepoint}
+    :rtype: dict {status, body}
+    """
+    savepoint = None
+    if operation['savepoint']:
+        savepoint = request.anyblok.registry.begin_nested()
+
+    subrequest = get_subrequest(request, operation)
+    # the errors of the views only roll back the savepoint of the operation
+    subrequest.rest_api_savepoint = savepoint
+    # the models written by an operation are not read from the response
+    # caches by the next operations, they are invalidated once
+    namespaces = getattr(request, 'rest_api_invalidated_namespaces', None)
+    if namespaces is None:
+        namespaces = request.rest_api_invalidated_namespaces = set()
+
+    subrequest.rest_api_invalidated_namespaces = namespaces
+    defer_finished_callbacks(request, subrequest)
+    try:
+        response = request.invoke_subrequest(subrequest, use_tweens=False)
+    except HTTPException as e:
+        response = e
+    except Exception:
+        if savepoint is None:
+            raise
+
+        logger.exception('Batch operation %s %s failed',
+                         operation['method'], operation['path'])
+        response = HTTPInternalServerError()
+
+    if savepoint is not None and savepoint.is_active:
+        if response.status_int >= 400:
+            savepoint.rollback()
+        else:
+            savepoint.commit()
+
+    return get_result(response)
+
+
+def batch_view(request):
+    results = []
+    failed = False
+    for operation in request.validated['body']:
+        if failed:
+            results.append({'status': 424, 'body': None})
+            continue
+
+        result = execute_operation(request, operation)
+        results.append(result)
+        if result['status'] >= 400 and not operation['savepoint']:
+            failed = True
+
+    if failed:
+        logger.debug('Batch operation failed: rollback the registry')
+        request.anyblok.registry.rollback()
+        request.response.status_int = 400
+
+    return results
+
+
+def includeme(config):
+    """Add the batch service in the pyramid configuration
+
+    :param config: Pyramid configurator instance
+    """
+    path = config.get_settings().get('rest_api.batch.path', '/batch')
+    batch = Service(name='rest_api_batch', path=path,
+                    description='Execute several operations')
+    batch.add_view('POST', batch_view, validators=(batch_validator,))
+    config.add_cornice_service(batch)
@@ -0,0 +1,36 @@
+# This file is a part of the AnyBlok / Pyramid / REST api project
+#
+# This Source Code Form is subject to the terms of the Mozilla Public License,
+# v. 2.0. If a copy of the MPL was not distributed with this file,You can
+# obtain one at http://mozilla.org/MPL/2.0/.
+from anyblok.blok import Blok
+
+
+def declarations(reload=None):
+    from . import job
+    if reload:
+        reload(job)
+
+
+class RestApiJob(Blok):
+    """Jobs of the asynchronous actions of the CrudResource::
+
+        @CrudResource.service('compute', async_=True)
+        def compute(self):
+            ...
+
+    """
+    version = '0.1.0'
+    required = ['anyblok-core']
+
+    @classmethod
+    def import_declaration_module(cls):
+        declarations()
+
+    @classmethod
+    def reload_declaration_module(cls, reload):
+        declarations(reload=reload)
+
+    @classmethod
+    def pyramid_load_config(cls, config):
+        config.include('anyblok_pyramid_rest_api.job')
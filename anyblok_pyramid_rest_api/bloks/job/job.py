@@ -0,0 +1,91 @@
+# This file is a part of the AnyBlok / Pyramid / REST api project
+#
+# This Source Code Form is subject to the terms of the Mozilla Public License,
+# v. 2.0. If a copy of the MPL was not distributed with this file,You can
+# obtain one at http://mozilla.org/MPL/2.0/.
+from uuid import uuid4
+from datetime import datetime, timedelta
+from anyblok import Declarations
+from anyblok.column import (
+    UUID, String, Text, Json, Selection, DateTime)
+
+
+JOB_STATUSES = [
+    ('pending', 'Pending'),
+    ('running', 'Running'),
+    ('done', 'Done'),
+    ('failed', 'Failed'),
+]
+
+
+@Declarations.register(Declarations.Model)
+class RestApi:
+    pass
+
+
+@Declarations.register(Declarations.Model.RestApi)
+class Job:
+    """Call of an asynchronous action of a CrudResource
+
+    The call is kept with the path and the body of the request, the job
+    runner executes it and saves its result
+    """
+
+    uuid = UUID(primary_key=True, default=uuid4, binary=False)
+    resource = String(size=256, nullable=False)
+    action = String(size=256, nullable=False)
+    userid = String(size=256)
+    path = Json()
+    body = Json()
+    status = Selection(selections=JOB_STATUSES, default='pending',
+                       nullable=False)
+    result = Json()
+    error = Text()
+    create_date = DateTime(default=datetime.now, nullable=False)
+    edit_date = DateTime(default=datetime.now, nullable=False,
+                         auto_update=True)
+
+    @classmethod
+    def submit(cls, job_uuid, runner):
+        """Give the job to the job runner, called after the commit of the
+        request which saved it
+
+        :param job_uuid: uuid of the job
+        :param runner: job runner of the process
+        """
+        runner.submit(cls.registry, job_uuid)
+
+    @classmethod
+    def fail_stale_jobs(cls, stale_timeout):
+        """Mark as failed the jobs still pending or running, not changed
+        since ``stale_timeout`` seconds: their process stopped before the
+        end of the action
+
+        :param stale_timeout: number of seconds
+        :rtype: number of failed jobs
+        """
+        before = datetime.now() - timedelta(seconds=stale_timeout)
+        return cls.query().filter(
+            cls.status.in_(['pending', 'running']),
+            cls.edit_date <= before,
+        ).update(dict(status='failed', error='The job was interrupted',
+                      edit_date=datetime.now()),
+                 synchronize_session=False)
+
+    def to_dict(self):
+        """Return the status of the job, with its result when it is done
+
+        :rtype: dict
+        """
+        res = dict(
+            id=str(self.uuid),
+            status=self.status,
+            create_date=self.create_date.isoformat(),
+            edit_date=self.edit_date.isoformat(),
+        )
+        if self.status == 'done':
+            res['result'] = self.result
+        elif self.status == 'failed':
+            res['error'] = self.error
+
+        return res
@@ -0,0 +1,372 @@
+# This file is a part of the AnyBlok / Pyramid / REST api project
+#
+# This Source Code Form is subject to the terms of the Mozilla Public License,
+# v. 2.0. If a copy of the MPL was not distributed with this file,You can
+# obtain one at http://mozilla.org/MPL/2.0/.
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from threading import RLock
+from time import monotonic, time
+from hashlib import sha1
+from uuid import uuid4
+import os
+import pickle
+
+
+class RegistryCache:
+    """Values cached by AnyBlok registry
+
+    The values of a registry are forgotten when this registry is reloaded:
+    AnyBlok builds a new declarative base each time the registry is loaded,
+    it is used as the generation of the cached values
+
+    ::
+
+        CACHE = RegistryCache()
+
+        values = CACHE.get_cache(registry)
+        if key not in values:
+            values[key] = compute(...)
+
+    """
+
+    def __init__(self):
+        self.caches = {}
+        self.lock = RLock()
+
+    @staticmethod
+    def get_generation(registry):
+        return getattr(registry, 'declarativebase', None)
+
+    def get_cache(self, registry):
+        """Return the dict of the cached values for the registry
+
+        :param registry: AnyBlok registry
+        :rtype: dict
+        """
+        generation = self.get_generation(registry)
+        cache = self.caches.get(registry)
+        if cache is None or cache[0] is not generation:
+            with self.lock:
+                cache = self.caches.get(registry)
+                if cache is None or cache[0] is not generation:
+                    cache = self.caches[registry] = (generation, {})
+
+        return cache[1]
+
+    def clear(self, registry=None):
+        """Forget the cached values
+
+        :param registry: AnyBlok registry, if None all the registries are
+                         cleared
+        """
+        with self.lock:
+            if registry is None:
+                self.caches.clear()
+            else:
+                self.caches.pop(registry, None)
+
+
+class LRUCache:
+    """Bounded cache, the least recently used entries are dropped when the
+    size is reached
+
+    :param size: max number of entries
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self.entries = OrderedDict()
+        self.lock = RLock()
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, key, default=None):
+        with self.lock:
+            if key not in self.entries:
+                return default
+
+            self.entries.move_to_end(key)
+            return self.entries[key]
+
+    def set(self, key, value):
+        with self.lock:
+            self.entries[key] = value
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.size:
+                self.entries.popitem(last=False)
+
+    def pop(self, key, default=None):
+        with self.lock:
+            return self.entries.pop(key, default)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+class TTLCache(LRUCache):
+    """Bounded cache whose entries expire after a timeout
+
+    :param size: max number of entries
+    :param timeout: default lifetime of the entries, in seconds
+    """
+
+    def __init__(self, size, timeout=60):
+        super(TTLCache, self).__init__(size)
+        self.timeout = timeout
+
+    def __contains__(self, key):
+        return self.get(key, self) is not self
+
+    def get(self, key, default=None):
+        with self.lock:
+            entry = super(TTLCache, self).get(key)
+            if entry is None:
+                return default
+
+            expire_at, value = entry
+            if expire_at <= monotonic():
+                self.entries.pop(key, None)
+                return default
+
+            return value
+
+    def set(self, key, value, timeout=None):
+        if timeout is None:
+            timeout = self.timeout
+
+        super(TTLCache, self).set(key, (monotonic() + timeout, value))
+
+    def pop(self, key, default=None):
+        entry = super(TTLCache, self).pop(key)
+        return default if entry is None else entry[1]
+
+    def invalidate(self, predicate):
+        """Drop the entries whose key matches the predicate
+
+        :param predicate: callable which takes the key and returns a bool
+        """
+        with self.lock:
+            for key in [x for x in self.entries if predicate(x)]:
+                del self.entries[key]
+
+
+class ResponseCache(ABC):
+    """Interface of the backends of the response cache of the CrudResource
+
+    The cached responses are invalidated by version: the version of the
+    namespace (the model) is a part of the key of the responses, a new
+    version is given at each write and the values of the namespace are
+    dropped
+    """
+
+    @abstractmethod
+    def get(self, key):
+        """Return the cached value or None
+
+        :param key: tuple of str, int and tuple, the first item is the
+                    namespace
+        """
+
+    @abstractmethod
+    def set(self, key, value, timeout):
+        """Cache the value for ``timeout`` seconds"""
+
+    @abstractmethod
+    def get_version(self, namespace):
+        """Return the current version of the namespace"""
+
+    @abstractmethod
+    def bump_version(self, namespace):
+        """Give a new version to the namespace, the values cached with the
+        previous version are dropped
+        """
+
+    @abstractmethod
+    def clear(self):
+        """Forget all the values and the versions"""
+
+
+class MemoryResponseCache(ResponseCache):
+    """Response cache in the memory of the process, bounded by an LRU
+
+    :param size: max number of responses
+    """
+
+    def __init__(self, size=1024):
+        self.entries = TTLCache(size)
+        self.versions = {}
+        self.lock = RLock()
+
+    def get(self, key):
+        return self.entries.get(key)
+
+    def set(self, key, value, timeout):
+        self.entries.set(key, value, timeout=timeout)
+
+    def get_version(self, namespace):
+        return self.versions.get(namespace, 0)
+
+    def bump_version(self, namespace):
+        with self.lock:
+            self.versions[namespace] = self.versions.get(namespace, 0) + 1
+            self.entries.invalidate(lambda key: key[0] == namespace)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.versions.clear()
+
+
+class FileResponseCache(ResponseCache):
+    """Response cache in a local directory, shared by the workers of the
+    host
+
+    The values are pickled, one file by value, the directory must only be
+    writable by the application. The values of a namespace are in their own
+    sub directory, removed when the version of the namespace is bumped. The
+    modification time of a file is the expiration of its value, the expired
+    values are removed by a sweep, done at most every ``sweep_interval``
+    seconds when a value is cached, which also keeps at most ``max_files``
+    values
+
+    :param directory: path of the directory, created if it does not exist
+    :param max_files: max number of cached values
+    :param sweep_interval: min duration between two sweeps, in seconds
+    """
+
+    def __init__(self, directory, max_files=10000, sweep_interval=60):
+        self.directory = directory
+        self.max_files = max_files
+        self.sweep_interval = sweep_interval
+        self.next_sweep = monotonic() + sweep_interval
+        self.lock = RLock()
+        os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def get_digest(key):
+        return sha1(repr(key).encode('utf-8')).hexdigest()
+
+    def get_path(self, prefix, key):
+        return os.path.join(self.directory, prefix + self.get_digest(key))
+
+    def get_value_path(self, key):
+        return os.path.join(
+            self.get_path('values-', key[0]), self.get_digest(key))
+
+    def remove(self, path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def read(self, path):
+        try:
+            with open(path, 'rb') as f:
+                return pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return None
+
+    def write(self, path, value, expire_at=None):
+        tmp_path = '%s.%s.tmp' % (path, uuid4().hex)
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+        if expire_at is not None:
+            os.utime(tmp_path, (expire_at, expire_at))
+
+        os.replace(tmp_path, path)
+
+    def get(self, key):
+        path = self.get_value_path(key)
+        entry = self.read(path)
+        if entry is None:
+            return None
+
+        expire_at, value = entry
+        if expire_at <= time():
+            self.remove(path)
+            return None
+
+        return value
+
+    def set(self, key, value, timeout):
+        path = self.get_value_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        expire_at = time() + timeout
+        self.write(path, (expire_at, value), expire_at=expire_at)
+        if monotonic() >= self.next_sweep:
+            self.sweep()
+
+    def get_version(self, namespace):
+        return self.read(self.get_path('version-', namespace)) or ''
+
+    def bump_version(self, namespace):
+        # a random version, the workers may bump it at the same time
+        self.write(self.get_path('version-', namespace), uuid4().hex)
+        self.remove_files(self.get_path('values-', namespace))
+
+    def remove_files(self, directory):
+        try:
+            names = os.listdir(directory)
+        except OSError:
+            return
+
+        for name in names:
+            self.remove(os.path.join(directory, name))
+
+    def get_value_files(self):
+        """Return the files of the values
+
+        :rtype: list of (expiration, path)
+        """
+        files = []
+        for directory in os.scandir(self.directory):
+            if not directory.name.startswith('values-'):
+                continue
+
+            try:
+                for entry in os.scandir(directory.path):
+                    if entry.name.endswith('.tmp'):
+                        # being written
+                        continue
+
+                    try:
+                        files.append((entry.stat().st_mtime, entry.path))
+                    except OSError:
+                        pass
+            except OSError:
+                pass
+
+        return files
+
+    def sweep(self):
+        """Remove the expired values, then the values which expire first
+        while there are more than ``max_files`` values
+        """
+        with self.lock:
+            self.next_sweep = monotonic() + self.sweep_interval
+            now = time()
+            files = []
+            for expire_at, path in self.get_value_files():
+                if expire_at <= now:
+                    self.remove(path)
+                else:
+                    files.append((expire_at, path))
+
+            if len(files) > self.max_files:
+                files.sort()
+                for expire_at, path in files[:len(files) - self.max_files]:
+                    self.remove(path)
+
+    def clear(self):
+        for entry in os.scandir(self.directory):
+            if entry.name.startswith('values-'):
+                self.remove_files(entry.path)
+            elif entry.name.startswith('version-'):
+                self.remove(entry.path)
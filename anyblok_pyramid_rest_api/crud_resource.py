@@ -12,22 +12,69 @@
 from anyblok_marshmallow import SchemaWrapper
 from cornice.resource import view as cornice_view, add_resource, add_view
 from cornice import Service
+from cornice.validators import extract_cstruct
 from pyramid.security import Deny, Allow, Everyone, ALL_PERMISSIONS
-from pyramid.httpexceptions import HTTPUnauthorized, HTTPNotFound
-from anyblok_pyramid_rest_api.querystring import QueryString
-from types import MethodType
+from pyramid.httpexceptions import (
+    HTTPUnauthorized, HTTPNotFound, HTTPNotModified)
+from pyramid.renderers import render
+from pyramid.response import FileIter
+from pyramid.interfaces import IRoutesMapper
+from sqlalchemy import func, tuple_
+from anyblok_pyramid_rest_api.querystring import QueryString, TEXT_INDEXES
+from anyblok_pyramid_rest_api.cache import RegistryCache, LRUCache, TTLCache
+from anyblok_pyramid_rest_api.job import get_job_runner
+from types import MethodType, SimpleNamespace
+from tempfile import SpooledTemporaryFile
+from time import perf_counter
+from urllib.parse import urlencode
+from hashlib import sha1
+from datetime import datetime, timezone
 from .validator import (
     collection_get_validator, collection_post_validator, get_validator,
     delete_validator, put_validator, patch_validator, execute_validator,
     collection_execute_validator, collection_put_validator,
     collection_patch_validator, collection_delete_validator
 )
-from marshmallow import ValidationError
+from marshmallow import ValidationError, fields
 from contextlib import contextmanager
+from functools import wraps
 from logging import getLogger
 
 logger = getLogger(__name__)
 
+COUNT_MODES = ('query', 'window')
+# resource declared by ``resource``: name of its installed blok or None
+RESOURCES = {}
+WARM_UP_SCHEMAS = (
+    # (view flag, part, rest action, by model)
+    ('has_get', 'path', 'get', False),
+    ('has_delete', 'path', 'get', False),
+    ('has_put', 'path', 'put', False),
+    ('has_put', 'deserialize', 'put', True),
+    ('has_patch', 'path', 'patch', True),
+    ('has_patch', 'deserialize', 'patch', True),
+    ('has_collection_post', 'deserialize', 'collection_post', True),
+    ('has_collection_patch', 'deserialize', 'collection_patch', True),
+    ('has_collection_put', 'deserialize', 'collection_put', True),
+    ('has_collection_delete', 'deserialize', 'collection_delete', True),
+)
+WARM_UP_SERIALIZE_ACTIONS = (
+    'collection_get', 'collection_post', 'collection_patch',
+    'collection_put', 'get', 'patch', 'put')
+
+
+def rollback_request(request):
+    """Rollback the registry, or only the savepoint of the request when it
+    is an operation of a batch
+
+    :param request: Pyramid request
+    """
+    savepoint = getattr(request, 'rest_api_savepoint', None)
+    if savepoint is None:
+        request.anyblok.registry.rollback()
+    elif savepoint.is_active:
+        savepoint.rollback()
+
 
 @contextmanager
 def saved_errors_in_request(request):
@@ -41,7 +88,7 @@ def saved_errors_in_request(request):
     finally:
         if request.errors:
             logger.debug('Request error found: rollback the registry')
-            request.anyblok.registry.rollback()
+            rollback_request(request)
 
 
 def get_path(request):
@@ -50,18 +97,39 @@ def get_path(request):
     return request.validated.get('path', request.matchdict)
 
 
-def update_from_query_string(request, Model, query, adapter):
+def apply_query_string(querystring, query):
+    """Apply the filters, the order and the pagination of the querystring
+
+    :param querystring: QueryString instance
+    :param query: SQLAlchemy query to update
+    :rtype: tuple (paginated query, query of all the filtered entries)
+    """
+    total_query = querystring.from_filter_by(query)
+    total_query = querystring.from_filter_by_primary_keys(total_query)
+    total_query = querystring.from_composite_filter_by(total_query)
+    total_query = querystring.from_tags(total_query)
+    query = querystring.from_order_by(total_query)
+    query = querystring.from_cursor(query)
+    query = querystring.from_limit(query)
+    query = querystring.from_offset(query)
+    query = querystring.from_include(query)
+    query = querystring.from_fields(query)
+    return query, total_query
+
+
+def update_from_query_string(request, Model, query, adapter, plans=None,
+                             include=None, text_indexes=None):
     headers = request.response.headers
     if request.params:
         # TODO: Implement schema validation to use request.validated
-        querystring = QueryString(request, Model, adapter=adapter)
-        total_query = querystring.from_filter_by(query)
-        total_query = querystring.from_filter_by_primary_keys(total_query)
-        total_query = querystring.from_composite_filter_by(total_query)
-        total_query = querystring.from_tags(total_query)
-        query = querystring.from_order_by(total_query)
-        query = querystring.from_limit(query)
-        query = querystring.from_offset(query)
+        querystring = QueryString(
+            request, Model, adapter=adapter, plans=plans, include=include,
+            text_indexes=text_indexes)
+        query, total_query = apply_query_string(querystring, query)
+        if request.errors:
+            # the querystring is wrong, the statements would be useless
+            return query
+
         # TODO: Advanced pagination with Link Header
         # Link: '<https://api.github.com/user/repos?page=3&per_page=100>;
         # rel="next",
@@ -69,7 +137,6 @@ def update_from_query_string(request, Model, query, adapter):
         # rel="last"'
         headers['X-Count-Records'] = str(query.count())
         headers['X-Total-Records'] = str(total_query.count())
-        # TODO: Etag / timestamp / 304 if no changes
         # TODO: Cache headers
         return query
     else:
@@ -77,9 +144,131 @@ def update_from_query_string(request, Model, query, adapter):
         # some default filters values
         headers['X-Count-Records'] = str(query.count())
         headers['X-Total-Records'] = str(query.count())
+        if include:
+            querystring = QueryString(
+                request, Model, adapter=adapter, include=include)
+            query = querystring.from_include(query)
+
         return query
 
 
+def get_count_subquery(query):
+    """Return the scalar subquery which counts the entries of the query,
+    like ``Query.count``
+    """
+    query = query.session.query(func.count()).select_from(query.subquery())
+    if hasattr(query, 'scalar_subquery'):
+        return query.scalar_subquery()
+
+    return query.as_scalar()
+
+
+def fetch_from_query_string(request, Model, query, adapter,
+                            count_mode='query', plans=None, include=None,
+                            text_indexes=None, total=None):
+    """Return the entries filtered by the querystring and fill the
+    ``X-Count-Records`` and ``X-Total-Records`` headers
+
+    ``X-Count-Records`` is the number of entries fetched, the way to get
+    ``X-Total-Records`` depends on ``count_mode``:
+
+    * ``query``: a dedicated ``SELECT COUNT`` on the filtered query
+    * ``window``: a ``COUNT(*) OVER ()`` column added to the statement which
+      fetches the entries, so only one statement is sent to the database.
+      After the first page of a cursor, the seek predicate would be counted
+      by the window, the column is a count subquery of the filtered entries
+
+    When the querystring has a ``cursor``, the ``X-Next-Cursor`` and ``Link``
+    headers give the cursor of the next page
+
+    :param count_mode: ``query`` or ``window``
+    :param plans: LRUCache of the querystring plans
+    :param include: dict {relationship path: many} of the relationships
+                    loaded with the entries
+    :param text_indexes: dict {key: kind of index} of the text indexes,
+                         used by the ``search`` operator
+    :param total: number of the filtered entries if it is already known,
+                  the entries are not counted again
+    :rtype: list of entries
+    """
+    if count_mode not in COUNT_MODES:
+        raise ValueError('Unknown count mode %r' % count_mode)
+
+    headers = request.response.headers
+    querystring = QueryString(
+        request, Model, adapter=adapter, plans=plans, include=include,
+        text_indexes=text_indexes)
+    query, total_query = apply_query_string(querystring, query)
+    if request.errors:
+        # the querystring is wrong, the statements would be useless
+        return []
+
+    if total is not None:
+        entries = query.all()
+    elif count_mode == 'window':
+        if querystring.cursor:
+            total_column = get_count_subquery(total_query)
+        else:
+            total_column = func.count().over()
+
+        rows = query.add_columns(total_column).all()
+        entries = [row[0] for row in rows]
+        if rows:
+            total = rows[0][-1]
+        elif querystring.offset or querystring.cursor:
+            # the page is out of range, no row gives the total
+            total = total_query.count()
+        else:
+            total = 0
+    else:
+        entries = query.all()
+        total = total_query.count()
+
+    headers['X-Count-Records'] = str(len(entries))
+    headers['X-Total-Records'] = str(total)
+    next_cursor = querystring.get_next_cursor(entries)
+    if next_cursor:
+        params = [(k, v) for k, v in request.GET.items() if k != 'cursor']
+        params.append(('cursor', next_cursor))
+        headers['X-Next-Cursor'] = next_cursor
+        headers['Link'] = '<%s?%s>; rel="next"' % (
+            request.path_url, urlencode(params))
+
+    return entries
+
+
+def get_nested_paths(schema, depth=3):
+    """Return the paths of the ``Nested`` fields of the schema
+
+    :param schema: marshmallow schema instance
+    :param depth: max length of the paths, the nested schemas may be
+                  recursive
+    :rtype: dict {tuple of the attribute names: many}
+    """
+    paths = {}
+    if depth <= 0:
+        return paths
+
+    if isinstance(schema, SchemaWrapper):
+        schema = schema.schema
+
+    for name, field in schema.fields.items():
+        if not isinstance(field, fields.Nested):
+            continue
+
+        path = (field.attribute or name,)
+        paths[path] = field.many
+        try:
+            nested = field.schema
+        except Exception:
+            continue
+
+        for subpath, many in get_nested_paths(nested, depth - 1).items():
+            paths[path + subpath] = many
+
+    return paths
+
+
 def post_item(request, Model):
     if not request.errors:
         if isinstance(Model, str):
@@ -95,11 +284,11 @@ def get_items(request, Model, Adapter=None):
             Model = request.anyblok.registry.get(Model)
 
         query = Model.query()
-        query = update_from_query_string(request, Model, query, Adapter)
-        if not query.count():
+        entries = fetch_from_query_string(request, Model, query, Adapter)
+        if not entries:
             return
 
-        return query.all()
+        return entries
 
 
 def get_item(request, Model):
@@ -198,9 +387,27 @@ def add_execute_on_crud_resource(cls, service_path=None, **kwargs):
             service.add_view(verb, attr, klass=cls, **view_args)
 
     cls._services.update(services)
+    cls._route_kinds = build_route_kinds(cls._services)
     return cls
 
 
+def build_route_kinds(services):
+    """Return the kind of action of the routes of the services
+
+    :param services: dict {service name: cornice service}
+    :rtype: dict {route name: 'collection_' or ''}
+    """
+    route_kinds = {}
+    for name, service in services.items():
+        kind = 'collection_' if name.startswith('collection_') else ''
+        route_kinds[name] = kind
+        pyramid_route = getattr(service, 'pyramid_route', None)
+        if pyramid_route:
+            route_kinds[pyramid_route] = kind
+
+    return route_kinds
+
+
 def resource(depth=2, **kwargs):
 
     def wrapper(cls):
@@ -208,11 +415,85 @@ def resource(depth=2, **kwargs):
         klass = add_resource(cls, depth, **kwargs)
         klass = add_execute_on_crud_resource(
             klass, service_path=service_path, **kwargs)
+        if hasattr(klass, 'warm_up') and klass not in RESOURCES:
+            RESOURCES[klass] = kwargs.get('installed_blok')
+
         return klass
 
     return wrapper
 
 
+def get_async_view(method):
+    """Return the view of an asynchronous action, the call is saved in a
+    job instead of being executed, the action stays ``__wrapped__``
+    """
+
+    @wraps(method)
+    def view(self):
+        return self.enqueue_job(method.__name__)
+
+    return view
+
+
+class WarmUpRequest:
+    """Request given to the resources by the warm-up, without querystring
+    and without body
+
+    :param registry: AnyBlok registry
+    """
+
+    def __init__(self, registry):
+        self.anyblok = SimpleNamespace(registry=registry)
+        self.params = {}
+        self.validated = {}
+        self.errors = []
+
+
+def warm_up_resources(registry, resources=None):
+    """Build the adapters, the schemas and the caches of the resources
+    before the first request
+
+    The resources declared with the ``installed_blok`` of a blok which is
+    not installed in the registry are skipped. A resource which can not be
+    warmed up is logged and skipped, its caches are built by the first
+    request
+
+    :param registry: AnyBlok registry
+    :param resources: list of the resources, by default all the resources
+                      declared by ``resource``
+    :rtype: list of (resource, duration in seconds or None if it failed)
+    """
+    if resources is None:
+        resources = list(RESOURCES)
+
+    installed_bloks = {}
+    durations = []
+    for cls in resources:
+        blok = RESOURCES.get(cls)
+        if blok is not None:
+            if blok not in installed_bloks:
+                installed_bloks[blok] = registry.System.Blok.is_installed(
+                    blok)
+
+            if not installed_bloks[blok]:
+                logger.debug('Warm up %s.%s skipped, the blok %r is not '
+                             'installed', cls.__module__, cls.__name__, blok)
+                continue
+
+        try:
+            duration = cls.warm_up(registry)
+            logger.info('Warm up %s.%s in %.3fs', cls.__module__,
+                        cls.__name__, duration)
+        except Exception:
+            duration = None
+            logger.warning('Warm up %s.%s failed', cls.__module__,
+                           cls.__name__, exc_info=True)
+
+        durations.append((cls, duration))
+
+    return durations
+
+
 class CrudResource:
     """Main class to define a RESTFUL API on an AnyBlok resource
 
@@ -347,6 +628,111 @@ class CrudResource:
 
       - get_path_opts: method return dict of option to use
 
+    * count the entries of ``collection_get``
+
+      - ``collection_count_mode``: ``'query'`` (default) run a dedicated
+        ``SELECT COUNT`` to fill ``X-Total-Records``, ``'window'`` get it
+        with a ``COUNT(*) OVER ()`` column in the statement of the entries
+
+    * stream the response of ``collection_get``
+
+      - ``collection_get_stream``: bool default False, the entries are
+        fetched by chunk with ``yield_per`` in the transaction of the
+        request and the JSON array is written chunk by chunk in a spool,
+        streamed by the ``app_iter`` of the response. The
+        ``X-Next-Cursor`` header is not given in this mode
+      - ``stream_chunk_size``: number of entries by chunk (default 1000)
+      - ``stream_spool_size``: number of bytes of the spool kept in memory,
+        the bigger responses are written in a temporary file
+        (default 10 MiB)
+
+    * insert the entries of ``collection_post`` in bulk
+
+      - ``collection_post_bulk``: bool default False, the entries are
+        inserted by chunk with ``Model.multi_insert``, only one flush is
+        done by chunk. If the bulk insert fails, the entries are inserted
+        one by one to report the error of each entry. The resources which
+        overwrite ``create`` always insert the entries one by one
+      - ``bulk_chunk_size``: number of entries by chunk (default 1000),
+        also used to load by chunk the entries of the primary keys given
+        by the body of ``collection_patch``, ``collection_put`` and
+        ``collection_delete``
+
+    * delete the entries of ``collection_delete`` in bulk
+
+      - ``collection_delete_bulk``: bool default False, one ``DELETE`` is
+        done by chunk of primary keys, the entries are not loaded. The
+        resources which overwrite ``delete_entry`` always delete the
+        entries one by one
+      - ``allow_collection_delete_by_filter``: bool default False, when the
+        body is empty the entries found by the filters of the querystring
+        are deleted, at least one filter is required. The query can be
+        restricted by overwriting ``update_collection_delete_filter``
+
+    * cache the plans of the querystring
+
+      - ``query_plan_cache_size``: number of querystring shapes (keys,
+        operators and relationships without the values) whose plan is kept
+        by resource: the models crossed by the keys, the aliases of the
+        joins with their resolved columns and the operators. ``0`` to
+        disable the cache (default 128)
+
+    * load the relationships with the entries of ``collection_get``
+
+      - ``eager_load_nested``: bool default False, the relationships of the
+        ``Nested`` fields of the serialize schema are loaded with the
+        entries: ``selectinload`` for the ``many`` fields, ``joinedload``
+        for the others. The ``include`` entry of the querystring adds
+        relationships to load
+
+    * sparse fieldsets: the ``fields`` entry of the querystring restricts
+      the fields serialized by ``collection_get`` and the columns loaded
+
+      - ``sparse_schema_cache_size``: number of restricted serialize
+        schemas kept by resource (default 64)
+
+    * conditional GET on ``get`` and ``collection_get``
+
+      - ``last_modified_column``: name of the column updated at each
+        change of the entries (default None, no conditional GET). The
+        responses have a weak ``ETag`` and a ``Last-Modified`` header, the
+        views return ``304 Not Modified`` without serializing the entries
+        when ``If-None-Match`` or ``If-Modified-Since`` match. For the
+        collection the ETag comes from the max of the column and the number
+        of the entries
+
+    * cache the responses of ``get`` and ``collection_get``
+
+      - ``response_cache``: backend of the cache (default None, no cache),
+        ``MemoryResponseCache`` in the process or ``FileResponseCache``
+        shared by the workers, from ``anyblok_pyramid_rest_api.cache``.
+        The responses are cached by resource, querystring, path and user
+      - ``response_cache_timeout``: lifetime of the responses in seconds
+        (default 60)
+
+      The write methods of the resources (``create``, ``update``,
+      ``delete_entry`` and the bulk methods) forget the cached responses
+      of their model. The changes done without these methods are seen
+      once the responses expire
+
+    * cache the ACL of the users
+
+      - ``acl_cache_timeout``: lifetime in seconds of the ACL got by
+        ``Pyramid.get_acl`` for a user, a resource and the params of the
+        path, ``0`` to disable the cache (default 0). The cache must be
+        invalidated by ``CrudResource.invalidate_acl_cache`` when the
+        roles or the authorizations change. The ``auth`` blok
+        installation is checked once by registry
+
+    * text search with the ``search`` operator of the querystring
+
+      - ``text_indexes``: dict {key of the filter: kind of index} of the
+        indexes of the text columns, the kind is ``'btree'`` (prefix
+        search), ``'trigram'`` (similarity, needs the ``pg_trgm``
+        extension) or ``'fulltext'``, also given as ``('fulltext',
+        'english')`` to choose the text search config (default
+        ``'simple'``). Without index the search is ``ILIKE '%value%'``
+
     * ``update_collection_get_filter``: method to improve query to filter
     * ``create``
     * ``update``
@@ -385,6 +771,15 @@ class CrudResource:
                 Model = self.get_model('other_action_name')
                 item = get_item(self.request, Model)
                 ...
+
+    With ``async_=True`` the action is executed after the commit by the job
+    runner (blok ``rest-api-job``), the response is 202 with the
+    ``Location`` of the job, its status and its result::
+
+            @CrudResource.service('compute', async_=True)
+            def compute(self):
+                ...
+                return result  # must be JSON serializable
     """
 
     model = None
@@ -410,30 +805,105 @@ class CrudResource:
     has_delete = True
     has_patch = True
     has_put = True
-
-    ADAPTERS = {}
-    SCHEMAS = {}
+    collection_count_mode = 'query'
+    query_plan_cache_size = 128
+    collection_get_stream = False
+    stream_chunk_size = 1000
+    stream_spool_size = 10 * 1024 * 1024
+    collection_post_bulk = False
+    bulk_chunk_size = 1000
+    collection_delete_bulk = False
+    allow_collection_delete_by_filter = False
+    acl_cache_timeout = 0
+    eager_load_nested = False
+    sparse_schema_cache_size = 64
+    last_modified_column = None
+    response_cache = None
+    response_cache_timeout = 60
+    text_indexes = {}
+
+    ADAPTERS = RegistryCache()
+    SCHEMAS = RegistryCache()
+    QUERY_PLANS = RegistryCache()
+    REGISTRY_FLAGS = RegistryCache()
+    INCLUDES = RegistryCache()
+    SPARSE_SCHEMAS = RegistryCache()
+    RESPONSE_CACHES = set()
+    ACLS = TTLCache(1024)
+
+    def __init_subclass__(cls, **kwargs):
+        super(CrudResource, cls).__init_subclass__(**kwargs)
+        if cls.response_cache is not None:
+            CrudResource.RESPONSE_CACHES.add(cls.response_cache)
+
+        for key, index in cls.text_indexes.items():
+            kind = index[0] if isinstance(index, (list, tuple)) else index
+            if kind not in TEXT_INDEXES:
+                raise ValueError('Unknown text index %r for %r' % (
+                    index, key))
 
     def __init__(self, request, **kwargs):
         self.request = request
         self.registry = self.request.anyblok.registry
         self.adapter = None
+        # number of the filtered entries, counted by the aggregate query of
+        # the conditional collection_get
+        self.collection_total = None
         cls = self.__class__
 
-        if self.registry not in cls.SCHEMAS:
-            self.schemas = cls.SCHEMAS[self.registry] = {}
-        else:
-            self.schemas = cls.SCHEMAS[self.registry]
-
+        self.schemas = cls.get_schemas(self.registry)
         if self.QueryStringAdapter:
-            if self.registry not in cls.ADAPTERS:
-                self.adapter = self.QueryStringAdapter(
-                    self.registry,
-                    Model=self.get_model('collection_get'))
-                self.adapter.load_decorators()
-                cls.ADAPTERS[self.registry] = self.adapter
-            else:
-                self.adapter = cls.ADAPTERS[self.registry]
+            self.adapter = self.get_adapter()
+
+    def get_adapter(self):
+        """Return the adapter of the resource class for the registry
+
+        The adapter is built once by registry and resource class, two
+        resources of the same registry do not share their adapter
+
+        :rtype: instance of ``QueryStringAdapter``
+        """
+        cls = self.__class__
+        adapters = cls.ADAPTERS.get_cache(self.registry)
+        adapter = adapters.get(cls)
+        if adapter is None:
+            with cls.ADAPTERS.lock:
+                adapter = adapters.get(cls)
+                if adapter is None:
+                    adapter = self.QueryStringAdapter(
+                        self.registry,
+                        Model=self.get_model('collection_get'))
+                    adapter.load_decorators()
+                    adapters[cls] = adapter
+
+        return adapter
+
+    @classmethod
+    def warm_up(cls, registry):
+        """Build the adapter, the schemas and the caches of the querystring
+        of the resource for the registry, the first request does not pay
+        for them
+
+        :param registry: AnyBlok registry
+        :rtype: duration in seconds
+        """
+        start = perf_counter()
+        request = WarmUpRequest(registry)
+        resource = cls(request)
+        QueryString.warm_up(resource.get_model('collection_get'))
+
+        for flag, part, rest_action, by_model in WARM_UP_SCHEMAS:
+            if getattr(cls, flag):
+                model_name = cls.get_model_name(request) if by_model else None
+                cls.get_validator_schema(
+                    request, part, rest_action, model_name)
+
+        for rest_action in WARM_UP_SERIALIZE_ACTIONS:
+            if getattr(cls, 'has_' + rest_action):
+                resource.get_schema_to_serialize(rest_action)
+                resource.get_include(rest_action)
+
+        return perf_counter() - start
 
     @classmethod
     def get_model_name(cls, request, rest_action=None, base=None):
@@ -455,50 +925,146 @@ class CrudResource:
             raise HTTPUnauthorized("ACL have not get AnyBlok registry")
 
         allow_name = 'allow_unauthenticated_user_to_access_to_'
-        for name, service in self.__class__._services.items():
-            if service.path == self.request.path:
-                if name.startswith('collection_'):
-                    allow_name += 'collection_'
-
+        allow_name += self.get_route_kind()
         allow_name += self.request.method.lower()
         allow = getattr(self, allow_name, False)
 
         if allow or self.allow_unauthenticated_user_to_access_to_all_verbs:
             return [(Allow, Everyone, ALL_PERMISSIONS)]
 
-        Blok = self.registry.System.Blok
-        if not Blok.is_installed('auth'):
+        if not self.auth_is_installed(self.registry):
             return [(Allow, Everyone, ALL_PERMISSIONS)]
 
         userid = self.request.authenticated_userid
         if userid:
             resource_name = self.resource_name or self.model_name()
-            return self.registry.Pyramid.get_acl(
-                userid, resource_name, params=dict(self.request.matchdict)
-            )
+            return self.get_acl(userid, resource_name)
 
         return [(Deny, Everyone, ALL_PERMISSIONS)]
 
+    def get_route_kind(self):
+        """Return 'collection_' if the matched route is a collection route
+
+        The map of the routes is built by ``resource``, or at the first
+        call for the resources declared by the ``resource`` decorator of
+        cornice
+        """
+        cls = self.__class__
+        route_kinds = cls.__dict__.get('_route_kinds')
+        if route_kinds is None:
+            route_kinds = cls._route_kinds = build_route_kinds(cls._services)
+
+        route = self.request.matched_route
+        if route is not None:
+            return route_kinds.get(route.name, '')
+
+        for name, service in cls._services.items():
+            if service.path == self.request.path:
+                return route_kinds[name]
+
+        return ''
+
+    @classmethod
+    def auth_is_installed(cls, registry):
+        """Return True if the ``auth`` blok is installed, the result is
+        kept until the registry is reloaded
+        """
+        flags = cls.REGISTRY_FLAGS.get_cache(registry)
+        if 'auth' not in flags:
+            flags['auth'] = registry.System.Blok.is_installed('auth')
+
+        return flags['auth']
+
+    def get_acl(self, userid, resource_name):
+        params = dict(self.request.matchdict)
+        if not self.acl_cache_timeout:
+            return self.registry.Pyramid.get_acl(
+                userid, resource_name, params=params)
+
+        key = (self.registry, userid, resource_name,
+               tuple(sorted(params.items())))
+        acl = self.ACLS.get(key)
+        if acl is None:
+            acl = self.registry.Pyramid.get_acl(
+                userid, resource_name, params=params)
+            self.ACLS.set(key, acl, timeout=self.acl_cache_timeout)
+
+        return list(acl)
+
+    @classmethod
+    def invalidate_acl_cache(cls, registry=None, userid=None):
+        """Forget the cached ACL
+
+        Must be called when the roles or the authorizations of the users
+        change
+
+        :param registry: AnyBlok registry, if None all the registries
+        :param userid: id of the user, if None all the users
+        """
+        cls.ACLS.invalidate(
+            lambda key: (
+                (registry is None or key[0] is registry) and
+                (userid is None or key[1] == userid)))
+        if registry is None:
+            cls.REGISTRY_FLAGS.clear()
+        else:
+            cls.REGISTRY_FLAGS.clear(registry)
+
+    @classmethod
+    def get_schemas(cls, registry):
+        """Return the dict of the schemas of the resource for the registry
+
+        The schemas are built once by registry and resource class, they are
+        forgotten when the registry is reloaded or by
+        ``invalidate_schema_cache``
+
+        :rtype: dict {(part, rest_action, model_name): schema}
+        """
+        schemas = cls.SCHEMAS.get_cache(registry)
+        if cls not in schemas:
+            with cls.SCHEMAS.lock:
+                schemas.setdefault(cls, {})
+
+        return schemas[cls]
+
+    @classmethod
+    def invalidate_schema_cache(cls, registry=None):
+        """Forget the schemas of all the resources
+
+        :param registry: AnyBlok registry, if None all the registries
+        """
+        cls.SCHEMAS.clear(registry)
+        cls.SPARSE_SCHEMAS.clear(registry)
+
     @classmethod
     def get_validator_schema(cls, request, part, rest_action, model_name):
+        registry = request.anyblok.registry
         key = (part, rest_action, model_name)
-        schema = cls.SCHEMAS.get(key)
+        schema = cls.get_schemas(registry).get(key)
         if schema is None:
-            if part == 'deserialize':
-                Schema = cls.get_deserialize_schema(rest_action, model_name)
-                opts = cls.get_deserialize_opts(rest_action)
-            elif part == 'path':
-                Schema = cls.get_path_schema(rest_action)
-                opts = cls.get_path_opts(rest_action)
-            else:
-                raise KeyError(part)
-
-            opts['context']['registry'] = request.anyblok.registry
-            schema = Schema(**opts)
-            cls.append_schema(request.anyblok.registry, key, schema)
+            with cls.SCHEMAS.lock:
+                schema = cls.get_schemas(registry).get(key)
+                if schema is None:
+                    schema = cls.build_validator_schema(
+                        registry, part, rest_action, model_name)
+                    schema = cls.append_schema(registry, key, schema)
 
         return schema
 
+    @classmethod
+    def build_validator_schema(cls, registry, part, rest_action, model_name):
+        if part == 'deserialize':
+            Schema = cls.get_deserialize_schema(rest_action, model_name)
+            opts = cls.get_deserialize_opts(rest_action)
+        elif part == 'path':
+            Schema = cls.get_path_schema(rest_action)
+            opts = cls.get_path_opts(rest_action)
+        else:
+            raise KeyError(part)
+
+        opts['context']['registry'] = registry
+        return Schema(**opts)
+
     @classmethod
     def apply_validator_schema(cls, request, part, schema, base):
         logger.debug('Validate %r with schema %r',
@@ -507,7 +1073,7 @@ class CrudResource:
             result = schema.load(base[part])
             request.validated[part] = result
         except ValidationError as err:
-            request.anyblok.registry.rollback()
+            rollback_request(request)
             logger.exception(err)
             errors = err.messages
             for k, v in errors.items():
@@ -521,6 +1087,9 @@ class CrudResource:
     def update_collection_get_filter(self, query):
         return query
 
+    def update_collection_delete_filter(self, query):
+        return query
+
     @classmethod
     def get_value_or_call_method(cls, attribute, *args, **kwargs):
         value = None
@@ -615,81 +1184,563 @@ class CrudResource:
         if isinstance(schema, SchemaWrapper):
             schema = schema.schema
 
-        cls.SCHEMAS[registry][key] = schema
+        cls.get_schemas(registry)[key] = schema
+        return schema
+
+    def get_schema_to_serialize(self, rest_action, only=None):
+        if only:
+            return self.get_sparse_schema_to_serialize(rest_action, only)
 
-    def serialize(self, rest_action, entry):
         model_name = self.model_name(rest_action)
         key = ('serialize', rest_action, model_name)
         schema = self.schemas.get(key)
         if not schema:
-            Schema = self.get_serialize_schema(
-                rest_action, self.model_name(rest_action))
+            with self.SCHEMAS.lock:
+                schema = self.schemas.get(key)
+                if not schema:
+                    Schema = self.get_serialize_schema(
+                        rest_action, model_name)
+                    opts = self.get_serialize_opts(rest_action)
+                    opts['context'] = {'registry': self.registry}
+                    schema = self.append_schema(
+                        self.registry, key, Schema(**opts))
+
+        return schema
+
+    def get_sparse_schema_to_serialize(self, rest_action, only):
+        """Return the serialize schema restricted to the fields ``only``
+
+        The schemas are kept in a bounded LRU cache by resource
+        (``sparse_schema_cache_size``)
+        """
+        cls = self.__class__
+        schemas = cls.SPARSE_SCHEMAS.get_cache(self.registry)
+        if cls not in schemas:
+            schemas[cls] = LRUCache(self.sparse_schema_cache_size)
+
+        model_name = self.model_name(rest_action)
+        key = (rest_action, model_name, only)
+        schema = schemas[cls].get(key)
+        if schema is None:
+            Schema = self.get_serialize_schema(rest_action, model_name)
             opts = self.get_serialize_opts(rest_action)
             opts['context'] = {'registry': self.registry}
+            opts['only'] = only
             schema = Schema(**opts)
-            self.append_schema(self.registry, key, schema)
+            if isinstance(schema, SchemaWrapper):
+                schema = schema.schema
 
-        return schema.dump(entry)
+            schemas[cls].set(key, schema)
+
+        return schema
+
+    def get_sparse_fields(self, rest_action):
+        """Return the fields given by the ``fields`` entry of the
+        querystring, None if all the fields are serialized
+
+        :rtype: sorted tuple of the field names
+        """
+        names = {
+            name
+            for value in self.request.params.getall('fields')
+            for name in value.split(',') if name}
+        if not names:
+            return None
+
+        schema = self.get_schema_to_serialize(rest_action)
+        unknown = sorted(x for x in names if x not in schema.fields)
+        if unknown:
+            self.request.errors.add(
+                'querystring', '400 Bad Request',
+                'Fields %r do not exist in the serialize schema' % unknown)
+            self.request.errors.status = 400
+            return None
+
+        return tuple(sorted(names))
+
+    def serialize(self, rest_action, entry, only=None):
+        return self.get_schema_to_serialize(rest_action, only=only).dump(entry)
+
+    def spool_serialized_entries(self, query, schema, spool):
+        """Write the JSON array of the serialized entries by chunk in the
+        spool, return the number of entries
+
+        The entries are fetched by ``stream_chunk_size`` with ``yield_per``,
+        each chunk is dumped by the schema then encoded by the ``json``
+        renderer, so only one chunk of entries is in memory at a time
+        """
+        def dump(chunk):
+            data = render('json', schema.dump(chunk), request=self.request)
+            return data[1:-1].encode('utf-8')
+
+        count = 0
+        spool.write(b'[')
+        separator = b''
+        chunk = []
+        for entry in query.yield_per(self.stream_chunk_size):
+            chunk.append(entry)
+            if len(chunk) == self.stream_chunk_size:
+                spool.write(separator + dump(chunk))
+                separator = b','
+                count += len(chunk)
+                chunk = []
+
+        if chunk:
+            spool.write(separator + dump(chunk))
+            count += len(chunk)
+
+        spool.write(b']')
+        return count
+
+    def stream_entries(self, rest_action, only=None):
+        """Return the response which streams the serialized entries
+
+        The entries are fetched and serialized in the view, inside the
+        transaction of the request, so the headers and the entries come from
+        the same snapshot and an error gives an error response. The JSON is
+        written in a spool, kept in memory up to ``stream_spool_size`` bytes
+        then in a temporary file, and the response streams this spool
+        """
+        Model = self.get_model(rest_action)
+        query = self.update_collection_get_filter(Model.query())
+        querystring = QueryString(
+            self.request, Model, adapter=self.adapter,
+            plans=self.get_query_plans(), include=self.get_include(rest_action),
+            text_indexes=self.text_indexes)
+        query, total_query = apply_query_string(querystring, query)
+        if self.request.errors:
+            return []
+
+        total = self.collection_total
+        if total is None:
+            total = total_query.count()
+
+        schema = self.get_schema_to_serialize(rest_action, only=only)
+        spool = SpooledTemporaryFile(max_size=self.stream_spool_size)
+        try:
+            count = self.spool_serialized_entries(query, schema, spool)
+            length = spool.tell()
+            spool.seek(0)
+        except Exception:
+            spool.close()
+            raise
+
+        response = self.request.response
+        response.headers['X-Count-Records'] = str(count)
+        response.headers['X-Total-Records'] = str(total)
+        response.content_type = 'application/json'
+        response.content_length = length
+        response.app_iter = FileIter(spool)
+        return response
+
+    def get_not_modified_response(self, fingerprint, last_modified=None):
+        """Set the ``ETag`` and ``Last-Modified`` headers of the response
+
+        The weak ETag is the hash of the fingerprint
+
+        :param fingerprint: tuple of the values which change with the entries
+        :param last_modified: datetime of the last change of the entries
+        :rtype: ``HTTPNotModified`` if the client already has the entries,
+                else None
+        """
+        etag = sha1(repr(fingerprint).encode('utf-8')).hexdigest()
+        headers = self.request.response.headers
+        headers['ETag'] = 'W/"%s"' % etag
+        if isinstance(last_modified, datetime):
+            if last_modified.tzinfo is None:
+                last_modified = last_modified.replace(tzinfo=timezone.utc)
+
+            last_modified = last_modified.replace(microsecond=0)
+            self.request.response.last_modified = last_modified
+        else:
+            last_modified = None
+
+        return self.get_not_modified_from_headers(etag, last_modified)
+
+    def get_not_modified_from_headers(self, etag, last_modified=None):
+        """Return ``HTTPNotModified`` with the ``ETag`` and
+        ``Last-Modified`` headers of the response if the client already has
+        the entries, else None
+
+        :param etag: hash of the fingerprint of the entries
+        :param last_modified: datetime of the last change of the entries
+        """
+        if self.request.if_none_match:
+            not_modified = etag in self.request.if_none_match
+        elif last_modified and self.request.if_modified_since:
+            not_modified = last_modified <= self.request.if_modified_since
+        else:
+            not_modified = False
+
+        if not_modified:
+            headers = self.request.response.headers
+            return HTTPNotModified(headers={
+                x: headers[x] for x in ('ETag', 'Last-Modified')
+                if x in headers})
+
+        return None
+
+    def get_item_not_modified_response(self, rest_action, item):
+        if not self.last_modified_column:
+            return None
+
+        last_modified = getattr(item, self.last_modified_column)
+        fingerprint = (
+            self.model_name(rest_action),
+            sorted(item.to_primary_keys().items()),
+            str(last_modified))
+        return self.get_not_modified_response(fingerprint, last_modified)
+
+    def get_collection_not_modified_response(self, rest_action):
+        """Return ``HTTPNotModified`` if the entries did not change
+
+        The fingerprint of the collection is the querystring, the max of
+        ``last_modified_column`` and the number of the entries found by the
+        filters, they are computed by only one aggregate query. This number
+        is kept in ``collection_total`` to fill ``X-Total-Records``, the
+        entries are not counted again
+        """
+        if not self.last_modified_column:
+            return None
+
+        Model = self.get_model(rest_action)
+        query = self.update_collection_get_filter(Model.query())
+        querystring = QueryString(
+            self.request, Model, adapter=self.adapter,
+            plans=self.get_query_plans(), text_indexes=self.text_indexes)
+        _, total_query = apply_query_string(querystring, query)
+        if self.request.errors:
+            return None
+
+        last_modified, count = total_query.with_entities(
+            func.max(getattr(Model, self.last_modified_column)),
+            func.count()).one()
+        self.collection_total = count
+        fingerprint = (
+            self.model_name(rest_action), sorted(self.request.GET.items()),
+            str(last_modified), count)
+        return self.get_not_modified_response(fingerprint, last_modified)
+
+    CACHED_HEADERS = (
+        'X-Count-Records', 'X-Total-Records', 'X-Next-Cursor', 'Link',
+        'ETag', 'Last-Modified')
+
+    def get_response_cache_key(self, rest_action):
+        model_name = self.model_name(rest_action)
+        namespace = (self.registry.db_name, model_name)
+        return (
+            namespace,
+            self.response_cache.get_version(namespace),
+            '%s.%s' % (self.__class__.__module__, self.__class__.__name__),
+            rest_action,
+            tuple(sorted(self.request.GET.items())),
+            tuple(sorted(self.request.matchdict.items())),
+            self.request.authenticated_userid,
+        )
+
+    def get_cached_response(self, rest_action):
+        """Return the cached serialization of the view, None if the view
+        has to be computed
+
+        The headers of the cached response are copied in the response, the
+        cached ``ETag`` and ``Last-Modified`` give ``HTTPNotModified``
+        without querying the entries
+        """
+        if (
+            self.response_cache is None or
+            self.is_response_cache_invalidated(rest_action)
+        ):
+            return None
+
+        cached = self.response_cache.get(
+            self.get_response_cache_key(rest_action))
+        if cached is None:
+            return None
+
+        data, headers = cached
+        self.request.response.headers.update(headers)
+        etag = headers.get('ETag')
+        if etag:
+            not_modified = self.get_not_modified_from_headers(
+                etag[3:-1], self.request.response.last_modified)
+            if not_modified is not None:
+                return not_modified
+
+        return data
+
+    def set_cached_response(self, rest_action, data):
+        if (
+            self.response_cache is None or self.request.errors or
+            self.is_response_cache_invalidated(rest_action)
+        ):
+            return data
+
+        response_headers = self.request.response.headers
+        headers = {
+            x: response_headers[x] for x in self.CACHED_HEADERS
+            if x in response_headers}
+        self.response_cache.set(
+            self.get_response_cache_key(rest_action), (data, headers),
+            self.response_cache_timeout)
+        return data
+
+    def is_response_cache_invalidated(self, rest_action):
+        """Return True if the model is written by the request, its
+        responses are neither read nor written in the cache until the
+        request is finished
+        """
+        namespaces = getattr(
+            self.request, 'rest_api_invalidated_namespaces', None)
+        return bool(namespaces) and (
+            self.registry.db_name, self.model_name(rest_action)
+        ) in namespaces
+
+    def invalidate_response_cache(self, Model):
+        """Forget the cached responses of the model, in the response
+        caches of all the resources
+
+        Called by the methods which write the entries (``create``,
+        ``update``, ``delete_entry`` and the bulk methods), an overwritten
+        method which does not call them must call it.
+
+        The version of the model is bumped once by request, when the request
+        is finished, once the transaction is committed or aborted. Until
+        then the request does not use the cached responses of the model
+
+        :param Model: AnyBlok model or entry
+        """
+        response_caches = list(self.RESPONSE_CACHES)
+        if not response_caches:
+            return
+
+        namespace = (self.registry.db_name, Model.__registry_name__)
+        namespaces = getattr(
+            self.request, 'rest_api_invalidated_namespaces', None)
+        if namespaces is None:
+            namespaces = self.request.rest_api_invalidated_namespaces = set()
+        elif namespace in namespaces:
+            return
+
+        namespaces.add(namespace)
+
+        def bump_versions(request=None):
+            for response_cache in response_caches:
+                response_cache.bump_version(namespace)
+
+        self.request.add_finished_callback(bump_versions)
 
     @property
     def body(self):
         return self.request.validated.get('body', self.request.validated)
 
+    def get_query_plans(self):
+        if not self.query_plan_cache_size:
+            return None
+
+        cls = self.__class__
+        plans = cls.QUERY_PLANS.get_cache(self.registry)
+        if cls not in plans:
+            plans[cls] = LRUCache(self.query_plan_cache_size)
+
+        return plans[cls]
+
     def get_querystring(self, rest_action):
         Model = self.get_model(rest_action)
         query = self.update_collection_get_filter(Model.query())
         query = update_from_query_string(
-            self.request, Model, query, self.adapter)
+            self.request, Model, query, self.adapter,
+            plans=self.get_query_plans(), include=self.get_include(rest_action),
+            text_indexes=self.text_indexes)
         return query
 
+    def get_entries(self, rest_action):
+        Model = self.get_model(rest_action)
+        query = self.update_collection_get_filter(Model.query())
+        return fetch_from_query_string(
+            self.request, Model, query, self.adapter,
+            count_mode=self.collection_count_mode,
+            plans=self.get_query_plans(),
+            include=self.get_include(rest_action),
+            text_indexes=self.text_indexes, total=self.collection_total)
+
+    def get_include(self, rest_action):
+        """Return the relationships loaded with the entries
+
+        With ``eager_load_nested`` the ``Nested`` fields of the serialize
+        schema give the relationships, the paths are kept until the registry
+        is reloaded
+
+        :rtype: dict {relationship path: many}
+        """
+        if not self.eager_load_nested:
+            return None
+
+        cls = self.__class__
+        includes = cls.INCLUDES.get_cache(self.registry)
+        key = (cls, rest_action, self.model_name(rest_action))
+        if key not in includes:
+            includes[key] = get_nested_paths(
+                self.get_schema_to_serialize(rest_action))
+
+        return includes[key]
+
     @cornice_view(validators=(collection_get_validator,), permission="read")
     def collection_get(self):
         self.view_is_activated(self.has_collection_get)
         if not self.request.errors:
-            query = self.get_querystring('collection_get')
-            if not query.count():
-                return []
+            only = self.get_sparse_fields('collection_get')
+            if self.request.errors:
+                return
+
+            cached = self.get_cached_response('collection_get')
+            if cached is not None:
+                return cached
+
+            not_modified = self.get_collection_not_modified_response(
+                'collection_get')
+            if not_modified is not None:
+                return not_modified
 
-            return self.serialize('collection_get', query.all())
+            if self.collection_get_stream:
+                return self.stream_entries('collection_get', only=only)
+
+            entries = self.get_entries('collection_get')
+            if not entries:
+                return self.set_cached_response('collection_get', [])
+
+            return self.set_cached_response(
+                'collection_get',
+                self.serialize('collection_get', entries, only=only))
 
     def create(self, Model, params):
+        self.invalidate_response_cache(Model)
         return Model.insert(**params)
 
+    def bulk_create(self, Model, body):
+        """Insert the entries of the body by chunk of ``bulk_chunk_size``,
+        with one flush by chunk
+        """
+        self.invalidate_response_cache(Model)
+        items = []
+        size = self.bulk_chunk_size or len(body)
+        for index in range(0, len(body), size):
+            items.extend(Model.multi_insert(*body[index:index + size]))
+
+        return items
+
+    def create_entries(self, Model, body):
+        if (
+            self.collection_post_bulk and
+            type(self).create is CrudResource.create
+        ):
+            savepoint = self.registry.begin_nested()
+            try:
+                items = self.bulk_create(Model, body)
+                savepoint.commit()
+                return items
+            except Exception as e:
+                logger.debug(
+                    'Bulk insert failed (%s), insert the entries one by one '
+                    'to get the errors', e)
+                savepoint.rollback()
+
+        items = []
+        for params in body:
+            with saved_errors_in_request(self.request):
+                items.append(self.create(Model, params=params))
+
+        return items
+
     @cornice_view(validators=(collection_post_validator,), permission="create")
     def collection_post(self):
         self.view_is_activated(self.has_collection_post)
         if not self.request.errors:
-            items = []
             Model = self.get_model('collection_post')
-            for params in self.body:
-                with saved_errors_in_request(self.request):
-                    items.append(self.create(Model, params=params))
-
+            items = self.create_entries(Model, self.body)
             if items and not self.request.errors:
                 return self.serialize('collection_post', items)
 
+    def get_primary_keys_criteria(self, Model, pks):
+        """Yield the ``IN`` clauses on the primary keys, one by chunk of
+        ``bulk_chunk_size`` primary keys
+
+        :param Model: AnyBlok model
+        :param pks: list of dict {primary_key: value, ...}
+        """
+        pks_names = Model.get_primary_keys()
+        values = [tuple(x[y] for y in pks_names) for x in pks]
+        if len(pks_names) == 1:
+            column = getattr(Model, pks_names[0])
+            values = [x[0] for x in values]
+        else:
+            column = tuple_(*[getattr(Model, x) for x in pks_names])
+
+        size = self.bulk_chunk_size or len(values)
+        for index in range(0, len(values), size):
+            yield column.in_(values[index:index + size])
+
+    def get_entries_by_primary_keys(self, Model, pks):
+        """Return the entries of the primary keys
+
+        The entries are loaded by chunk of ``bulk_chunk_size`` primary keys
+        with a ``tuple IN`` clause, in place of one query by entry
+
+        :param Model: AnyBlok model
+        :param pks: list of dict {primary_key: value, ...}
+        :rtype: dict {tuple of the values of the primary keys: entry}
+        """
+        pks_names = Model.get_primary_keys()
+        entries = {}
+        for criteria in self.get_primary_keys_criteria(Model, pks):
+            for entry in Model.query().filter(criteria).all():
+                entries[tuple(getattr(entry, x) for x in pks_names)] = entry
+
+        return entries
+
+    def get_primary_keys_from_body(self, Model, params):
+        try:
+            return {x: params[x] for x in Model.get_primary_keys()}
+        except KeyError as e:
+            self.request.errors.add(
+                'body', 'Validation Error',
+                'No primary key found %r to get the item on %s' % (
+                    e.args, Model))
+            self.request.errors.status = 400
+
+        return None
+
+    def get_entry_from_primary_keys(self, Model, entries, pks):
+        """Return the entry loaded by ``get_entries_by_primary_keys``
+
+        The values of the body may have another type than the columns, in
+        this case the entry is got by ``from_primary_keys``
+        """
+        entry = entries.get(tuple(pks.values()))
+        if entry is None:
+            entry = Model.from_primary_keys(**pks)
+
+        if entry is None:
+            self.request.errors.add(
+                'body', 'Validation Error',
+                'The primary key found %r does not exist on %s' % (
+                    pks, Model))
+            self.request.errors.status = 400
+
+        return entry
+
     def collection_update(self, Model, body):
         items = []
-        for params in body:
-            try:
-                pks = {x: params[x] for x in Model.get_primary_keys()}
-            except KeyError as e:
-                self.request.errors.add(
-                    'body', 'Validation Error',
-                    'No primary key found %r to get the item on %s' % (
-                        e.args, Model))
-                self.request.errors.status = 400
-            else:
-                item = Model.from_primary_keys(**pks)
-                if item:
-                    self.update(item, params=params)
-                    items.append(item)
-                else:
-                    self.request.errors.add(
-                        'body', 'Validation Error',
-                        'The primary key found %r does not exist on %s' % (
-                            pks, Model))
-                    self.request.errors.status = 400
+        pks = [self.get_primary_keys_from_body(Model, x) for x in body]
+        entries = self.get_entries_by_primary_keys(
+            Model, [x for x in pks if x is not None])
+        for params, pks_ in zip(body, pks):
+            if pks_ is None:
+                continue
+
+            item = self.get_entry_from_primary_keys(Model, entries, pks_)
+            if item:
+                self.update(item, params=params)
+                items.append(item)
 
         return items
 
@@ -716,30 +1767,100 @@ class CrudResource:
             return self.serialize('collection_put', items)
 
     def delete_entries(self, Model, body):
+        pks = []
         for params in body:
-            try:
-                pks = {x: params[x] for x in Model.get_primary_keys()}
-            except KeyError as e:
-                self.request.errors.add(
-                    'body', 'Validation Error',
-                    'No primary key found %r to get the item on %s' % (
-                        e.args, Model))
-                self.request.errors.status = 400
+            pks_ = self.get_primary_keys_from_body(Model, params)
+            if pks_ is None:
                 return 0
+
+            pks.append(pks_)
+
+        if (
+            self.collection_delete_bulk and
+            type(self).delete_entry is CrudResource.delete_entry
+        ):
+            return self.bulk_delete(Model, pks)
+
+        entries = self.get_entries_by_primary_keys(Model, pks)
+        for pks_ in pks:
+            item = self.get_entry_from_primary_keys(Model, entries, pks_)
+            if item:
+                self.delete_entry(item)
             else:
-                item = Model.from_primary_keys(**pks)
-                if item:
-                    self.delete_entry(item)
-                else:
-                    self.request.errors.add(
-                        'body', 'Validation Error',
-                        'The primary key found %r does not exist on %s' % (
-                            pks, Model))
-                    self.request.errors.status = 400
-                    return 0
+                return 0
 
         return len(body)
 
+    def bulk_delete(self, Model, pks):
+        """Delete the entries with one ``DELETE`` by chunk of primary keys
+
+        The entries are not loaded, the number of deleted rows is compared
+        with the number of primary keys to find the unknown primary keys
+        """
+        self.invalidate_response_cache(Model)
+        count = 0
+        for criteria in self.get_primary_keys_criteria(Model, pks):
+            count += Model.query().filter(criteria).delete(
+                synchronize_session=False)
+
+        expected = len({tuple(x.values()) for x in pks})
+        if count != expected:
+            self.request.errors.add(
+                'body', 'Validation Error',
+                '%d primary keys found do not exist on %s' % (
+                    expected - count, Model))
+            self.request.errors.status = 400
+            return 0
+
+        return count
+
+    def delete_entries_by_filter(self, Model):
+        """Delete the entries found by the filters of the querystring
+
+        The order, the pagination and the context of the querystring are
+        ignored, at least one filter is required
+        """
+        querystring = QueryString(
+            self.request, Model, adapter=self.adapter,
+            plans=self.get_query_plans(), text_indexes=self.text_indexes)
+        if not (
+            querystring.filter_by or querystring.filter_by_primary_keys or
+            querystring.composite_filter_by or querystring.tags
+        ):
+            self.request.errors.add(
+                'querystring', 'Validation Error',
+                'At least one filter is required to delete by filter')
+            self.request.errors.status = 400
+            return 0
+
+        pks_names = Model.get_primary_keys()
+        columns = [getattr(Model, x) for x in pks_names]
+        query = self.update_collection_delete_filter(Model.query(*columns))
+        query = querystring.update_sqlalchemy_query(query, only_filter=True)
+        if self.request.errors:
+            return 0
+
+        # the IN compares the primary keys with an explicit SELECT of the
+        # primary keys, whatever the entities of the filtered query
+        column = columns[0] if len(columns) == 1 else tuple_(*columns)
+        query = Model.query().filter(column.in_(
+            query.with_entities(*columns).subquery().select()))
+        if type(self).delete_entry is not CrudResource.delete_entry:
+            # the entries are loaded by the filtered query, in one SELECT
+            entries = query.all()
+            for entry in entries:
+                self.delete_entry(entry)
+
+            return len(entries)
+
+        self.invalidate_response_cache(Model)
+        return query.delete(synchronize_session=False)
+
+    def is_delete_by_filter(self):
+        return bool(
+            self.allow_collection_delete_by_filter and
+            not self.body and self.request.params)
+
     @cornice_view(validators=(collection_delete_validator,),
                   permission="delete")
     def collection_delete(self):
@@ -748,7 +1869,10 @@ class CrudResource:
         if not self.request.errors:
             Model = self.get_model('collection_delete')
             with saved_errors_in_request(self.request):
-                count = self.delete_entries(Model, self.body)
+                if self.is_delete_by_filter():
+                    count = self.delete_entries_by_filter(Model)
+                else:
+                    count = self.delete_entries(Model, self.body)
 
         return count
 
@@ -756,12 +1880,22 @@ class CrudResource:
     def get(self):
         self.view_is_activated(self.has_get)
         if not self.request.errors:
+            cached = self.get_cached_response('get')
+            if cached is not None:
+                return cached
+
             Model = self.get_model('get')
             item = get_item(self.request, Model)
             if item:
-                return self.serialize('get', item)
+                not_modified = self.get_item_not_modified_response('get', item)
+                if not_modified is not None:
+                    return not_modified
+
+                return self.set_cached_response(
+                    'get', self.serialize('get', item))
 
     def delete_entry(self, item):
+        self.invalidate_response_cache(item)
         item.delete()
 
     @cornice_view(validators=(delete_validator,), permission="delete")
@@ -780,6 +1914,7 @@ class CrudResource:
 
     def update(self, item, params=None):
         if params:
+            self.invalidate_response_cache(item)
             item.update(**params)
 
     @cornice_view(validators=(patch_validator,), permission="update")
@@ -810,13 +1945,65 @@ class CrudResource:
 
                 return self.serialize('put', item)
 
+    def job_is_available(self):
+        """Return True if the model and the route of the jobs are installed
+        """
+        if 'Model.RestApi.Job' not in self.registry.loaded_namespaces:
+            return False
+
+        mapper = self.request.registry.queryUtility(IRoutesMapper)
+        return bool(mapper and mapper.get_route('rest_api_job'))
+
+    def enqueue_job(self, action):
+        """Save the call of the asynchronous action in a job, the job runner
+        executes it after the commit of the request
+
+        :param action: name of the method of the action
+        :rtype: dict, status of the job; the response is 202 with the
+                ``Location`` of the job, 501 if the blok ``rest-api-job``
+                is not installed
+        """
+        if self.request.errors:
+            return
+
+        if not self.job_is_available():
+            self.request.errors.add(
+                'url', 'Configuration error',
+                'The asynchronous action %r needs the blok rest-api-job' % (
+                    action))
+            self.request.errors.status = 501
+            return
+
+        cls = self.__class__
+        userid = self.request.authenticated_userid
+        if userid is not None:
+            userid = str(userid)
+
+        job = self.registry.RestApi.Job.insert(
+            resource='%s:%s' % (cls.__module__, cls.__qualname__),
+            action=action,
+            userid=userid,
+            path=dict(self.request.matchdict),
+            body=extract_cstruct(self.request)['body'])
+        runner = get_job_runner(self.request.registry.settings)
+        self.registry.postcommit_hook(
+            'Model.RestApi.Job', 'submit', job.uuid, runner)
+        response = self.request.response
+        response.status_int = 202
+        response.headers['Location'] = self.request.route_url(
+            'rest_api_job', uuid=str(job.uuid))
+        return job.to_dict()
+
     @classmethod
     def service(cls, name, permission=None, collection=False, path=None,
-                **kwargs):
+                async_=False, **kwargs):
         if permission is None:
             permission = name
 
         def wrapper(method):
+            if async_:
+                method = get_async_view(method)
+
             method.crud_resource_execute_name = name
             method.crud_resource_execute_path = path
 
@@ -827,6 +2014,11 @@ class CrudResource:
                 method.is_a_crud_resource_execute = True
                 validators = (execute_validator,)
 
+            if async_:
+                # the job runner validates the saved call like the view
+                method.crud_resource_execute_validator = validators[0]
+                method.crud_resource_execute_schema = kwargs.get('schema')
+
             add_view(method, validators=validators, permission=permission,
                      **kwargs)
             return method
@@ -0,0 +1,271 @@
+# This file is a part of the AnyBlok / Pyramid / REST api project
+#
+# This Source Code Form is subject to the terms of the Mozilla Public License,
+# v. 2.0. If a copy of the MPL was not distributed with this file,You can
+# obtain one at http://mozilla.org/MPL/2.0/.
+"""Job runner of the asynchronous actions of the CrudResource
+
+An action declared with ``CrudResource.service(..., async_=True)`` saves the
+call in a ``Model.RestApi.Job`` (blok ``rest-api-job``) and answers 202 with
+the ``Location`` of the job. After the commit of the request, the job runner
+of the process executes the action and saves its result::
+
+    GET /jobs/{uuid}
+
+    {"id": "...", "status": "done", "result": ...}
+
+Settings:
+
+* ``rest_api.jobs.max_workers``: number of actions executed at the same
+  time by process, default ``4``
+* ``rest_api.jobs.path``: path of the status of the jobs, default
+  ``/jobs/{uuid}``
+* ``rest_api.jobs.stale_timeout``: when the application is created, the
+  jobs still pending or running and not changed since this number of
+  seconds are marked as failed, default ``3600``
+
+The action is executed with a ``JobRequest`` in place of the Pyramid
+request: its ``response`` is not sent to anybody and the methods which need
+the Pyramid configuration, like ``route_url``, are not available
+"""
+from concurrent.futures import ThreadPoolExecutor
+from importlib import import_module
+from threading import Lock
+from types import SimpleNamespace
+from uuid import UUID
+from cornice import Service
+from cornice.errors import Errors
+from anyblok.config import Configuration
+from anyblok_pyramid.common import get_registry_for
+from pyramid.events import ApplicationCreated
+from pyramid.httpexceptions import HTTPNotFound
+from pyramid.response import Response
+from logging import getLogger
+import transaction
+import json
+
+logger = getLogger(__name__)
+
+RUNNERS = {}
+RUNNERS_LOCK = Lock()
+
+
+class ThreadJobRunner:
+    """Execute the jobs in a pool of threads, the number of jobs executed
+    at the same time is bounded by ``max_workers``
+
+    Each thread has its own session of the registry and its own transaction
+    manager, the session is removed when the job is done
+    """
+
+    def __init__(self, max_workers=4):
+        self.executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix='rest-api-job')
+
+    def submit(self, registry, job_uuid):
+        return self.executor.submit(self.run, registry, job_uuid)
+
+    def run(self, registry, job_uuid):
+        try:
+            run_job(registry, job_uuid)
+        except Exception:
+            logger.exception('Job %s can not be executed', job_uuid)
+        finally:
+            transaction.manager.abort()
+            # the connection of the thread is given back to the pool
+            registry.Session.remove()
+
+
+def get_job_runner(settings):
+    """Return the job runner of the process, created at the first call,
+    after the fork of the workers
+
+    :param settings: Pyramid settings
+    """
+    max_workers = int(settings.get('rest_api.jobs.max_workers', 4))
+    runner = RUNNERS.get(max_workers)
+    if runner is None:
+        with RUNNERS_LOCK:
+            runner = RUNNERS.get(max_workers)
+            if runner is None:
+                runner = RUNNERS[max_workers] = ThreadJobRunner(max_workers)
+
+    return runner
+
+
+class JobRequest:
+    """Request given to the resource by the job runner, built from the call
+    saved in the job
+
+    The ``response`` is only kept to let the actions set it, the finished
+    callbacks are called once the transaction of the action is committed or
+    aborted. ``route_url`` and the other methods which need the Pyramid
+    configuration are not available
+
+    :param registry: AnyBlok registry
+    :param job: ``Model.RestApi.Job`` instance
+    """
+
+    def __init__(self, registry, job):
+        self.anyblok = SimpleNamespace(registry=registry)
+        self.matchdict = dict(job.path or {})
+        self.params = {}
+        self.validated = {}
+        self.errors = Errors()
+        self.authenticated_userid = job.userid
+        self.response = Response()
+        self.finished_callbacks = []
+        self.job = job
+
+    def add_finished_callback(self, callback):
+        self.finished_callbacks.append(callback)
+
+    def process_finished_callbacks(self):
+        while self.finished_callbacks:
+            self.finished_callbacks.pop(0)(self)
+
+
+def get_resource_class(name):
+    """Return the resource class from its name ``module:qualname``"""
+    module, qualname = name.split(':')
+    cls = import_module(module)
+    for attr in qualname.split('.'):
+        cls = getattr(cls, attr)
+
+    return cls
+
+
+def execute_job(registry, job, request=None):
+    """Validate the saved call like the synchronous view, and execute the
+    action
+
+    :param request: ``JobRequest`` of the job, built if None
+    :rtype: the result of the action
+    """
+    cls = get_resource_class(job.resource)
+    view = getattr(cls, job.action)
+    if request is None:
+        request = JobRequest(registry, job)
+
+    def deserializer(request):
+        return {'path': request.matchdict, 'body': job.body}
+
+    view.crud_resource_execute_validator(
+        request, deserializer=deserializer, klass=cls,
+        schema=view.crud_resource_execute_schema)
+    if request.errors:
+        raise ValueError(json.dumps(request.errors))
+
+    result = view.__wrapped__(cls(request))
+    if request.errors:
+        raise ValueError(json.dumps(request.errors))
+
+    return result
+
+
+def run_job(registry, job_uuid, transaction_manager=None):
+    """Execute the job and save its result, or its error
+
+    The status, the action and the error are done in their own
+    transaction, begun and committed or aborted by the transaction manager
+    like a request of ``pyramid_tm``
+
+    :param registry: AnyBlok registry
+    :param job_uuid: uuid of the ``Model.RestApi.Job``
+    :param transaction_manager: manager of the transactions, by default the
+                                one of the thread
+    """
+    if transaction_manager is None:
+        transaction_manager = transaction.manager
+
+    Job = registry.RestApi.Job
+    with transaction_manager:
+        job = Job.query().get(job_uuid)
+        if job is None or job.status != 'pending':
+            return
+
+        job.status = 'running'
+
+    request = None
+    try:
+        with transaction_manager:
+            job = Job.query().get(job_uuid)
+            request = JobRequest(registry, job)
+            job.result = execute_job(registry, job, request)
+            job.status = 'done'
+    except Exception as e:
+        logger.exception('Job %s failed', job_uuid)
+        with transaction_manager:
+            job = Job.query().get(job_uuid)
+            job.status = 'failed'
+            job.error = str(e)
+    finally:
+        if request is not None:
+            request.process_finished_callbacks()
+
+
+def get_job(request):
+    try:
+        job_uuid = UUID(request.matchdict['uuid'])
+    except ValueError:
+        raise HTTPNotFound()
+
+    registry = request.anyblok.registry
+    job = registry.RestApi.Job.query().get(job_uuid)
+    if job is None:
+        raise HTTPNotFound()
+
+    # only the jobs without owner (no userid) are given to everybody
+    if job.userid:
+        userid = request.authenticated_userid
+        if userid is None or str(userid) != job.userid:
+            raise HTTPNotFound()
+
+    return job.to_dict()
+
+
+def fail_stale_jobs(event):
+    """Mark as failed the jobs of the databases of the configuration
+    interrupted by the stop of their process, they are not executed again
+
+    :param event: Pyramid ``ApplicationCreated`` event
+    """
+    from .pyramid_config import get_database_names
+
+    settings = event.app.registry.settings
+    stale_timeout = int(settings.get('rest_api.jobs.stale_timeout', 3600))
+    Registry = Configuration.get('Registry')
+    for dbname in get_database_names():
+        if not Registry.db_exists(db_name=dbname):
+            continue
+
+        registry = get_registry_for(dbname)
+        try:
+            if 'Model.RestApi.Job' not in registry.loaded_namespaces:
+                continue
+
+            count = registry.RestApi.Job.fail_stale_jobs(stale_timeout)
+            registry.commit()
+            if count:
+                logger.warning('%d interrupted jobs of %r are failed',
+                               count, dbname)
+        except Exception:
+            registry.rollback()
+            logger.exception('The stale jobs of %r can not be failed', dbname)
+        finally:
+            registry.session.close()
+
+
+def includeme(config):
+    """Add the service of the status of the jobs in the pyramid
+    configuration
+
+    :param config: Pyramid configurator instance
+    """
+    path = config.get_settings().get('rest_api.jobs.path', '/jobs/{uuid}')
+    jobs = Service(name='rest_api_job', path=path,
+                   description='Status of the asynchronous actions',
+                   installed_blok='rest-api-job')
+    jobs.add_view('GET', get_job)
+    config.add_cornice_service(jobs)
+    config.add_subscriber(fail_stale_jobs, ApplicationCreated)
@@ -5,11 +5,61 @@
 # This Source Code Form is subject to the terms of the Mozilla Public License,
 # v. 2.0. If a copy of the MPL was not distributed with this file,You can
 # obtain one at http://mozilla.org/MPL/2.0/.
+from anyblok.config import Configuration
+from anyblok_pyramid.common import get_registry_for
+from pyramid.events import ApplicationCreated
+from pyramid.settings import asbool
+from logging import getLogger
+
+logger = getLogger(__name__)
+
+
+def get_database_names():
+    """Return the names of the databases of the configuration"""
+    dbnames = list(Configuration.get('db_names') or [])
+    dbname = Configuration.get('db_name')
+    if dbname not in dbnames:
+        dbnames.append(dbname)
+
+    return [x for x in dbnames if x]
+
+
+def warm_up_databases(event):
+    """Warm up the resources for each database of the configuration,
+    before the first request
+
+    :param event: Pyramid ``ApplicationCreated`` event
+    """
+    from .crud_resource import warm_up_resources
+
+    Registry = Configuration.get('Registry')
+    for dbname in get_database_names():
+        if not Registry.db_exists(db_name=dbname):
+            logger.warning("The database %r does not exist", dbname)
+            continue
+
+        registry = get_registry_for(dbname)
+        try:
+            warm_up_resources(registry)
+        finally:
+            registry.rollback()
+            registry.session.close()
 
 
 def pyramid_cornice(config):
     """Add cornice includeme in pyramid configuration
 
+    With the setting ``rest_api.warm_up`` the resources are warmed up when
+    the application is created, before the workers are forked if the
+    application is preloaded. With the setting ``rest_api.batch`` the batch
+    service is added
+
     :param config: Pyramid configurator instance
     """
     config.include("cornice")
+    settings = config.get_settings()
+    if asbool(settings.get('rest_api.warm_up', False)):
+        config.add_subscriber(warm_up_databases, ApplicationCreated)
+
+    if asbool(settings.get('rest_api.batch', False)):
+        config.include('anyblok_pyramid_rest_api.batch')
@@ -7,13 +7,207 @@
 # v. 2.0. If a copy of the MPL was not distributed with this file,You can
 # obtain one at http://mozilla.org/MPL/2.0/.
 from .validator import (
-    FILTER_OPERATORS, ORDER_BY_OPERATORS, deserialize_querystring
+    ORDER_BY_OPERATORS, deserialize_querystring
 )
-from sqlalchemy import or_, and_
+from .cache import RegistryCache
+from sqlalchemy import or_, and_, inspect, func, text
+from sqlalchemy.orm import joinedload, selectinload, load_only, aliased
+from base64 import urlsafe_b64encode, urlsafe_b64decode
+from decimal import Decimal, InvalidOperation
+from dateutil.parser import parse as parse_datetime
+from uuid import UUID
 from logging import getLogger
+import json
 logger = getLogger(__name__)
 
 
+def encode_cursor(values):
+    """Return the opaque token of the values of a cursor"""
+    values = json.dumps(values, default=str, separators=(',', ':'))
+    return urlsafe_b64encode(values.encode('utf-8')).decode('ascii')
+
+
+def decode_cursor(cursor):
+    """Return the values of a cursor from its opaque token"""
+    values = json.loads(urlsafe_b64decode(cursor.encode('ascii')))
+    if not isinstance(values, list):
+        raise ValueError('The cursor must be a list of values')
+
+    return values
+
+
+def get_mapped_class(model):
+    """Return the model of an alias, or the model itself"""
+    return getattr(inspect(model, raiseerr=False), 'class_', model)
+
+
+def to_boolean(value):
+    if isinstance(value, bool):
+        return value
+
+    if str(value).lower() in ('true', 't', '1', 'yes'):
+        return True
+
+    if str(value).lower() in ('false', 'f', '0', 'no'):
+        return False
+
+    raise ValueError('%r is not a boolean' % value)
+
+
+def to_decimal(value):
+    try:
+        return Decimal(value)
+    except InvalidOperation:
+        raise ValueError('%r is not a decimal' % value)
+
+
+def to_integer(bits):
+    """Return the coercer of the integers stored on ``bits`` bits"""
+    limit = 2 ** (bits - 1)
+
+    def coerce(value):
+        value = int(value)
+        if not -limit <= value < limit:
+            raise ValueError('%r is out of range' % value)
+
+        return value
+
+    return coerce
+
+
+def to_date(value):
+    return parse_datetime(value).date()
+
+
+def to_time(value):
+    return parse_datetime(value).time()
+
+
+# coercers of the values of the filters by type of AnyBlok field
+COERCERS = {
+    'Integer': to_integer(32),
+    'BigInteger': to_integer(64),
+    'SmallInteger': to_integer(16),
+    'Float': float,
+    'Decimal': to_decimal,
+    'Boolean': to_boolean,
+    'DateTime': parse_datetime,
+    'Date': to_date,
+    'Time': to_time,
+    'UUID': UUID,
+}
+# coercers by python type, for the columns without AnyBlok field
+CONVERTERS = {
+    int: int,
+    float: float,
+    Decimal: to_decimal,
+    bool: to_boolean,
+}
+
+
+def coerce_values(coercer, key, values):
+    """Coerce the string values of the querystring, so the database gets
+    typed parameters
+
+    :param coercer: tuple (name of the type, callable) or None
+    :param key: name of the column, for the error
+    :param values: list of the values
+    :rtype: list of the coerced values
+    """
+    if coercer is None:
+        return values
+
+    type_name, coerce = coercer
+    res = []
+    for value in values:
+        if isinstance(value, str):
+            try:
+                value = coerce(value)
+            except (ValueError, OverflowError):
+                raise ValueError('Filter %r: %r is not a valid %s' % (
+                    key, value, type_name))
+
+        res.append(value)
+
+    return res
+
+
+def between(column, values):
+    if len(values) != 2:
+        raise ValueError(
+            "Filter 'between' except two comma separated values")
+
+    return column.between(*values)
+
+
+def is_null(column, value):
+    return column.is_(None) if value else column.isnot(None)
+
+
+def escape_like(value):
+    """Escape the wildcards of the value, the escape character is ``/``"""
+    return value.replace('/', '//').replace('%', '/%').replace('_', '/_')
+
+
+def istartswith(column, value):
+    return column.ilike(escape_like(value) + '%', escape='/')
+
+
+def iendswith(column, value):
+    return column.ilike('%' + escape_like(value), escape='/')
+
+
+def icontains(column, value):
+    return column.ilike('%' + escape_like(value) + '%', escape='/')
+
+
+# name: (kind of the value, factory of the condition from the column and
+# the value). The kind gives how the value of the querystring is prepared:
+# * value: converted with the python type of the column
+# * pattern: kept as string
+# * values: comma separated values, converted with the python type of the
+#   column
+# * boolean: true or false
+# * search: the condition depends on the text index of the column, see
+#   ``QueryString.get_search_condition``
+OPERATORS = {
+    'eq': ('value', lambda column, value: column == value),
+    'ne': ('value', lambda column, value: column != value),
+    'lt': ('value', lambda column, value: column < value),
+    'lte': ('value', lambda column, value: column <= value),
+    'gt': ('value', lambda column, value: column > value),
+    'gte': ('value', lambda column, value: column >= value),
+    'like': ('pattern', lambda column, value: column.like(
+        '%' + value + '%')),
+    'ilike': ('pattern', lambda column, value: column.ilike(
+        '%' + value + '%')),
+    'startswith': ('pattern', lambda column, value: column.startswith(
+        value, autoescape=True)),
+    'istartswith': ('pattern', istartswith),
+    'endswith': ('pattern', lambda column, value: column.endswith(
+        value, autoescape=True)),
+    'iendswith': ('pattern', iendswith),
+    'contains': ('pattern', lambda column, value: column.contains(
+        value, autoescape=True)),
+    'icontains': ('pattern', icontains),
+    'pattern': ('pattern', lambda column, value: column.like(value)),
+    'ipattern': ('pattern', lambda column, value: column.ilike(value)),
+    'search': ('search', None),
+    'in': ('values', lambda column, values: column.in_(values)),
+    'not_in': ('values', lambda column, values: column.notin_(values)),
+    'between': ('values', between),
+    'is_null': ('boolean', is_null),
+}
+# kinds of the text indexes which can be declared by the resources
+TEXT_INDEXES = ('btree', 'trigram', 'fulltext')
+# types of the AnyBlok relationships which target several entries
+TO_MANY_TYPES = ('One2Many', 'Many2Many')
+# kinds of the operators allowed with ``or-``
+OR_KINDS = ('value', 'pattern')
+# part of a plan which is not computed yet
+NOT_PLANNED = object()
+
+
 class QueryString:
     """Parse the validated querystring from the request to generate a
     SQLAlchemy query
@@ -21,11 +215,29 @@ class QueryString:
     :param request: validated request from pyramid
     :param Model: AnyBlok Model, use to create the query
     :param adapter: Adapter to help to generate query on some filter of tags
+    :param plans: LRUCache of the plans by shape of querystring, a plan
+                  keeps the models crossed by the keys, the aliases of the
+                  joins and the operators
+    :param include: dict {relationship path: many} of the relationships
+                    always loaded with the entries
     """
-    def __init__(self, request, Model, adapter=None):
+
+    REMOTE_MODELS = RegistryCache()
+    EXTENSIONS = RegistryCache()
+    FIELD_COERCERS = RegistryCache()
+    FIELD_TYPES = RegistryCache()
+
+    def __init__(self, request, Model, adapter=None, plans=None,
+                 include=None, text_indexes=None):
         self.request = request
         self.adapter = adapter
+        self.text_indexes = text_indexes or {}
         self.Model = Model
+        self.plan = {}
+        self.joins = {}
+        self.default_include = include or {}
+        self.include = []
+        self.fields = []
         if request.params is not None:
             parsed_params = deserialize_querystring(request.params)
             self.filter_by = parsed_params.get('filter_by', [])
@@ -44,15 +256,67 @@ class QueryString:
             if self.offset and isinstance(self.offset, str):
                 self.offset = int(self.offset)
 
+            self.cursor = parsed_params.get('cursor')
+            self.include = parsed_params.get('include', [])
+            self.fields = parsed_params.get('fields', [])
+
+            if plans is not None:
+                shape = self.get_shape()
+                self.plan = plans.get(shape)
+                if self.plan is None:
+                    self.plan = {}
+                    plans.set(shape, self.plan)
+
+    def get_shape(self):
+        """Return the signature of the querystring without the values
+
+        Two querystrings with the same shape use the same keys, relationships
+        and operators, so they have the same plan, see ``get_planned``
+        """
+        def entries_shape(entries):
+            return tuple(
+                (x.get('key'), x.get('op'), x.get('mode')) for x in entries)
+
+        def composite_shape(composite_filter):
+            filters = composite_filter.get('filters') or [[]]
+            return (entries_shape(filters[0]), composite_filter.get('mode'))
+
+        return (
+            self.Model.__registry_name__,
+            entries_shape(self.filter_by),
+            composite_shape(self.filter_by_primary_keys),
+            tuple(composite_shape(x) for x in self.composite_filter_by),
+            entries_shape(self.order_by),
+            tuple(self.tags),
+            tuple(self.include),
+        )
+
+    def get_planned(self, key, compute, *args):
+        """Return a part of the plan of the querystring, computed the first
+        time the shape of the querystring is seen
+
+        :param key: key of the part in the plan
+        :param compute: callable which computes the part from ``args``
+        """
+        value = self.plan.get(key, NOT_PLANNED)
+        if value is NOT_PLANNED:
+            value = self.plan[key] = compute(*args)
+
+        return value
+
     def update_sqlalchemy_query(self, query, only_filter=False):
+        self.joins = {}
         query = self.from_filter_by(query)
         query = self.from_filter_by_primary_keys(query)
         query = self.from_composite_filter_by(query)
         query = self.from_tags(query)
         if not only_filter:
             query = self.from_order_by(query)
+            query = self.from_cursor(query)
             query = self.from_limit(query)
             query = self.from_offset(query)
+            query = self.from_include(query)
+            query = self.from_fields(query)
 
         return query
 
@@ -63,7 +327,9 @@ class QueryString:
             value = item.get('value')
             mode = item.get('mode', 'include')
             # Is operator valid?
-            if op not in FILTER_OPERATORS:
+            if not (
+                self.has_specific_filter(key, op) or self.is_operator(op)
+            ):
                 self.request.errors.add(
                     'querystring',
                     '400 Bad Request', 'Filter %r does not exist.' % op)
@@ -77,25 +343,13 @@ class QueryString:
             elif self.has_specific_filter(key, op):
                 query = self.specific_filter(query, key, op, value, mode)
             else:
-                res = self.get_model_and_key_from_relationship(
-                    query, self.Model, key.split('.'))
-                if isinstance(res, tuple):
-                    _query, _model, _key = res
-                    condition = self.update_filter(_model, _key, op, value)
-                    if condition is not None:
-                        if mode == 'include':
-                            query = _query.filter(condition)
-                        elif mode == 'exclude':
-                            query = _query.filter(~condition)
-
-                    if '.' in key:
-                        query = query.reset_joinpoint()
-                else:
-                    self.request.errors.add(
-                        'querystring',
-                        '400 Bad Request',
-                        "Filter %r: %s" % (key, res))
-                    self.request.errors.status = 400
+                query, conditions = self.get_filter_conditions(
+                    query, [item])
+                for condition in conditions:
+                    if mode == 'include':
+                        query = query.filter(condition)
+                    elif mode == 'exclude':
+                        query = query.filter(~condition)
 
         return query
 
@@ -166,36 +420,19 @@ class QueryString:
             return and_(*where_clauses)
 
     def compute_composite_filters(self, query, composite_filters, mode):
-        reset_joinpoint = False
         where_clauses = []
         for composite_filter in composite_filters:
-            filters = []
             for entry in composite_filter:
-                key = entry['key']
                 op = entry['op']
-                value = entry['value']
-                if op not in FILTER_OPERATORS:
+                if not self.is_operator(op):
                     self.request.errors.add(
                         'querystring',
                         '400 Bad Request', 'Filter %r does not exist.' % op)
                     self.request.errors.status = 400
                     return
 
-                res = self.get_model_and_key_from_relationship(
-                    query, self.Model, key.split('.'))
-                if isinstance(res, tuple):
-                    query, _model, _key = res
-                    filters.append(self.update_filter(_model, _key, op, value))
-                    if '.' in key:
-                        reset_joinpoint = True
-
-                else:
-                    self.request.errors.add(
-                        'querystring',
-                        '400 Bad Request',
-                        "Filter %r: %s" % (key, res))
-                    self.request.errors.status = 400
-
+            query, filters = self.get_filter_conditions(
+                query, composite_filter)
             if not filters:
                 continue
 
@@ -212,11 +449,84 @@ class QueryString:
             query = query.filter(self.compute_composite_filters_where_clause(
                 where_clauses, mode))
 
-        if reset_joinpoint:
-            query = query.reset_joinpoint()
-
         return query
 
+    def get_filter_conditions(self, query, filters):
+        """Return the conditions of the filters, they are true together
+
+        The relationships of the dotted keys are joined until the first
+        to-many relationship, see ``join_relationship``. From it, the
+        condition is a correlated ``EXISTS`` (``any`` / ``has``), so the
+        entries are not duplicated and ``~filter`` gives ``NOT EXISTS``.
+        The filters on the same to-many path are checked by the same
+        ``EXISTS``: one related entry must match all of them
+
+        :param query: SQLAlchemy query, the relationships are joined on it
+        :param filters: list of dict(key, op, value)
+        :rtype: tuple (query, list of conditions)
+        """
+        conditions = []
+        exists = {}
+        for entry in filters:
+            key, op, value = entry['key'], entry['op'], entry['value']
+            keys = key.split('.')
+            models = self.resolve_relationship(self.Model, keys)
+            if isinstance(models, str):
+                self.add_filter_error("Filter %r: %s" % (key, models))
+                continue
+
+            index = self.get_planned(
+                ('to_many', models[0].__registry_name__, tuple(keys)),
+                self.get_to_many_index, models, keys)
+            if index is None:
+                query, entity = self.join_relationship(query, models, keys)
+                conditions.append(
+                    self.update_filter(entity, keys[-1], op, value))
+                continue
+
+            query, entity = self.join_relationship(
+                query, models[:index + 1], keys[:index + 1])
+            path = tuple(keys[:index + 1])
+            exists.setdefault(path, (entity, []))[1].append(
+                self.get_exists_condition(
+                    models[index + 1:], keys[index + 1:], op, value))
+
+        for path, (entity, sub_conditions) in exists.items():
+            sub_conditions = [x for x in sub_conditions if x is not None]
+            if sub_conditions:
+                conditions.append(
+                    getattr(entity, path[-1]).any(and_(*sub_conditions)))
+
+        return query, [x for x in conditions if x is not None]
+
+    def get_to_many_index(self, models, keys):
+        """Return the index of the first to-many relationship of the keys
+
+        :rtype: int or None if the relationships are to-one
+        """
+        for index, (model, key) in enumerate(zip(models, keys[:-1])):
+            if self.is_to_many(model, key):
+                return index
+
+        return None
+
+    def get_exists_condition(self, models, keys, op, value):
+        """Return the condition of the filter from the first model, the
+        relationships are checked by ``any`` or ``has``
+        """
+        if len(keys) == 1:
+            return self.update_filter(models[0], keys[0], op, value)
+
+        condition = self.get_exists_condition(models[1:], keys[1:], op, value)
+        if condition is None:
+            return None
+
+        relationship = getattr(models[0], keys[0])
+        if self.is_to_many(models[0], keys[0]):
+            return relationship.any(condition)
+
+        return relationship.has(condition)
+
     def has_specific_filter(self, key, op):
         if self.adapter is None:
             return False
@@ -342,15 +652,12 @@ class QueryString:
             elif self.has_specific_order_by(key):
                 query = self.specific_order_by(query, key, op)
             else:
-                res = self.get_model_and_key_from_relationship(
-                    query, self.Model, key.split('.'))
+                res = self.get_entity_and_key_from_relationship(
+                    query, key.split('.'))
                 if isinstance(res, tuple):
-                    _query, _model, _key = res
+                    _query, entity, _key = res
                     query = _query.order_by(
-                        getattr(getattr(_model, _key), op)())
-
-                    if '.' in key:
-                        query = query.reset_joinpoint()
+                        getattr(getattr(entity, _key), op)())
                 else:
                     self.request.errors.add(
                         'querystring',
@@ -360,6 +667,110 @@ class QueryString:
 
         return query
 
+    def from_include(self, query):
+        """Load the included relationships with the entries
+
+        The relationships are given by the resource (``include`` parameter)
+        and by the ``include`` entry of the querystring. The to-many
+        relationships are loaded by ``selectinload`` and the to-one
+        relationships by ``joinedload``
+        """
+        paths = dict(self.default_include)
+        for include in self.include:
+            paths.setdefault(tuple(include.split('.')), None)
+
+        loaders = []
+        for path in sorted(paths):
+            if any(x[:len(path)] == path for x in paths if x != path):
+                # the relationship is loaded by the longest path
+                continue
+
+            models = self.resolve_relationship(self.Model, list(path))
+            if (
+                not isinstance(models, str) and
+                self.get_remote_model_for(models[-1], path[-1]) is None
+            ):
+                models = '%r in model %s is not a relationship.' % (
+                    path[-1], models[-1])
+
+            if isinstance(models, str):
+                if path in self.default_include:
+                    # not a relationship of the model, dumped by the schema
+                    continue
+
+                self.request.errors.add(
+                    'querystring',
+                    '400 Bad Request',
+                    "Include %r: %s" % ('.'.join(path), models))
+                self.request.errors.status = 400
+                continue
+
+            loaders.append(self.get_include_loader(models, path, paths))
+
+        if loaders:
+            query = query.options(*loaders)
+
+        return query
+
+    def get_include_loader(self, models, path, paths):
+        """Return the loader option of the relationship path
+
+        :param models: models crossed by the path
+        :param path: tuple of the relationship names
+        :param paths: dict {relationship path: many or None}, when
+                      ``many`` is None the relationship decides
+        """
+        loader = None
+        for index, (model, key) in enumerate(zip(models, path)):
+            attribute = getattr(model, key)
+            many = paths.get(path[:index + 1])
+            if many is None:
+                many = attribute.property.uselist
+
+            if loader is None:
+                loader = selectinload if many else joinedload
+            else:
+                loader = loader.selectinload if many else loader.joinedload
+
+            loader = loader(attribute)
+
+        return loader
+
+    def from_fields(self, query):
+        """Load only the columns needed by the fields of the querystring
+
+        The primary keys, the foreign keys of the relationships and the
+        keys of the cursor are always loaded. If a field is neither a
+        column nor a relationship, it may need any column, all the columns
+        are loaded
+        """
+        if not self.fields:
+            return query
+
+        mapper = inspect(self.Model)
+        columns = {x.key for x in mapper.column_attrs}
+        relationships = {x.key: x for x in mapper.relationships}
+        if any(x not in columns and x not in relationships
+               for x in self.fields):
+            return query
+
+        names = set(self.Model.get_primary_keys())
+        for field in self.fields:
+            if field in columns:
+                names.add(field)
+            else:
+                for column in relationships[field].local_columns:
+                    prop = mapper.get_property_by_column(column)
+                    if prop is not None:
+                        names.add(prop.key)
+
+        if self.cursor is not None:
+            keys = self.get_cursor_keys()
+            if not isinstance(keys, str):
+                names.update(key for key, _ in keys)
+
+        return query.options(load_only(*sorted(names & columns)))
+
     def from_limit(self, query):
         if self.limit:
             query = query.limit(self.limit)
@@ -367,52 +778,364 @@ class QueryString:
         return query
 
     def from_offset(self, query):
-        if self.offset:
+        if self.offset and self.cursor is None:
             query = query.offset(self.offset)
 
         return query
 
-    def update_or_filter(self, model, key, op, value):
-        if not value:
+    def get_cursor_keys(self):
+        """Return the keys and the operators of the seek predicate, the
+        order_by of the querystring followed by the primary keys
+
+        The seek predicate compares the values, an entry with a NULL value
+        would never be found, so the nullable columns are not allowed
+
+        :rtype: list of tuple (key, op) or an error message
+        """
+        columns = inspect(self.Model).columns
+        keys = []
+        for item in self.order_by:
+            key = item.get('key')
+            if (
+                not key or '.' in key or self.has_specific_order_by(key) or
+                key not in self.Model.fields_description() or
+                key not in columns
+            ):
+                return (
+                    "The cursor pagination needs order_by on the columns of "
+                    "the model, %r is not allowed" % key)
+
+            if columns[key].nullable:
+                return (
+                    "The cursor pagination needs order_by on the not "
+                    "nullable columns of the model, %r is nullable" % key)
+
+            keys.append((key, item.get('op')))
+
+        ordered_keys = [x[0] for x in keys]
+        for key in sorted(self.Model.get_primary_keys()):
+            if key not in ordered_keys:
+                keys.append((key, 'asc'))
+
+        return keys
+
+    def from_cursor(self, query):
+        """Seek the entries after the cursor
+
+        The cursor is the opaque token of the values of the order_by keys and
+        of the primary keys of the last entry of the previous page, the
+        entries are filtered with a seek predicate in place of an offset.
+        The values are coerced with the type of the columns like the values
+        of the filters
+        """
+        if self.cursor is None:
+            return query
+
+        keys = self.get_cursor_keys()
+        if isinstance(keys, str):
+            self.request.errors.add('querystring', '400 Bad Request', keys)
+            self.request.errors.status = 400
+            return query
+
+        ordered_keys = [x.get('key') for x in self.order_by]
+        query = query.order_by(*[
+            getattr(getattr(self.Model, key), op)()
+            for key, op in keys if key not in ordered_keys
+        ])
+        if not self.cursor:
+            # first page
+            return query
+
+        try:
+            values = self.get_cursor_values(keys)
+        except Exception as e:
+            logger.exception(str(e))
+            values = None
+
+        if values is None:
             self.request.errors.add(
                 'querystring', '400 Bad Request',
-                'not splitting entries for %r: %r' % (key, value)
-            )
+                'Invalid cursor %r' % self.cursor)
             self.request.errors.status = 400
-            return
-        return or_(*[
-            self.update_filter(model, key, op, v.strip())
-            for v in value.split(',')
-        ])
+            return query
 
-    def update_filter(self, model, key, op, value):
-        if op == "eq":
-            return getattr(model, key) == value
-        elif op in ("like", "ilike"):
-            return getattr(getattr(model, key), op)("%" + value + "%")
-        elif op == "lt":
-            return getattr(model, key) < value
-        elif op == "lte":
-            return getattr(model, key) <= value
-        elif op == "gt":
-            return getattr(model, key) > value
-        elif op == "gte":
-            return getattr(model, key) >= value
-        elif op == "in":
-            # ensure we have a comma separated value string...
-            if value:
-                values = value.split(',')
-                return getattr(model, key).in_(values)
-            error = 'Filter %r except a comma separated string value' % op
-        elif op.startswith("or-"):
-            return self.update_or_filter(model, key, op.split('-')[1], value)
+        where_clauses = []
+        for index, (key, op) in enumerate(keys):
+            column = getattr(self.Model, key)
+            equals = [
+                getattr(self.Model, keys[i][0]) == values[i]
+                for i in range(index)
+            ]
+            if op == 'desc':
+                where_clauses.append(and_(*equals, column < values[index]))
+            else:
+                where_clauses.append(and_(*equals, column > values[index]))
+
+        return query.filter(or_(*where_clauses))
+
+    def get_cursor_values(self, keys):
+        """Return the values of the cursor, coerced with the type of the
+        columns of the keys
+
+        :param keys: list of tuple (key, op), see ``get_cursor_keys``
+        :rtype: list of the values or None if the cursor is invalid
+        """
+        values = decode_cursor(self.cursor)
+        if len(values) != len(keys) or None in values:
+            return None
+
+        return [
+            coerce_values(
+                self.get_coercer(
+                    self.Model, key, getattr(self.Model, key)), key, [value])[0]
+            for (key, _), value in zip(keys, values)
+        ]
+
+    def get_next_cursor(self, entries):
+        """Return the cursor of the page after the entries
+
+        :param entries: entries of the current page
+        :rtype: the opaque token or None if there is no next page
+        """
+        if self.cursor is None or not self.limit:
+            return None
+
+        if len(entries) < self.limit:
+            return None
+
+        keys = self.get_cursor_keys()
+        if isinstance(keys, str):
+            return None
+
+        last = entries[-1]
+        return encode_cursor([getattr(last, key) for key, _ in keys])
+
+    def get_operator(self, op):
+        """Return the operator, the operators of the adapter overload the
+        operators of ``OPERATORS``. The operator is kept in the plan
+
+        :param op: name of the operator
+        :rtype: tuple (kind of value, factory) or None
+        """
+        return self.get_planned(('operator', op), self.find_operator, op)
 
+    def find_operator(self, op):
+        if self.adapter is not None and self.adapter.has_operator_for(op):
+            return self.adapter.get_operator_for(op)
+
+        return OPERATORS.get(op)
+
+    def is_operator(self, op):
+        if op.startswith('or-'):
+            operator = self.get_operator(op[3:])
+            return operator is not None and operator[0] in OR_KINDS
+
+        return self.get_operator(op) is not None
+
+    def add_filter_error(self, error):
         self.request.errors.add('querystring', '400 Bad Request', error)
         self.request.errors.status = 400
 
+    def update_or_filter(self, model, key, op, value):
+        if not value:
+            self.add_filter_error(
+                'not splitting entries for %r: %r' % (key, value))
+            return
+
+        operator = self.get_operator(op)
+        if operator is None or operator[0] not in OR_KINDS:
+            self.add_filter_error('Filter %r does not exist.' % ('or-' + op))
+            return
+
+        kind, factory = operator
+        column = getattr(model, key)
+        try:
+            values = [v.strip() for v in value.split(',')]
+            if kind == 'value':
+                values = coerce_values(
+                    self.get_coercer(model, key, column), key, values)
+
+            return or_(*[factory(column, v) for v in values])
+        except ValueError as e:
+            self.add_filter_error(str(e))
+
+    def get_coercer(self, model, key, column):
+        """Return the coercer of the values of the column
+
+        The coercer comes from the type of the AnyBlok field, or from the
+        python type of the column, it is cached by registry for each model
+        and column
+
+        :rtype: tuple (name of the type, callable) or None
+        """
+        model = get_mapped_class(model)
+        coercers = self.FIELD_COERCERS.get_cache(model.registry)
+        cache_key = (model.__registry_name__, key)
+        if cache_key not in coercers:
+            coercers[cache_key] = self.get_coercer_for(model, key, column)
+
+        return coercers[cache_key]
+
+    def get_coercer_for(self, model, key, column):
+        if hasattr(model, 'fields_description'):
+            description = model.fields_description(fields=[key]).get(key)
+            if description and description['type'] in COERCERS:
+                return description['type'], COERCERS[description['type']]
+
+        try:
+            python_type = column.type.python_type
+        except (AttributeError, NotImplementedError):
+            return None
+
+        if python_type in CONVERTERS:
+            return python_type.__name__, CONVERTERS[python_type]
+
+        return None
+
+    def prepare_value(self, model, key, column, op, kind, value):
+        """Return the value of the querystring for the kind of operator"""
+        if kind == 'value':
+            return coerce_values(
+                self.get_coercer(model, key, column), key, [value])[0]
+        elif kind == 'values':
+            # ensure we have a comma separated value string...
+            if not value:
+                raise ValueError(
+                    'Filter %r except a comma separated string value' % op)
+
+            if isinstance(value, str):
+                value = value.split(',')
+
+            return coerce_values(
+                self.get_coercer(model, key, column), key, value)
+        elif kind == 'boolean':
+            return to_boolean(value)
+
+        return value
+
+    def update_filter(self, model, key, op, value):
+        if op.startswith("or-"):
+            return self.update_or_filter(model, key, op[3:], value)
+
+        operator = self.get_operator(op)
+        if operator is None:
+            self.add_filter_error('Filter %r does not exist.' % op)
+            return
+
+        kind, factory = operator
+        column = getattr(model, key)
+        try:
+            value = self.prepare_value(model, key, column, op, kind, value)
+            if kind == 'search':
+                return self.get_search_condition(model, key, column, value)
+
+            return factory(column, value)
+        except ValueError as e:
+            self.add_filter_error(str(e))
+
+    def get_text_index(self, model, key):
+        """Return the text index declared by the resource for the column
+
+        :param model: AnyBlok Model of the column
+        :param key: name of the column
+        :rtype: tuple (kind of index, text search config) or (None, None)
+        """
+        for path, index in self.text_indexes.items():
+            names = path.split('.')
+            if names[-1] != key:
+                continue
+
+            target = self.Model
+            for fieldname in names[:-1]:
+                target = self.get_remote_model_for(target, fieldname)
+                if target is None:
+                    break
+
+            if (
+                target is not None and
+                target.__registry_name__ == model.__registry_name__
+            ):
+                if isinstance(index, (list, tuple)):
+                    return index[0], index[1]
+
+                return index, 'simple'
+
+        return None, None
+
+    def has_extension(self, registry, name):
+        """Return True if the PostgreSQL extension is installed, the
+        extensions are only queried once by registry
+        """
+        extensions = self.EXTENSIONS.get_cache(registry)
+        if 'names' not in extensions:
+            names = set()
+            if registry.engine.dialect.name == 'postgresql':
+                names = {
+                    x[0] for x in registry.execute(
+                        text('SELECT extname FROM pg_extension')).fetchall()
+                }
+
+            extensions['names'] = names
+
+        return name in extensions['names']
+
+    def get_search_condition(self, model, key, column, value):
+        """Return the cheapest condition for the index of the column
+
+        * ``btree``: prefix search, ``LIKE 'value%'``
+        * ``fulltext``: ``to_tsvector(config, column) @@
+          plainto_tsquery(config, value)``, PostgreSQL only
+        * ``trigram``: similarity ``column % value``, when the ``pg_trgm``
+          extension is installed
+        * otherwise: ``ILIKE '%value%'``
+        """
+        model = get_mapped_class(model)
+        index, config = self.get_text_index(model, key)
+        registry = model.registry
+        if index == 'btree':
+            return column.startswith(value, autoescape=True)
+        elif index == 'fulltext':
+            if registry.engine.dialect.name == 'postgresql':
+                return func.to_tsvector(config, column).op('@@')(
+                    func.plainto_tsquery(config, value))
+        elif index == 'trigram':
+            if self.has_extension(registry, 'pg_trgm'):
+                return column.op('%')(value)
+
+        return icontains(column, value)
+
     def get_remote_model_for(self, Model, fieldname):
+        """Return the model targeted by the relationship ``fieldname``
+
+        The name of the remote model is cached by registry, the
+        ``System.Field`` is only queried once by model and field name
+
+        :param Model: AnyBlok Model
+        :param fieldname: name of the relationship
+        :rtype: AnyBlok Model or None if the field is not a relationship
+        """
         registry = Model.registry
-        Field = registry.System.Field
+        remote_models = self.REMOTE_MODELS.get_cache(registry)
+        key = (Model.__registry_name__, fieldname)
+        if key not in remote_models:
+            remote_models[key] = self.get_remote_model_name_for(
+                Model, fieldname)
+
+        remote_model = remote_models[key]
+        if remote_model:
+            return registry.get(remote_model)
+
+        return None
+
+    def get_remote_model_name_for(self, Model, fieldname):
+        field = self.get_field_for(Model, fieldname)
+        if field and field.remote_model:
+            return field.remote_model
+
+        return None
+
+    def get_field_for(self, Model, fieldname):
+        Field = Model.registry.System.Field
         query = Field.query()
         models = [Model.__registry_name__]
         for base in Model.__anyblok_bases__:
@@ -420,28 +1143,153 @@ class QueryString:
 
         query = query.filter(Field.model.in_(models))
         query = query.filter(Field.name == fieldname)
-        field = query.first()
-        if field and field.remote_model:
-            return registry.get(field.remote_model)
+        return query.first()
 
-        return None
+    def is_to_many(self, Model, fieldname):
+        """Return True if the relationship ``fieldname`` targets several
+        entries
+
+        The type of the field is read from ``System.Field`` once by registry
+
+        :param Model: AnyBlok Model
+        :param fieldname: name of the relationship
+        :rtype: bool
+        """
+        field_types = self.FIELD_TYPES.get_cache(Model.registry)
+        key = (Model.__registry_name__, fieldname)
+        if key not in field_types:
+            field = self.get_field_for(Model, fieldname)
+            field_types[key] = field.ftype if field else None
+
+        return field_types[key] in TO_MANY_TYPES
+
+    @classmethod
+    def warm_up(cls, Model):
+        """Fill the caches of the fields of the model
+
+        ``System.Field`` and ``fields_description`` are read once for all
+        the fields of the model, instead of once by field at the first
+        requests
+
+        :param Model: AnyBlok Model
+        """
+        registry = Model.registry
+        Field = registry.System.Field
+        models = [Model.__registry_name__]
+        for base in Model.__anyblok_bases__:
+            models.append(base.__registry_name__)
+
+        remote_models = cls.REMOTE_MODELS.get_cache(registry)
+        field_types = cls.FIELD_TYPES.get_cache(registry)
+        for field in Field.query().filter(Field.model.in_(models)).all():
+            key = (Model.__registry_name__, field.name)
+            remote_models.setdefault(
+                key, getattr(field, 'remote_model', None) or None)
+            field_types.setdefault(key, field.ftype)
+
+        coercers = cls.FIELD_COERCERS.get_cache(registry)
+        for key, description in Model.fields_description().items():
+            if description['type'] in COERCERS:
+                coercers.setdefault(
+                    (Model.__registry_name__, key),
+                    (description['type'], COERCERS[description['type']]))
+
+    def get_models_from_relationship(self, model, keys):
+        """Return the models crossed by the dotted key
+
+        :param model: AnyBlok Model where the first key is
+        :param keys: list of the field names
+        :rtype: list of the models, one by key, or an error message
+        """
+        models = [model]
+        for index, key in enumerate(keys):
+            if not hasattr(model, 'fields_description'):
+                return '%r is not an SQL Model you should use Adapter' % model
+            if key not in model.fields_description():
+                return '%r does not exist in model %s.' % (key, model)
+
+            if index == len(keys) - 1:
+                break
+
+            remote_model = self.get_remote_model_for(model, key)
+            if remote_model is None:
+                return '%r in model %s is not a relationship.' % (key, model)
+
+            model = remote_model
+            models.append(model)
+
+        return models
+
+    def resolve_relationship(self, model, keys):
+        """Return the models crossed by the dotted key, from the plan of the
+        querystring if it is already resolved
+
+        :param model: AnyBlok Model where the first key is
+        :param keys: list of the field names
+        :rtype: list of the models, one by key, or an error message
+        """
+        key = (getattr(model, '__registry_name__', model), tuple(keys))
+        return self.get_planned(
+            key, self.get_models_from_relationship, model, keys)
+
+    def get_alias(self, model):
+        if hasattr(model, 'aliased'):
+            return model.aliased()
+
+        return aliased(model)
+
+    def join_relationship(self, query, models, keys):
+        """Join the relationships of the dotted key
+
+        The joins are planned by querystring: each relationship path is
+        joined once with an explicit alias, this alias is shared by the
+        filters, the composite filters and the orders on this path. The
+        joins are done on the query given to ``update_sqlalchemy_query``.
+        The aliases are kept in the plan, the querystrings of the same
+        shape reuse them with the columns already resolved on them
+
+        :param models: models crossed by the keys, see
+                       ``resolve_relationship``
+        :param keys: list of the field names
+        :rtype: tuple (query, alias of the last model)
+        """
+        entity = models[0]
+        for index, key in enumerate(keys[:-1]):
+            path = tuple(keys[:index + 1])
+            alias = self.joins.get(path)
+            if alias is None:
+                alias = self.joins[path] = self.get_planned(
+                    ('alias', models[0].__registry_name__, path),
+                    self.get_alias, models[index + 1])
+                query = query.join(alias, getattr(entity, key))
+
+            entity = alias
+
+        return query, entity
+
+    def get_entity_and_key_from_relationship(self, query, keys):
+        """Return the entity which owns the last key of the dotted key
+
+        :param query: SQLAlchemy query, the relationships are joined on it
+        :param keys: list of the field names, from ``self.Model``
+        :rtype: tuple (query, Model or alias, key) or an error message
+        """
+        models = self.resolve_relationship(self.Model, keys)
+        if isinstance(models, str):
+            return models
+
+        query, entity = self.join_relationship(query, models, keys)
+        return (query, entity, keys[-1])
 
     def get_model_and_key_from_relationship(self, query, model, keys,
                                             already_join=False):
-        key = keys[0]
-        if not hasattr(model, 'fields_description'):
-            return '%r is not an SQL Model you should use Adapter' % model
-        if key not in model.fields_description():
-            return '%r does not exist in model %s.' % (key, model)
+        models = self.resolve_relationship(model, keys)
+        if isinstance(models, str):
+            return models
 
-        if len(keys) == 1:
-            return (query, model, keys[0])
-        else:
-            field = getattr(model, key)
-            new_model = self.get_remote_model_for(model, key)
-            if new_model is None:
-                return '%r in model %s is not a relationship.' % (key, model)
+        for parent, key in zip(models, keys[:-1]):
+            query = query.join(
+                getattr(parent, key), aliased=True,
+                from_joinpoint=already_join)
 
-            query = query.join(field, aliased=True, from_joinpoint=already_join)
-            return self.get_model_and_key_from_relationship(
-                query, new_model, keys[1:], already_join=already_join)
+        return (query, models[-1], keys[-1])
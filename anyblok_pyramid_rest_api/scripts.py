@@ -0,0 +1,51 @@
+# This file is a part of the AnyBlok / Pyramid / REST API project
+#
+# This Source Code Form is subject to the terms of the Mozilla Public License,
+# v. 2.0. If a copy of the MPL was not distributed with this file,You can
+# obtain one at http://mozilla.org/MPL/2.0/.
+from anyblok import (
+    load_init_function_from_entry_points,
+    configuration_post_load,
+)
+from anyblok.blok import BlokManager
+from anyblok.config import Configuration
+from anyblok_pyramid.common import get_registry_for
+from anyblok_pyramid.pyramid_config import Configurator
+from .crud_resource import warm_up_resources
+import sys
+
+
+def warm_up():
+    """Console script: warm up the resources of the REST API and print the
+    duration by resource
+
+    The resources are the ones declared by the bloks of the pyramid
+    configuration, a resource which can not be warmed up is reported as
+    failed
+    """
+    load_init_function_from_entry_points()
+    argv = [] + sys.argv
+    Configuration.load('pyramid')
+    sys.argv = argv
+    configuration_post_load()
+    BlokManager.load()
+    config = Configurator()
+    config.include_from_entry_point()
+    config.load_config_bloks()
+
+    registry = get_registry_for(Configuration.get('db_name'))
+    failed = False
+    try:
+        for cls, duration in warm_up_resources(registry):
+            name = '%s.%s' % (cls.__module__, cls.__name__)
+            if duration is None:
+                failed = True
+                print('%s: failed' % name)
+            else:
+                print('%s: %.3fs' % (name, duration))
+    finally:
+        registry.rollback()
+        registry.session.close()
+
+    if failed:
+        sys.exit(1)
@@ -36,6 +36,12 @@ class ThingSchema(Schema):
     update_date = fields.DateTime(dump_only=True)
 
 
+class ThingPathSchema(Schema):
+    """Path schema for the Thing model
+    """
+    uuid = fields.UUID(required=True)
+
+
 class ThingRequestSchema(FullRequestSchema):
     """This one inherits FullRequestSchema and represents the request
     model.Thing
@@ -16,6 +16,7 @@ from anyblok_pyramid_rest_api.validator import (
     service_put_validator,
     service_delete_validator,
 )
+from anyblok_pyramid_rest_api.cache import MemoryResponseCache
 from anyblok_pyramid_rest_api.crud_resource import (
     CrudResource,
     get_items,
@@ -25,7 +26,7 @@ from anyblok_pyramid_rest_api.crud_resource import (
     delete_item,
 )
 from .schema import (ExampleSchema, ExamplePathSchema, ThingSchema,
-                     ThingRequestSchema, AnotherSchema)
+                     ThingPathSchema, ThingRequestSchema, AnotherSchema)
 
 
 @resource(collection_path='/examples', path='/examples/{id}',
@@ -41,6 +42,16 @@ class ExampleResource2(CrudResource):
     allow_unauthenticated_user_to_access_to_collection_get = True
 
 
+@resource(collection_path='/examples3/{name}', path='/examples3/{name}/{id}',
+          installed_blok=current_blok())
+class ExampleResource3(CrudResource):
+    model = 'Model.Example'
+    allow_unauthenticated_user_to_access_to_collection_get = True
+
+    def update_collection_get_filter(self, query):
+        return query.filter_by(name=self.request.matchdict['name'])
+
+
 @resource(collection_path='/with/default/schema/examples',
           path='/with/default/schema/examples/{id}',
           installed_blok=current_blok())
@@ -50,6 +61,66 @@ class ExampleResourceWithDefaultSchema(CrudResource):
     default_path_schema = ExamplePathSchema
 
 
+@resource(collection_path='/window/examples', path='/window/examples/{id}',
+          installed_blok=current_blok())
+class ExampleResourceWithWindowCount(CrudResource):
+    model = 'Model.Example'
+    collection_count_mode = 'window'
+
+
+@resource(collection_path='/stream/examples', path='/stream/examples/{id}',
+          installed_blok=current_blok())
+class ExampleResourceWithStream(CrudResource):
+    model = 'Model.Example'
+    collection_get_stream = True
+    stream_chunk_size = 2
+    stream_spool_size = 64
+
+
+@resource(collection_path='/bulk/examples', path='/bulk/examples/{id}',
+          installed_blok=current_blok())
+class ExampleResourceWithBulk(CrudResource):
+    model = 'Model.Example'
+    collection_post_bulk = True
+    collection_delete_bulk = True
+    allow_collection_delete_by_filter = True
+    bulk_chunk_size = 2
+
+
+@resource(collection_path='/conditional/things',
+          path='/conditional/things/{uuid}',
+          installed_blok=current_blok())
+class ThingResourceWithLastModified(CrudResource):
+    model = 'Model.Thing'
+    default_serialize_schema = ThingSchema
+    default_path_schema = ThingPathSchema
+    last_modified_column = 'edit_date'
+
+
+@resource(collection_path='/cached/examples', path='/cached/examples/{id}',
+          installed_blok=current_blok())
+class ExampleResourceWithResponseCache(CrudResource):
+    model = 'Model.Example'
+    response_cache = MemoryResponseCache()
+
+
+@resource(collection_path='/cached/things', path='/cached/things/{uuid}',
+          installed_blok=current_blok())
+class ThingResourceWithResponseCache(CrudResource):
+    model = 'Model.Thing'
+    default_serialize_schema = ThingSchema
+    default_path_schema = ThingPathSchema
+    last_modified_column = 'edit_date'
+    response_cache = MemoryResponseCache()
+
+
+@resource(collection_path='/search/examples', path='/search/examples/{id}',
+          installed_blok=current_blok())
+class ExampleResourceWithTextIndexes(CrudResource):
+    model = 'Model.Example'
+    text_indexes = {'name': 'btree'}
+
+
 # another endpoint through a service with the same model
 another_service = Service(name='another_service', path='/anothers/{id}')
 
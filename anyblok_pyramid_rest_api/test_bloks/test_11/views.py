@@ -0,0 +1,36 @@
+# This file is a part of the AnyBlok / Pyramid / REST api project
+#
+# This Source Code Form is subject to the terms of the Mozilla Public License,
+# v. 2.0. If a copy of the MPL was not distributed with this file,You can
+# obtain one at http://mozilla.org/MPL/2.0/.
+from anyblok_pyramid_rest_api.crud_resource import (
+    CrudResource, resource, get_item)
+from .schema import CustomerSchema, RenameSchema
+
+
+@resource(
+    collection_path='/customers/v11',
+    path='/customers/v11/{id}',
+)
+class CustomerResourceV11(CrudResource):
+    model = 'Model.Customer'
+    default_schema = CustomerSchema
+
+    @CrudResource.service('rename', schema=RenameSchema, async_=True)
+    def rename(self):
+        customer = get_item(self.request, self.get_model('rename'))
+        if customer is None:
+            return
+
+        old_name = customer.name
+        customer.name = self.body['name']
+        return {'old': old_name, 'new': customer.name}
+
+    @CrudResource.service('count', verb='GET', collection=True,
+                          async_=True)
+    def count(self):
+        return self.get_model('count').query().count()
+
+    @CrudResource.service('fail', async_=True)
+    def fail(self):
+        raise Exception('The action failed')
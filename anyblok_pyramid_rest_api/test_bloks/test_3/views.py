@@ -21,6 +21,17 @@ class CustomerResourceV3(CrudResource):
     default_schema = CustomerSchema
 
 
+@resource(
+    collection_path='/eager/customers/v3',
+    path='/eager/customers/v3/{id}',
+    installed_blok=current_blok()
+)
+class CustomerResourceV3EagerLoad(CrudResource):
+    model = 'Model.Customer'
+    default_schema = CustomerSchema
+    eager_load_nested = True
+
+
 @resource(
     collection_path='/addresses/v3',
     path='/addresses/v3/{id}',
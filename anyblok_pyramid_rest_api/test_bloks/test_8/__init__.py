@@ -36,3 +36,4 @@ class TestBlok8(Blok):
         json_renderer.add_adapter(datetime, datetime_adapter)
         config.add_renderer('json', json_renderer)
         config.scan(cls.__module__ + '.views')
+        config.include('anyblok_pyramid_rest_api.batch')
@@ -93,3 +93,10 @@ def registry_rest_api_10(request, testbloks_loaded):
     registry = init_registry_with_bloks(['test_rest_api_10'], None)
     request.addfinalizer(registry.close)
     return registry
+
+
+@pytest.fixture(scope="class")
+def registry_rest_api_11(request, testbloks_loaded):
+    registry = init_registry_with_bloks(['test_rest_api_11'], None)
+    request.addfinalizer(registry.close)
+    return registry
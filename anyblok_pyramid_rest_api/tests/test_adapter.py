@@ -0,0 +1,171 @@
+# This file is a part of the AnyBlok / Pyramid / REST api project
+#
+# This Source Code Form is subject to the terms of the Mozilla Public License,
+# v. 2.0. If a copy of the MPL was not distributed with this file,You can
+# obtain one at http://mozilla.org/MPL/2.0/.
+import pytest
+from anyblok_pyramid_rest_api.adapter import Adapter
+from anyblok_pyramid_rest_api.crud_resource import CrudResource
+
+
+class BaseAdapter(Adapter):
+
+    @Adapter.filter('name', ['eq'])
+    def filter_name_eq(self, querystring, query, operator, value, mode):
+        return 'base-eq'
+
+    @Adapter.filter('name', ['like'])
+    def filter_name_like(self, querystring, query, operator, value, mode):
+        return 'base-like'
+
+    @Adapter.order_by('name')
+    def order_by_name(self, querystring, query, operator):
+        return 'base-order'
+
+    @Adapter.tag('green')
+    def tag_green(self, querystring, query):
+        return 'base-green'
+
+    @Adapter.tags('red', 'blue')
+    def tags_colors(self, querystring, query, tags):
+        return 'base-colors'
+
+    @Adapter.operator('endswith', kind='pattern')
+    def endswith_operator(self, column, value):
+        return 'base-endswith'
+
+
+class ChildAdapter(BaseAdapter):
+
+    @Adapter.filter('name', ['eq'])
+    def filter_name_eq(self, querystring, query, operator, value, mode):
+        return 'child-eq'
+
+    @Adapter.filter('number', ['lt'])
+    def filter_number_lt(self, querystring, query, operator, value, mode):
+        return 'child-lt'
+
+    def tag_green(self, querystring, query):
+        # overloaded without the decorator, the tag is not removed
+        return 'child-green'
+
+
+def get_adapter(Adapter_):
+    adapter = Adapter_(None, None)
+    adapter.load_decorators()
+    return adapter
+
+
+class TestAdapter:
+
+    def test_load_decorators(self):
+        adapter = get_adapter(BaseAdapter)
+        assert adapter.loaded
+        assert adapter.has_filter_for('name', 'eq')
+        assert adapter.has_filter_for('name', 'like')
+        assert not adapter.has_filter_for('name', 'lt')
+        assert not adapter.has_filter_for('unknown', 'eq')
+        assert adapter.get_filter_for('name', 'like')(
+            None, None, None, None, None) == 'base-like'
+        assert adapter.has_order_by_for('name')
+        assert adapter.get_order_by_for('name')(None, None, None) == (
+            'base-order')
+        assert adapter.has_tag_for('green')
+        assert adapter.get_tag_for('green')(None, None) == 'base-green'
+        assert adapter.has_grouped_tag_for('red')
+        group = adapter.grouped_tags['blue']
+        assert adapter.get_grouped_tag_for(group)(None, None, None) == (
+            'base-colors')
+        assert adapter.has_operator_for('endswith')
+        kind, method = adapter.get_operator_for('endswith')
+        assert kind == 'pattern'
+        assert method(None, None) == 'base-endswith'
+
+    def test_inherited_decorators(self):
+        adapter = get_adapter(ChildAdapter)
+        assert adapter.get_filter_for('name', 'eq')(
+            None, None, None, None, None) == 'child-eq'
+        assert adapter.get_filter_for('name', 'like')(
+            None, None, None, None, None) == 'base-like'
+        assert adapter.has_filter_for('number', 'lt')
+        assert adapter.has_order_by_for('name')
+        assert adapter.has_grouped_tag_for('red')
+        assert adapter.has_operator_for('endswith')
+        assert adapter.get_tag_for('green')(None, None) == 'child-green'
+
+    def test_base_is_not_updated_by_the_child(self):
+        get_adapter(ChildAdapter)
+        adapter = get_adapter(BaseAdapter)
+        assert not adapter.has_filter_for('number', 'lt')
+        assert adapter.get_filter_for('name', 'eq')(
+            None, None, None, None, None) == 'base-eq'
+
+    def test_decorators_built_once_by_class(self):
+        decorators = ChildAdapter.get_decorators()
+        assert ChildAdapter.get_decorators() is decorators
+        assert get_adapter(ChildAdapter).filters is decorators['filters']
+        assert BaseAdapter.get_decorators() is not decorators
+
+    def test_decorators_are_read_only(self):
+        adapter = get_adapter(ChildAdapter)
+        with pytest.raises(TypeError):
+            adapter.filters['other'] = {}
+
+        with pytest.raises(TypeError):
+            adapter.filters['name']['ne'] = 'filter_name_eq'
+
+    def test_methods_are_bound_once(self):
+        adapter = get_adapter(ChildAdapter)
+        assert adapter.get_filter_for('name', 'eq') is (
+            adapter.get_filter_for('name', 'eq'))
+        assert adapter.get_filter_for('name', 'eq').__self__ is adapter
+
+
+class MockRegistry:
+
+    def __init__(self):
+        self.declarativebase = object()
+
+
+class MockRequest:
+
+    def __init__(self, registry):
+        self.anyblok = type('Anyblok', (), {'registry': registry})
+
+
+class BaseResource(CrudResource):
+    model = 'Model.Test'
+    QueryStringAdapter = BaseAdapter
+
+    def get_model(self, rest_action):
+        return None
+
+
+class ChildResource(BaseResource):
+    QueryStringAdapter = ChildAdapter
+
+
+class TestCrudResourceAdapter:
+
+    def test_adapter_by_resource_class(self):
+        registry = MockRegistry()
+        request = MockRequest(registry)
+        base = BaseResource(request)
+        child = ChildResource(request)
+        assert isinstance(base.adapter, BaseAdapter)
+        assert isinstance(child.adapter, ChildAdapter)
+        assert BaseResource(request).adapter is base.adapter
+        assert ChildResource(request).adapter is child.adapter
+
+    def test_adapter_by_registry(self):
+        registry = MockRegistry()
+        adapter = BaseResource(MockRequest(registry)).adapter
+        assert adapter.registry is registry
+        other = BaseResource(MockRequest(MockRegistry())).adapter
+        assert other is not adapter
+
+    def test_adapter_after_reload(self):
+        registry = MockRegistry()
+        adapter = BaseResource(MockRequest(registry)).adapter
+        registry.declarativebase = object()
+        assert BaseResource(MockRequest(registry)).adapter is not adapter
@@ -0,0 +1,134 @@
+# This file is a part of the AnyBlok / Pyramid / REST api project
+#
+# This Source Code Form is subject to the terms of the Mozilla Public License,
+# v. 2.0. If a copy of the MPL was not distributed with this file,You can
+# obtain one at http://mozilla.org/MPL/2.0/.
+import pytest
+from anyblok_pyramid_rest_api import batch
+from anyblok_pyramid_rest_api.cache import MemoryResponseCache
+from anyblok_pyramid_rest_api.crud_resource import CrudResource
+
+
+class TestBatch:
+    """Test the batch service with the resources of
+    test_bloks/test_8/views.py
+    """
+
+    @pytest.fixture(autouse=True)
+    def transact(self, request, registry_rest_api_8, webserver):
+        transaction = registry_rest_api_8.begin_nested()
+        self.registry = registry_rest_api_8
+
+        def rollback():
+            try:
+                transaction.rollback()
+            except Exception:
+                pass
+
+        request.addfinalizer(rollback)
+        self.webserver = webserver
+        return
+
+    def create_customer(self, name="bob"):
+        return self.registry.Customer.insert(name=name)
+
+    def test_batch(self):
+        customer = self.create_customer()
+        path = '/customers/v8/%d' % customer.id
+        response = self.webserver.post_json('/batch', [
+            {'method': 'GET', 'path': path},
+            {'method': 'PATCH', 'path': path, 'body': {'name': 'alice'}},
+            {'method': 'POST', 'path': path + '/execute/action2',
+             'body': {'name': 'action'}},
+            {'method': 'GET', 'path': path},
+        ])
+        assert response.status_code == 200
+        assert [x['status'] for x in response.json_body] == [
+            200, 200, 200, 200]
+        assert response.json_body[0]['body']['name'] == 'bob'
+        assert response.json_body[2]['body'] == 'action'
+        assert response.json_body[3]['body']['name'] == 'alice'
+
+    def test_batch_invalidates_the_response_cache_after_the_batch(
+        self, monkeypatch
+    ):
+        customer = self.create_customer()
+        path = '/customers/v8/%d' % customer.id
+        events = []
+
+        class RecordingResponseCache(MemoryResponseCache):
+
+            def bump_version(self, namespace):
+                events.append('bump')
+                super(RecordingResponseCache, self).bump_version(namespace)
+
+        def get_result(response):
+            events.append('operation')
+            return get_result_(response)
+
+        get_result_ = batch.get_result
+        monkeypatch.setattr(batch, 'get_result', get_result)
+        monkeypatch.setattr(CrudResource, 'RESPONSE_CACHES',
+                            {RecordingResponseCache()})
+        self.webserver.post_json('/batch', [
+            {'method': 'PATCH', 'path': path, 'body': {'name': 'alice'}},
+            {'method': 'GET', 'path': path},
+        ])
+        # bumped once, when the batch request is finished
+        assert events == ['operation', 'operation', 'bump']
+
+    def test_batch_with_querystring(self):
+        self.create_customer(name='bob')
+        self.create_customer(name='alice')
+        response = self.webserver.post_json('/batch', [
+            {'method': 'GET', 'path': '/customers/v8?filter[name][eq]=bob'},
+        ])
+        assert response.status_code == 200
+        assert [x['name'] for x in response.json_body[0]['body']] == ['bob']
+
+    def test_batch_failed(self):
+        customer = self.create_customer()
+        path = '/customers/v8/%d' % customer.id
+        response = self.webserver.post_json('/batch', [
+            {'method': 'PATCH', 'path': path, 'body': {'name': 'alice'}},
+            {'method': 'POST', 'path': path + '/execute/action2',
+             'body': {}},
+            {'method': 'GET', 'path': path},
+        ], status=400)
+        assert [x['status'] for x in response.json_body] == [200, 400, 424]
+        assert response.json_body[2]['body'] is None
+
+    def test_batch_with_savepoint(self):
+        customer = self.create_customer()
+        path = '/customers/v8/%d' % customer.id
+        response = self.webserver.post_json('/batch', [
+            {'method': 'PATCH', 'path': path, 'body': {'name': 'alice'}},
+            {'method': 'POST', 'path': path + '/execute/action2',
+             'body': {}, 'savepoint': True},
+            {'method': 'GET', 'path': '/unknown', 'savepoint': True},
+            {'method': 'GET', 'path': path},
+        ])
+        assert response.status_code == 200
+        assert [x['status'] for x in response.json_body] == [
+            200, 400, 404, 200]
+        assert response.json_body[3]['body']['name'] == 'alice'
+
+    def test_batch_unknown_path(self):
+        response = self.webserver.post_json('/batch', [
+            {'method': 'GET', 'path': '/unknown'},
+        ], status=400)
+        assert [x['status'] for x in response.json_body] == [404]
+
+    def test_batch_bad_operation(self):
+        response = self.webserver.post_json('/batch', [
+            {'method': 'HEAD', 'path': 'customers/v8'},
+        ], status=400)
+        errors = response.json_body['errors'][0]['description']
+        assert set(errors['0']) == {'method', 'path'}
+
+    def test_batch_in_batch(self):
+        response = self.webserver.post_json('/batch', [
+            {'method': 'POST', 'path': '/batch', 'body': []},
+        ], status=400)
+        assert response.json_body['errors'][0]['description'] == (
+            'A batch can not be executed in a batch')
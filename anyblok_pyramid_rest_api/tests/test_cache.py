@@ -0,0 +1,223 @@
+# This file is a part of the AnyBlok / Pyramid / REST api project
+#
+# This Source Code Form is subject to the terms of the Mozilla Public License,
+# v. 2.0. If a copy of the MPL was not distributed with this file,You can
+# obtain one at http://mozilla.org/MPL/2.0/.
+import os
+import pytest
+from anyblok_pyramid_rest_api.cache import (
+    RegistryCache, LRUCache, TTLCache, ResponseCache, MemoryResponseCache,
+    FileResponseCache)
+
+
+class MockRegistry:
+
+    def __init__(self):
+        self.declarativebase = object()
+
+    def reload(self):
+        self.declarativebase = object()
+
+
+class TestRegistryCache:
+
+    def test_get_cache(self):
+        cache = RegistryCache()
+        registry = MockRegistry()
+        cache.get_cache(registry)['key'] = 'value'
+        assert cache.get_cache(registry) == {'key': 'value'}
+        assert cache.get_cache(MockRegistry()) == {}
+
+    def test_get_cache_after_reload(self):
+        cache = RegistryCache()
+        registry = MockRegistry()
+        cache.get_cache(registry)['key'] = 'value'
+        registry.reload()
+        assert cache.get_cache(registry) == {}
+
+    def test_clear(self):
+        cache = RegistryCache()
+        registry1 = MockRegistry()
+        registry2 = MockRegistry()
+        cache.get_cache(registry1)['key'] = 'value'
+        cache.get_cache(registry2)['key'] = 'value'
+        cache.clear(registry1)
+        assert cache.get_cache(registry1) == {}
+        assert cache.get_cache(registry2) == {'key': 'value'}
+        cache.clear()
+        assert cache.get_cache(registry2) == {}
+
+
+class TestLRUCache:
+
+    def test_get_and_set(self):
+        cache = LRUCache(2)
+        assert cache.get('a') is None
+        assert cache.get('a', 'default') == 'default'
+        cache.set('a', 1)
+        assert 'a' in cache
+        assert cache.get('a') == 1
+
+    def test_drop_the_least_recently_used(self):
+        cache = LRUCache(2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+        assert len(cache) == 2
+        assert 'a' in cache
+        assert 'b' not in cache
+        assert 'c' in cache
+
+    def test_pop_and_clear(self):
+        cache = LRUCache(2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        assert cache.pop('a') == 1
+        assert 'a' not in cache
+        cache.clear()
+        assert len(cache) == 0
+
+
+class TestTTLCache:
+
+    def test_get_before_timeout(self):
+        cache = TTLCache(2, timeout=60)
+        cache.set('a', 1)
+        assert 'a' in cache
+        assert cache.get('a') == 1
+
+    def test_get_after_timeout(self):
+        cache = TTLCache(2)
+        cache.set('a', 1, timeout=0)
+        assert 'a' not in cache
+        assert cache.get('a', 'default') == 'default'
+        assert len(cache) == 0
+
+    def test_size(self):
+        cache = TTLCache(2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.set('c', 3)
+        assert 'a' not in cache
+        assert cache.get('c') == 3
+
+    def test_pop(self):
+        cache = TTLCache(2)
+        cache.set('a', 1)
+        assert cache.pop('a') == 1
+        assert cache.pop('a', 'default') == 'default'
+
+    def test_invalidate(self):
+        cache = TTLCache(4)
+        cache.set(('r1', 'user1'), 1)
+        cache.set(('r1', 'user2'), 2)
+        cache.set(('r2', 'user1'), 3)
+        cache.invalidate(lambda key: key[1] == 'user1')
+        assert ('r1', 'user1') not in cache
+        assert ('r2', 'user1') not in cache
+        assert cache.get(('r1', 'user2')) == 2
+
+
+class TestResponseCache:
+
+    @pytest.fixture(params=['memory', 'file'])
+    def response_cache(self, request, tmp_path):
+        if request.param == 'memory':
+            return MemoryResponseCache(size=10)
+
+        return FileResponseCache(str(tmp_path / 'responses'))
+
+    def test_get_set(self, response_cache):
+        key = (('db', 'Model.Test'), 0, 'collection_get', (('limit', '1'),))
+        assert response_cache.get(key) is None
+        response_cache.set(key, ([{'id': 1}], {'X-Total-Records': '1'}), 60)
+        assert response_cache.get(key) == (
+            [{'id': 1}], {'X-Total-Records': '1'})
+
+    def test_get_after_timeout(self, response_cache):
+        response_cache.set(('key',), 'value', 0)
+        assert response_cache.get(('key',)) is None
+
+    def test_bump_version(self, response_cache):
+        namespace = ('db', 'Model.Test')
+        version = response_cache.get_version(namespace)
+        assert response_cache.get_version(namespace) == version
+        response_cache.bump_version(namespace)
+        assert response_cache.get_version(namespace) != version
+        assert response_cache.get_version(('db', 'Model.Other')) == version
+
+    def test_bump_version_drops_the_values(self, response_cache):
+        namespace = ('db', 'Model.Test')
+        key = (namespace, response_cache.get_version(namespace), 'get')
+        other_key = (('db', 'Model.Other'), 0, 'get')
+        response_cache.set(key, 'value', 60)
+        response_cache.set(other_key, 'other', 60)
+        response_cache.bump_version(namespace)
+        assert response_cache.get(key) is None
+        assert response_cache.get(other_key) == 'other'
+
+    def test_clear(self, response_cache):
+        namespace = ('db', 'Model.Test')
+        version = response_cache.get_version(namespace)
+        response_cache.bump_version(namespace)
+        response_cache.set(('key',), 'value', 60)
+        response_cache.clear()
+        assert response_cache.get(('key',)) is None
+        assert response_cache.get_version(namespace) == version
+
+    def test_bump_version_removes_the_files(self, tmp_path):
+        directory = str(tmp_path / 'responses')
+        response_cache = FileResponseCache(directory)
+        namespace = ('db', 'Model.Test')
+        for version in range(3):
+            response_cache.set(
+                (namespace, response_cache.get_version(namespace), 'get'),
+                'value', 60)
+            response_cache.bump_version(namespace)
+
+        response_cache.set((('db', 'Model.Other'), 0, 'get'), 'other', 60)
+        assert len(response_cache.get_value_files()) == 1
+
+    def test_sweep_expired_values(self, tmp_path):
+        response_cache = FileResponseCache(
+            str(tmp_path / 'responses'), sweep_interval=0)
+        response_cache.set((('db', 'Model.Test'), 0, 'get'), 'old', 0)
+        response_cache.set((('db', 'Model.Other'), 0, 'get'), 'new', 60)
+        assert [os.path.basename(x[1])
+                for x in response_cache.get_value_files()] == [
+            response_cache.get_digest((('db', 'Model.Other'), 0, 'get'))]
+
+    def test_sweep_max_files(self, tmp_path):
+        response_cache = FileResponseCache(
+            str(tmp_path / 'responses'), max_files=2, sweep_interval=0)
+        for index in range(4):
+            response_cache.set(
+                (('db', 'Model.Test'), 0, index), index, 60 + index)
+
+        assert len(response_cache.get_value_files()) == 2
+        assert response_cache.get((('db', 'Model.Test'), 0, 0)) is None
+        assert response_cache.get((('db', 'Model.Test'), 0, 3)) == 3
+
+    def test_sweep_interval(self, tmp_path):
+        response_cache = FileResponseCache(
+            str(tmp_path / 'responses'), max_files=1)
+        for index in range(3):
+            response_cache.set(
+                (('db', 'Model.Test'), 0, index), index, 60)
+
+        assert len(response_cache.get_value_files()) == 3
+
+    def test_interface_is_abstract(self):
+        with pytest.raises(TypeError):
+            ResponseCache()
+
+    def test_file_is_shared(self, tmp_path):
+        directory = str(tmp_path / 'responses')
+        response_cache1 = FileResponseCache(directory)
+        response_cache2 = FileResponseCache(directory)
+        response_cache1.set(('key',), 'value', 60)
+        assert response_cache2.get(('key',)) == 'value'
+        response_cache1.bump_version('namespace')
+        assert response_cache2.get_version('namespace') == (
+            response_cache1.get_version('namespace'))
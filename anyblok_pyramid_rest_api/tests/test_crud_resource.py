@@ -9,7 +9,13 @@
 # v. 2.0. If a copy of the MPL was not distributed with this file,You can
 # obtain one at http://mozilla.org/MPL/2.0/.
 import pytest
+from datetime import datetime
+from unittest.mock import Mock
 from anyblok.tests.testcase import LogCapture
+from sqlalchemy import event
+from anyblok_pyramid_rest_api.crud_resource import (
+    CrudResource, RESOURCES, warm_up_resources)
+from anyblok_pyramid_rest_api.querystring import QueryString
 
 
 class TestCrudResourceBase:
@@ -269,6 +275,51 @@ class TestCrudResourceBase:
         assert len(response.json_body) == 2
         assert response.json_body[0].get('name') == "dot"
 
+    def test_example_collection_get_cursor(self):
+        """Example collection GET /examples?cursor=cursor"""
+        names = ['air', 'bar', 'car', 'dot', 'zen']
+        for name in names:
+            self.create_example(name)
+        params = {'order_by[name]': 'desc', 'limit': 2, 'cursor': ''}
+        response = self.webserver.get('/examples', params=params)
+        assert response.status_code == 200
+        assert int(response.headers.get('X-Total-Records')) == 5
+        assert [x['name'] for x in response.json_body] == ['zen', 'dot']
+        assert 'rel="next"' in response.headers.get('Link')
+
+        params['cursor'] = response.headers.get('X-Next-Cursor')
+        response = self.webserver.get('/examples', params=params)
+        assert response.status_code == 200
+        assert [x['name'] for x in response.json_body] == ['car', 'bar']
+
+        params['cursor'] = response.headers.get('X-Next-Cursor')
+        response = self.webserver.get('/examples', params=params)
+        assert response.status_code == 200
+        assert [x['name'] for x in response.json_body] == ['air']
+        assert response.headers.get('X-Next-Cursor') is None
+        assert response.headers.get('Link') is None
+
+    def test_example_collection_get_cursor_with_filter(self):
+        """Example collection GET /examples?filter&cursor=cursor"""
+        names = ['air', 'bar', 'car', 'dot', 'zen']
+        for name in names:
+            self.create_example(name)
+        params = {'filter[name][like]': 'a', 'limit': 2, 'cursor': ''}
+        response = self.webserver.get('/examples', params=params)
+        assert int(response.headers.get('X-Total-Records')) == 3
+        assert len(response.json_body) == 2
+        params['cursor'] = response.headers.get('X-Next-Cursor')
+        response = self.webserver.get('/examples', params=params)
+        assert int(response.headers.get('X-Total-Records')) == 3
+        assert len(response.json_body) == 1
+
+    def test_example_collection_get_bad_cursor(self):
+        """Example FAILED collection GET /examples?cursor=bad"""
+        self.create_example()
+        response = self.webserver.get(
+            '/examples?limit=2&cursor=bad', status=400)
+        assert response.json_body['errors'][0]['location'] == 'querystring'
+
     def test_example_collection_get_filter_by_primary_keys_1(self):
         """Example collection GET /examples?filter[name][eq]=term"""
         names = ['air', 'bar', 'car', 'dot', 'zen']
@@ -311,6 +362,141 @@ class TestCrudResourceBase:
         assert int(response.headers.get('X-Count-Records')) == 2
 
 
+class TestCrudResourceSparseFieldsets:
+    """Test the fields entry of the querystring with
+    test_bloks/test_1/views.py:ExampleResourceWithDefaultSchema
+    """
+
+    @pytest.fixture(autouse=True)
+    def transact(self, request, registry_rest_api_1, webserver):
+        transaction = registry_rest_api_1.begin_nested()
+        self.registry = registry_rest_api_1
+
+        def rollback():
+            try:
+                transaction.rollback()
+            except Exception:
+                pass
+
+        request.addfinalizer(rollback)
+        self.webserver = webserver
+        return
+
+    def test_collection_get_fields(self):
+        """Example collection GET /with/default/schema/examples?fields=name"""
+        self.registry.Example.insert(name='air')
+        response = self.webserver.get(
+            '/with/default/schema/examples?fields=name')
+        assert response.status_code == 200
+        assert response.json_body == [{'name': 'air'}]
+
+    def test_collection_get_fields_and_filter(self):
+        """Example collection GET /with/default/schema/examples?fields=id"""
+        example = self.registry.Example.insert(name='air')
+        self.registry.Example.insert(name='bar')
+        response = self.webserver.get(
+            '/with/default/schema/examples?fields=id&filter[name][eq]=air')
+        assert response.status_code == 200
+        assert response.json_body == [{'id': example.id}]
+
+    def test_collection_get_unknown_fields(self):
+        """Example FAILED collection GET /with/default/schema/examples"""
+        fail = self.webserver.get(
+            '/with/default/schema/examples?fields=name,unknown', status=400)
+        assert fail.json_body.get('errors')[0].get('description') == (
+            "Fields ['unknown'] do not exist in the serialize schema")
+
+
+class TestCrudResourceWindowCount:
+    """Test CrudResource class from
+    test_bloks/test_1/views.py:ExampleResourceWithWindowCount.
+
+    The total of entries is computed in the same statement than the entries
+    """
+
+    @pytest.fixture(autouse=True)
+    def transact(self, request, registry_rest_api_1, webserver):
+        transaction = registry_rest_api_1.begin_nested()
+        self.registry = registry_rest_api_1
+
+        def rollback():
+            try:
+                transaction.rollback()
+            except Exception:
+                pass
+
+        request.addfinalizer(rollback)
+        self.webserver = webserver
+        return
+
+    def create_examples(self):
+        for name in ['air', 'bar', 'car', 'dot', 'zen']:
+            self.registry.Example.insert(name=name)
+
+    def test_collection_get(self):
+        """Example collection GET /window/examples"""
+        self.create_examples()
+        response = self.webserver.get('/window/examples')
+        assert response.status_code == 200
+        assert int(response.headers.get('X-Total-Records')) == 5
+        assert int(response.headers.get('X-Count-Records')) == 5
+        assert len(response.json_body) == 5
+
+    def test_collection_get_empty(self):
+        """Example collection GET /window/examples without entry"""
+        response = self.webserver.get('/window/examples')
+        assert response.status_code == 200
+        assert int(response.headers.get('X-Total-Records')) == 0
+        assert int(response.headers.get('X-Count-Records')) == 0
+        assert response.json_body == []
+
+    def test_collection_get_filter_and_limit(self):
+        """Example collection GET /window/examples?filter&limit"""
+        self.create_examples()
+        response = self.webserver.get(
+            '/window/examples?filter[name][like]=a&limit=2'
+            '&order_by[name]=asc')
+        assert response.status_code == 200
+        assert int(response.headers.get('X-Total-Records')) == 3
+        assert int(response.headers.get('X-Count-Records')) == 2
+        assert [x['name'] for x in response.json_body] == ['air', 'bar']
+
+    def test_collection_get_offset_out_of_range(self):
+        """Example collection GET /window/examples?offset=10"""
+        self.create_examples()
+        response = self.webserver.get('/window/examples?offset=10')
+        assert response.status_code == 200
+        assert int(response.headers.get('X-Total-Records')) == 5
+        assert int(response.headers.get('X-Count-Records')) == 0
+        assert response.json_body == []
+
+    def test_collection_get_cursor(self):
+        """Example collection GET /window/examples?cursor=cursor"""
+        self.create_examples()
+        params = {'order_by[name]': 'asc', 'limit': 2, 'cursor': ''}
+        pages = []
+        while params['cursor'] is not None:
+            response = self.webserver.get('/window/examples', params=params)
+            assert response.status_code == 200
+            pages.append((
+                [x['name'] for x in response.json_body],
+                int(response.headers.get('X-Total-Records'))))
+            params['cursor'] = response.headers.get('X-Next-Cursor')
+
+        assert pages == [
+            (['air', 'bar'], 5), (['car', 'dot'], 5), (['zen'], 5)]
+
+    def test_collection_get_cursor_out_of_range(self):
+        """Example collection GET /window/examples?cursor=last"""
+        self.create_examples()
+        params = {'order_by[name]': 'asc', 'limit': 5, 'cursor': ''}
+        response = self.webserver.get('/window/examples', params=params)
+        params['cursor'] = response.headers.get('X-Next-Cursor')
+        response = self.webserver.get('/window/examples', params=params)
+        assert int(response.headers.get('X-Total-Records')) == 5
+        assert int(response.headers.get('X-Count-Records')) == 0
+
+
 class TestCrudResourceFilterByPrimaryKey:
     """Test CrudResource class from
     test_bloks/test_1/views.py:ExampleResourceBaseValidator.
@@ -1114,3 +1300,947 @@ class TestCrudResourceModelSchemaValidatorAndAuth(CrudResourceSchema):
         self.webserver.get('/examples', {}, status=403)
         self.webserver.get('/examples2', {}, status=200)
         self.webserver.get('/examples2/%d' % example.id, {}, status=403)
+
+    def test_allow_collection_get_with_templated_path(self):
+        example = self.registry.Example.insert(name='test')
+        self.webserver.post_json('/logout', {}, status=302)
+        response = self.webserver.get('/examples3/test', {}, status=200)
+        assert [x['id'] for x in response.json_body] == [example.id]
+        self.webserver.get('/examples3/test/%d' % example.id, {}, status=403)
+
+
+class TestCrudResourceAclCache:
+    """Test the cache of the ACL with
+    test_bloks/test_5/views.py:CustomerResourceV5
+    """
+
+    @pytest.fixture(autouse=True)
+    def transact(self, request, registry_rest_api_5_logged, webserver,
+                 monkeypatch):
+        transaction = registry_rest_api_5_logged.begin_nested()
+        self.registry = registry_rest_api_5_logged
+
+        def rollback():
+            CrudResource.invalidate_acl_cache()
+            try:
+                transaction.rollback()
+            except Exception:
+                pass
+
+        request.addfinalizer(rollback)
+        CrudResource.invalidate_acl_cache()
+        resource = [cls for cls in RESOURCES
+                    if cls.__name__ == 'CustomerResourceV5'][0]
+        monkeypatch.setattr(resource, 'acl_cache_timeout', 60)
+        self.calls = []
+        get_acl = self.registry.Pyramid.get_acl
+
+        def counting_get_acl(userid, resource_name, params=None):
+            self.calls.append((userid, resource_name))
+            return get_acl(userid, resource_name, params=params)
+
+        monkeypatch.setattr(self.registry.Pyramid, 'get_acl',
+                            counting_get_acl)
+        self.webserver = webserver
+        webserver.post_json(
+            '/login', {'login': 'jssuzanne', 'password': 'mypassword'},
+            status=302)
+        return
+
+    def test_get_acl_is_cached(self):
+        self.webserver.get('/customers/v5', status=200)
+        assert self.calls == [('jssuzanne', 'Model.Customer')]
+        self.webserver.get('/customers/v5', status=200)
+        assert len(self.calls) == 1
+
+    def test_invalidate_acl_cache(self):
+        self.webserver.get('/customers/v5', status=200)
+        CrudResource.invalidate_acl_cache(self.registry, 'jssuzanne')
+        self.webserver.get('/customers/v5', status=200)
+        assert len(self.calls) == 2
+
+    def test_invalidate_acl_cache_of_another_user(self):
+        self.webserver.get('/customers/v5', status=200)
+        CrudResource.invalidate_acl_cache(self.registry, 'other')
+        self.webserver.get('/customers/v5', status=200)
+        assert len(self.calls) == 1
+
+
+class TestCrudResourceStream:
+    """Test CrudResource class from
+    test_bloks/test_1/views.py:ExampleResourceWithStream.
+
+    The entries are serialized by chunk of 2 entries
+    """
+
+    @pytest.fixture(autouse=True)
+    def transact(self, request, registry_rest_api_1, webserver):
+        transaction = registry_rest_api_1.begin_nested()
+        self.registry = registry_rest_api_1
+
+        def rollback():
+            try:
+                transaction.rollback()
+            except Exception:
+                pass
+
+        request.addfinalizer(rollback)
+        self.webserver = webserver
+        return
+
+    def create_examples(self):
+        for name in ['air', 'bar', 'car', 'dot', 'zen']:
+            self.registry.Example.insert(name=name)
+
+    def test_collection_get(self):
+        """Example collection GET /stream/examples"""
+        self.create_examples()
+        response = self.webserver.get(
+            '/stream/examples?order_by[name]=asc')
+        assert response.status_code == 200
+        assert response.content_type == 'application/json'
+        assert int(response.headers.get('X-Total-Records')) == 5
+        assert int(response.headers.get('X-Count-Records')) == 5
+        assert [x['name'] for x in response.json_body] == [
+            'air', 'bar', 'car', 'dot', 'zen']
+
+    def test_collection_get_empty(self):
+        """Example collection GET /stream/examples without entry"""
+        response = self.webserver.get('/stream/examples')
+        assert response.status_code == 200
+        assert int(response.headers.get('X-Total-Records')) == 0
+        assert int(response.headers.get('X-Count-Records')) == 0
+        assert response.json_body == []
+
+    def test_collection_get_chunk_size(self):
+        """Example collection GET /stream/examples?limit=4, two full chunks"""
+        self.create_examples()
+        response = self.webserver.get(
+            '/stream/examples?limit=4&order_by[name]=asc')
+        assert response.status_code == 200
+        assert int(response.headers.get('X-Total-Records')) == 5
+        assert int(response.headers.get('X-Count-Records')) == 4
+        assert [x['name'] for x in response.json_body] == [
+            'air', 'bar', 'car', 'dot']
+
+    def test_collection_get_offset(self):
+        """Example collection GET /stream/examples?offset=3"""
+        self.create_examples()
+        response = self.webserver.get(
+            '/stream/examples?offset=3&order_by[name]=asc')
+        assert response.status_code == 200
+        assert int(response.headers.get('X-Total-Records')) == 5
+        assert int(response.headers.get('X-Count-Records')) == 2
+        assert [x['name'] for x in response.json_body] == ['dot', 'zen']
+
+    def test_collection_get_bad_querystring(self):
+        """Example collection GET /stream/examples with unknown column"""
+        response = self.webserver.get(
+            '/stream/examples?filter[unknown][eq]=1', status=400)
+        assert response.status_code == 400
+
+
+class TestCrudResourceStreamWithTransaction:
+    """Test CrudResource class from
+    test_bloks/test_1/views.py:ExampleResourceWithStream through the
+    transaction manager of the request, the entries are committed
+    """
+
+    @pytest.fixture(autouse=True)
+    def transact(self, request, registry_rest_api_1, webserver):
+        self.registry = registry_rest_api_1
+
+        def clean():
+            self.registry.rollback()
+            self.registry.Example.query().delete()
+            self.registry.commit()
+
+        request.addfinalizer(clean)
+        self.webserver = webserver
+        return
+
+    def test_collection_get(self):
+        """Example collection GET /stream/examples, bigger than the spool
+        kept in memory
+        """
+        for name in ['air', 'bar', 'car', 'dot', 'zen']:
+            self.registry.Example.insert(name=name)
+
+        self.registry.commit()
+        response = self.webserver.get(
+            '/stream/examples?order_by[name]=asc')
+        assert response.status_code == 200
+        assert int(response.headers.get('X-Total-Records')) == 5
+        assert int(response.headers.get('X-Count-Records')) == 5
+        assert int(response.headers.get('Content-Length')) == len(
+            response.body)
+        assert [x['name'] for x in response.json_body] == [
+            'air', 'bar', 'car', 'dot', 'zen']
+
+
+class TestCrudResourceBulk:
+    """Test CrudResource class from
+    test_bloks/test_1/views.py:ExampleResourceWithBulk.
+
+    The entries are inserted by chunk of 2 entries
+    """
+
+    @pytest.fixture(autouse=True)
+    def transact(self, request, registry_rest_api_1, webserver):
+        transaction = registry_rest_api_1.begin_nested()
+        self.registry = registry_rest_api_1
+
+        def rollback():
+            try:
+                transaction.rollback()
+            except Exception:
+                pass
+
+        request.addfinalizer(rollback)
+        self.webserver = webserver
+        return
+
+    def test_collection_post(self):
+        """Example collection POST /bulk/examples"""
+        names = ['air', 'bar', 'car', 'dot', 'zen']
+        response = self.webserver.post_json(
+            '/bulk/examples', [{'name': name} for name in names])
+        assert response.status_code == 200
+        assert [x['name'] for x in response.json_body] == names
+        assert all(x['id'] for x in response.json_body)
+        assert self.registry.Example.query().count() == 5
+
+    def test_collection_post_with_error(self):
+        """Example collection POST /bulk/examples with duplicate names"""
+        with LogCapture() as logs:
+            fail = self.webserver.post_json(
+                '/bulk/examples', [{'name': 'air'}, {'name': 'air'}],
+                status=500)
+
+        assert fail.json_body.get('status') == 'error'
+        assert fail.json_body.get('errors')[0].get('location') == 'body'
+        assert ('Request error found: rollback the registry'
+                in logs.get_debug_messages())
+
+    def test_collection_post_bad_body(self):
+        """Example collection POST /bulk/examples with an invalid entry"""
+        fail = self.webserver.post_json(
+            '/bulk/examples', [{'name': 'air'}, {}], status=400)
+        assert fail.json_body.get('status') == 'error'
+        assert fail.json_body.get('errors')[0].get('location') == 'body'
+
+    def create_examples(self):
+        return [self.registry.Example.insert(name=name)
+                for name in ['air', 'bar', 'car']]
+
+    def test_collection_patch(self):
+        """Example collection PATCH /bulk/examples, two chunks of pks"""
+        examples = self.create_examples()
+        response = self.webserver.patch_json(
+            '/bulk/examples',
+            [{'id': x.id, 'name': x.name.upper()} for x in examples])
+        assert response.status_code == 200
+        assert [x['name'] for x in response.json_body] == [
+            'AIR', 'BAR', 'CAR']
+
+    def test_collection_patch_no_entry_found(self):
+        """Example FAILED collection PATCH /bulk/examples (id=0)"""
+        examples = self.create_examples()
+        fail = self.webserver.patch_json(
+            '/bulk/examples',
+            [{'id': examples[0].id, 'name': 'AIR'}, {'id': 0, 'name': 'plip'}],
+            status=400)
+        assert fail.json_body.get('errors')[0].get('description').startswith(
+            "The primary key found {'id': 0} does not exist on ")
+
+    def test_collection_delete(self):
+        """Example collection DELETE /bulk/examples, two chunks of pks"""
+        examples = self.create_examples()
+        response = self.webserver.delete_json(
+            '/bulk/examples', [{'id': x.id} for x in examples])
+        assert response.status_code == 200
+        assert response.json_body == 3
+        assert self.registry.Example.query().count() == 0
+
+    def test_collection_delete_no_entry_found(self):
+        """Example FAILED collection DELETE /bulk/examples (id=0)"""
+        examples = self.create_examples()
+        fail = self.webserver.delete_json(
+            '/bulk/examples', [{'id': examples[0].id}, {'id': 0}],
+            status=400)
+        assert fail.status_code == 400
+        assert fail.json_body.get('errors')[0].get('description').startswith(
+            '1 primary keys found do not exist on ')
+
+    def test_collection_delete_by_filter(self):
+        """Example collection DELETE /bulk/examples?filter[name][like]=ar"""
+        self.create_examples()
+        response = self.webserver.delete(
+            '/bulk/examples?filter[name][like]=ar')
+        assert response.status_code == 200
+        assert response.json_body == 2
+        assert [x.name for x in self.registry.Example.query().all()] == [
+            'air']
+
+    def test_collection_delete_by_filter_with_delete_entry(
+        self, monkeypatch
+    ):
+        """Example collection DELETE /bulk/examples?filter[name][like]=ar
+        with an overwritten ``delete_entry``, the entries are loaded by one
+        query
+        """
+        self.create_examples()
+        self.registry.flush()
+        self.registry.session.expunge_all()
+        resource = [cls for cls in RESOURCES
+                    if cls.__name__ == 'ExampleResourceWithBulk'][0]
+        deleted = []
+
+        def delete_entry(self, entry):
+            deleted.append(entry.name)
+            entry.delete()
+
+        monkeypatch.setattr(resource, 'delete_entry', delete_entry)
+        statements = []
+
+        def before_cursor_execute(conn, cursor, statement, *args):
+            if statement.lstrip().upper().startswith('SELECT') and (
+                'example' in statement
+            ):
+                statements.append(statement)
+
+        connection = self.registry.session.connection()
+        event.listen(
+            connection, 'before_cursor_execute', before_cursor_execute)
+        try:
+            response = self.webserver.delete(
+                '/bulk/examples?filter[name][like]=ar')
+        finally:
+            event.remove(
+                connection, 'before_cursor_execute', before_cursor_execute)
+
+        assert response.json_body == 2
+        assert sorted(deleted) == ['bar', 'car']
+        assert len(statements) == 1
+        assert [x.name for x in self.registry.Example.query().all()] == [
+            'air']
+
+    def test_collection_delete_by_filter_without_filter(self):
+        """Example FAILED collection DELETE /bulk/examples?limit=1"""
+        self.create_examples()
+        fail = self.webserver.delete('/bulk/examples?limit=1', status=400)
+        assert fail.json_body.get('errors')[0].get('description') == (
+            'At least one filter is required to delete by filter')
+
+
+class TestCrudResourceEagerLoad:
+    """Test CrudResource class from
+    test_bloks/test_3/views.py:CustomerResourceV3EagerLoad.
+
+    The relationships of the Nested fields are loaded with the customers
+    """
+
+    @pytest.fixture(autouse=True)
+    def transact(self, request, registry_rest_api_3, webserver):
+        transaction = registry_rest_api_3.begin_nested()
+        self.registry = registry_rest_api_3
+
+        def rollback():
+            try:
+                transaction.rollback()
+            except Exception:
+                pass
+
+        request.addfinalizer(rollback)
+        self.webserver = webserver
+        return
+
+    def create_customers(self, count):
+        city = self.registry.City.insert(name="nowhere", zipcode="000")
+        for index in range(count):
+            tag = self.registry.Tag.insert(name='tag %d' % index)
+            customer = self.registry.Customer.insert(name='bob %d' % index)
+            customer.tags.append(tag)
+            self.registry.Address.insert(
+                customer=customer, city=city, street="Dead end street")
+
+        self.registry.flush()
+
+    def count_statements(self, path):
+        statements = []
+
+        def before_cursor_execute(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        connection = self.registry.session.connection()
+        event.listen(
+            connection, 'before_cursor_execute', before_cursor_execute)
+        try:
+            response = self.webserver.get(path)
+        finally:
+            event.remove(
+                connection, 'before_cursor_execute', before_cursor_execute)
+
+        return response, len(statements)
+
+    def test_collection_get(self):
+        """Customer collection GET /eager/customers/v3"""
+        self.create_customers(2)
+        response = self.webserver.get('/eager/customers/v3')
+        assert response.status_code == 200
+        assert len(response.json_body) == 2
+        assert response.json_body[0]['addresses'][0]['city']['zipcode'] == (
+            '000')
+        assert len(response.json_body[0]['tags']) == 1
+
+    def test_collection_get_statements(self):
+        """Customer collection GET /eager/customers/v3, no N+1"""
+        self.create_customers(2)
+        self.webserver.get('/eager/customers/v3')
+        response, count2 = self.count_statements('/eager/customers/v3')
+        assert len(response.json_body) == 2
+        self.create_customers(8)
+        response, count10 = self.count_statements('/eager/customers/v3')
+        assert len(response.json_body) == 10
+        assert count2 == count10
+
+    def test_collection_get_include(self):
+        """Customer collection GET /customers/v3?include=tags"""
+        self.create_customers(2)
+        response = self.webserver.get(
+            '/customers/v3?include=tags,addresses.city')
+        assert response.status_code == 200
+        assert len(response.json_body) == 2
+
+    def test_collection_get_include_unknown(self):
+        """Customer FAILED collection GET /customers/v3?include=name"""
+        fail = self.webserver.get('/customers/v3?include=name', status=400)
+        assert fail.json_body.get('errors')[0].get('description').startswith(
+            "Include 'name': 'name' in model ")
+
+
+class TestCrudResourceSchemaCache:
+    """Test the cache of the schemas of the CrudResource with
+    test_bloks/test_1/views.py:ExampleResource
+    """
+
+    @pytest.fixture(autouse=True)
+    def transact(self, request, registry_rest_api_1, webserver):
+        transaction = registry_rest_api_1.begin_nested()
+        self.registry = registry_rest_api_1
+
+        def rollback():
+            try:
+                transaction.rollback()
+            except Exception:
+                pass
+
+        request.addfinalizer(rollback)
+        self.webserver = webserver
+        return
+
+    def get_resource(self, name):
+        schemas = CrudResource.SCHEMAS.get_cache(self.registry)
+        resources = [cls for cls in schemas if cls.__name__ == name]
+        assert len(resources) == 1
+        return resources[0]
+
+    def test_validator_schema_is_cached(self):
+        """Example POST /examples twice, one deserialize schema"""
+        key = ('deserialize', 'collection_post', 'Model.Example')
+        self.webserver.post_json('/examples', [{'name': 'plip'}])
+        ExampleResource = self.get_resource('ExampleResource')
+        schema = ExampleResource.get_schemas(self.registry)[key]
+        self.webserver.post_json('/examples', [{'name': 'plop'}])
+        assert ExampleResource.get_schemas(self.registry)[key] is schema
+        assert self.registry.Example.query().count() == 2
+
+    def test_path_schema_is_cached(self):
+        """Example GET /examples/{id} twice, one path schema"""
+        key = ('path', 'get', None)
+        example = self.registry.Example.insert(name='plip')
+        self.webserver.get('/examples/%s' % example.id)
+        ExampleResource = self.get_resource('ExampleResource')
+        schema = ExampleResource.get_schemas(self.registry)[key]
+        self.webserver.get('/examples/%s' % example.id)
+        assert ExampleResource.get_schemas(self.registry)[key] is schema
+
+    def test_schemas_by_resource(self):
+        """The resources of the same model do not share their schemas"""
+        self.webserver.get('/examples')
+        self.webserver.get('/examples2')
+        ExampleResource = self.get_resource('ExampleResource')
+        ExampleResource2 = self.get_resource('ExampleResource2')
+        assert (
+            ExampleResource.get_schemas(self.registry) is not
+            ExampleResource2.get_schemas(self.registry))
+
+    def test_invalidate_schema_cache(self):
+        self.webserver.get('/examples')
+        ExampleResource = self.get_resource('ExampleResource')
+        assert ExampleResource.get_schemas(self.registry)
+        CrudResource.invalidate_schema_cache(self.registry)
+        assert ExampleResource.get_schemas(self.registry) == {}
+
+    def test_validator_schema_is_built_once(self, monkeypatch):
+        self.webserver.post_json('/examples', [{'name': 'plip'}])
+        ExampleResource = self.get_resource('ExampleResource')
+        request = Mock()
+        request.anyblok.registry = self.registry
+        args = ('deserialize', 'collection_post', 'Model.Example')
+        builds = []
+        build_validator_schema = ExampleResource.build_validator_schema
+
+        def counting_build_validator_schema(registry, *args):
+            builds.append(args)
+            return build_validator_schema(registry, *args)
+
+        monkeypatch.setattr(ExampleResource, 'build_validator_schema',
+                            counting_build_validator_schema)
+        schema = ExampleResource.get_validator_schema(request, *args)
+        assert ExampleResource.get_validator_schema(request, *args) is schema
+        assert builds == []
+        CrudResource.invalidate_schema_cache(self.registry)
+        new_schema = ExampleResource.get_validator_schema(request, *args)
+        assert new_schema is not schema
+        assert ExampleResource.get_validator_schema(
+            request, *args) is new_schema
+        assert builds == [args]
+
+
+class TestCrudResourceWarmUp:
+    """Test the warm-up of the resources with
+    test_bloks/test_8/views.py:CustomerResourceV8
+    """
+
+    @pytest.fixture(autouse=True)
+    def transact(self, request, registry_rest_api_8, webserver):
+        transaction = registry_rest_api_8.begin_nested()
+        self.registry = registry_rest_api_8
+
+        def rollback():
+            try:
+                transaction.rollback()
+            except Exception:
+                pass
+
+        request.addfinalizer(rollback)
+        self.webserver = webserver
+        return
+
+    def get_resource(self, name):
+        resources = [cls for cls in RESOURCES if cls.__name__ == name]
+        assert len(resources) == 1
+        return resources[0]
+
+    def test_resources_are_registered(self):
+        CustomerResource = self.get_resource('CustomerResourceV8')
+        assert issubclass(CustomerResource, CrudResource)
+
+    def test_warm_up(self):
+        CustomerResource = self.get_resource('CustomerResourceV8')
+        CrudResource.invalidate_schema_cache(self.registry)
+        duration = CustomerResource.warm_up(self.registry)
+        assert duration >= 0
+        schemas = CustomerResource.get_schemas(self.registry)
+        assert ('path', 'get', None) in schemas
+        assert ('deserialize', 'collection_post', 'Model.Customer') in schemas
+        assert ('serialize', 'collection_get', 'Model.Customer') in schemas
+        field_types = QueryString.FIELD_TYPES.get_cache(self.registry)
+        assert field_types[('Model.Customer', 'tags')] == 'Many2Many'
+
+    def test_request_after_warm_up(self):
+        CustomerResource = self.get_resource('CustomerResourceV8')
+        CrudResource.invalidate_schema_cache(self.registry)
+        CustomerResource.warm_up(self.registry)
+        key = ('serialize', 'collection_get', 'Model.Customer')
+        schema = CustomerResource.get_schemas(self.registry)[key]
+        self.webserver.get('/customers/v8')
+        assert CustomerResource.get_schemas(self.registry)[key] is schema
+
+    def test_warm_up_resources(self):
+        CustomerResource = self.get_resource('CustomerResourceV8')
+        durations = warm_up_resources(self.registry, [CustomerResource])
+        assert len(durations) == 1
+        assert durations[0][0] is CustomerResource
+        assert durations[0][1] >= 0
+
+    def test_resources_have_their_blok(self):
+        CustomerResource = self.get_resource('CustomerResourceV8')
+        assert RESOURCES[CustomerResource] == 'test_rest_api_8'
+
+    def test_warm_up_resources_of_the_installed_bloks(self):
+        durations = dict(warm_up_resources(self.registry))
+        assert durations[self.get_resource('CustomerResourceV8')] >= 0
+        ExampleResource = self.get_resource('ExampleResource')
+        assert ExampleResource not in durations
+
+    def test_warm_up_resources_failed(self):
+
+        class FailedResource(CrudResource):
+            model = 'Model.Unknown'
+
+        durations = warm_up_resources(self.registry, [FailedResource])
+        assert durations == [(FailedResource, None)]
+
+
+class TestCrudResourceToManyFilter:
+    """Test CrudResource class from
+    test_bloks/test_3/views.py:CustomerResourceV3.
+
+    The filters on the to-many relationships are EXISTS
+    """
+
+    @pytest.fixture(autouse=True)
+    def transact(self, request, registry_rest_api_3, webserver):
+        transaction = registry_rest_api_3.begin_nested()
+        request.addfinalizer(transaction.rollback)
+        self.registry = registry_rest_api_3
+        self.webserver = webserver
+        return
+
+    def create_customers(self):
+        paris = self.registry.City.insert(name="Paris", zipcode="75000")
+        lyon = self.registry.City.insert(name="Lyon", zipcode="69000")
+        bob = self.registry.Customer.insert(name='bob')
+        alice = self.registry.Customer.insert(name='alice')
+        self.registry.Customer.insert(name='eve')
+        for street in ('first street', 'second street'):
+            self.registry.Address.insert(
+                customer=bob, city=paris, street=street)
+
+        self.registry.Address.insert(
+            customer=alice, city=lyon, street='first street')
+        self.registry.Address.insert(
+            customer=alice, city=paris, street='third street')
+        self.registry.flush()
+
+    def get_names(self, querystring):
+        response = self.webserver.get('/customers/v3?' + querystring)
+        assert response.status_code == 200
+        names = sorted(x['name'] for x in response.json_body)
+        assert response.headers['X-Total-Records'] == str(len(names))
+        return names
+
+    def test_filter_without_duplicate(self):
+        """Customer collection GET /customers/v3?filter[addresses.city...]"""
+        self.create_customers()
+        assert self.get_names(
+            'filter[addresses.city.name][eq]=Paris') == ['alice', 'bob']
+
+    def test_exclude_filter_is_not_exists(self):
+        """Customer collection GET /customers/v3?~filter[addresses.city...]"""
+        self.create_customers()
+        assert self.get_names(
+            '~filter[addresses.city.name][eq]=Lyon') == ['bob', 'eve']
+
+    def test_composite_filter_on_the_same_entry(self):
+        """Customer collection GET /customers/v3?composite-filter[...]"""
+        self.create_customers()
+        keys = 'addresses.city.name:addresses.street'
+        assert self.get_names(
+            'composite-filter[%s][eq:eq]=Paris:first street' % keys
+        ) == ['bob']
+        assert self.get_names(
+            'composite-filter[%s][eq:eq]=Paris:third street' % keys
+        ) == ['alice']
+        assert self.get_names(
+            'composite-filter[%s][eq:eq]=Lyon:third street' % keys) == []
+
+    def test_filter_on_many2many(self):
+        """Customer collection GET /customers/v3?filter[tags.name][eq]"""
+        self.create_customers()
+        bob = self.registry.Customer.query().filter_by(name='bob').one()
+        bob.tags.append(self.registry.Tag.insert(name='green'))
+        bob.tags.append(self.registry.Tag.insert(name='blue'))
+        self.registry.flush()
+        assert self.get_names('filter[tags.name][in]=green,blue') == ['bob']
+
+
+class TestCrudResourceConditionalGet:
+    """Test CrudResource class from
+    test_bloks/test_1/views.py:ThingResourceWithLastModified.
+    """
+
+    @pytest.fixture(autouse=True)
+    def transact(self, request, registry_rest_api_1, webserver):
+        transaction = registry_rest_api_1.begin_nested()
+        self.registry = registry_rest_api_1
+
+        def rollback():
+            try:
+                transaction.rollback()
+            except Exception:
+                pass
+
+        request.addfinalizer(rollback)
+        self.webserver = webserver
+        return
+
+    def create_thing(self, name='thing'):
+        example = self.registry.Example.insert(name=name)
+        return self.registry.Thing.insert(
+            name=name, secret='secret', example=example)
+
+    def test_collection_get_counted_once(self):
+        """Thing collection GET /conditional/things, the aggregate query of
+        the ETag gives X-Total-Records
+        """
+        self.create_thing('air')
+        self.create_thing('bar')
+        statements = []
+
+        def before_cursor_execute(conn, cursor, statement, *args):
+            if 'FROM thing' in statement:
+                statements.append(statement)
+
+        connection = self.registry.session.connection()
+        event.listen(
+            connection, 'before_cursor_execute', before_cursor_execute)
+        try:
+            response = self.webserver.get('/conditional/things?limit=1')
+        finally:
+            event.remove(
+                connection, 'before_cursor_execute', before_cursor_execute)
+
+        assert response.headers['X-Total-Records'] == '2'
+        assert response.headers['X-Count-Records'] == '1'
+        # the aggregate query and the query of the entries
+        assert len(statements) == 2
+
+    def test_collection_get_etag(self):
+        """Thing collection GET /conditional/things with If-None-Match"""
+        self.create_thing()
+        response = self.webserver.get('/conditional/things')
+        assert response.status_code == 200
+        etag = response.headers['ETag']
+        assert etag.startswith('W/"')
+        assert response.headers.get('Last-Modified')
+
+        response = self.webserver.get(
+            '/conditional/things', headers={'If-None-Match': etag},
+            status=304)
+        assert response.headers['ETag'] == etag
+        assert not response.body
+
+    def test_collection_get_etag_changes(self):
+        """Thing collection GET /conditional/things after a change"""
+        self.create_thing()
+        etag = self.webserver.get('/conditional/things').headers['ETag']
+        self.create_thing(name='other')
+        response = self.webserver.get(
+            '/conditional/things', headers={'If-None-Match': etag})
+        assert response.status_code == 200
+        assert response.headers['ETag'] != etag
+        assert len(response.json_body) == 2
+
+    def test_collection_get_etag_by_querystring(self):
+        """Thing collection GET /conditional/things?limit=1"""
+        self.create_thing()
+        etag = self.webserver.get('/conditional/things').headers['ETag']
+        response = self.webserver.get(
+            '/conditional/things?limit=1', headers={'If-None-Match': etag})
+        assert response.status_code == 200
+        assert response.headers['ETag'] != etag
+
+    def test_collection_get_if_modified_since(self):
+        """Thing collection GET /conditional/things with If-Modified-Since"""
+        self.create_thing()
+        response = self.webserver.get('/conditional/things')
+        last_modified = response.headers['Last-Modified']
+        self.webserver.get(
+            '/conditional/things',
+            headers={'If-Modified-Since': last_modified}, status=304)
+        self.webserver.get(
+            '/conditional/things',
+            headers={'If-Modified-Since': 'Mon, 01 Jan 2001 00:00:00 GMT'},
+            status=200)
+
+    def test_get_etag(self):
+        """Thing GET /conditional/things/{uuid} with If-None-Match"""
+        thing = self.create_thing()
+        path = '/conditional/things/%s' % thing.uuid
+        response = self.webserver.get(path)
+        assert response.status_code == 200
+        etag = response.headers['ETag']
+        self.webserver.get(path, headers={'If-None-Match': etag}, status=304)
+        thing.edit_date = datetime(2001, 1, 1)
+        self.registry.flush()
+        response = self.webserver.get(path, headers={'If-None-Match': etag})
+        assert response.status_code == 200
+        assert response.headers['ETag'] != etag
+
+
+class TestCrudResourceResponseCache:
+    """Test CrudResource class from
+    test_bloks/test_1/views.py:ExampleResourceWithResponseCache.
+    """
+
+    @pytest.fixture(autouse=True)
+    def transact(self, request, registry_rest_api_1, webserver):
+        transaction = registry_rest_api_1.begin_nested()
+        self.registry = registry_rest_api_1
+
+        def rollback():
+            try:
+                transaction.rollback()
+            except Exception:
+                pass
+
+            for response_cache in CrudResource.RESPONSE_CACHES:
+                response_cache.clear()
+
+        request.addfinalizer(rollback)
+        self.webserver = webserver
+        return
+
+    def test_collection_get_is_cached(self):
+        """Example collection GET /cached/examples served by the cache"""
+        self.registry.Example.insert(name='air')
+        response = self.webserver.get('/cached/examples')
+        assert [x['name'] for x in response.json_body] == ['air']
+        # not written by the resource, the cache does not know it
+        self.registry.Example.insert(name='bar')
+        response = self.webserver.get('/cached/examples')
+        assert [x['name'] for x in response.json_body] == ['air']
+        assert int(response.headers.get('X-Total-Records')) == 1
+        response = self.webserver.get('/cached/examples?limit=10')
+        assert len(response.json_body) == 2
+
+    def test_collection_get_invalidated_by_post(self):
+        """Example collection POST /cached/examples forgets the cache"""
+        self.registry.Example.insert(name='air')
+        self.webserver.get('/cached/examples')
+        self.webserver.post_json('/cached/examples', [{'name': 'bar'}])
+        response = self.webserver.get('/cached/examples')
+        assert sorted(x['name'] for x in response.json_body) == [
+            'air', 'bar']
+
+    def test_collection_get_invalidated_by_another_resource(self):
+        """Example collection POST /examples forgets the cache of the model"""
+        self.registry.Example.insert(name='air')
+        self.webserver.get('/cached/examples')
+        self.webserver.post_json('/examples', [{'name': 'bar'}])
+        response = self.webserver.get('/cached/examples')
+        assert len(response.json_body) == 2
+
+    def test_get_invalidated_by_patch(self):
+        """Example PATCH /cached/examples/{id} forgets the cache"""
+        example = self.registry.Example.insert(name='air')
+        path = '/cached/examples/%d' % example.id
+        assert self.webserver.get(path).json_body['name'] == 'air'
+        self.webserver.patch_json(path, {'name': 'bar'})
+        assert self.webserver.get(path).json_body['name'] == 'bar'
+
+    def count_statements(self, path, **kwargs):
+        statements = []
+
+        def before_cursor_execute(conn, cursor, statement, *args):
+            if 'thing' in statement:
+                statements.append(statement)
+
+        connection = self.registry.session.connection()
+        event.listen(
+            connection, 'before_cursor_execute', before_cursor_execute)
+        try:
+            response = self.webserver.get(path, **kwargs)
+        finally:
+            event.remove(
+                connection, 'before_cursor_execute', before_cursor_execute)
+
+        return response, len(statements)
+
+    def create_thing(self, name='thing'):
+        example = self.registry.Example.insert(name=name)
+        return self.registry.Thing.insert(
+            name=name, secret='secret', example=example)
+
+    def test_collection_get_cached_without_query(self):
+        """Thing collection GET /cached/things, the cache is read before
+        the query of the ETag
+        """
+        self.create_thing()
+        response, count = self.count_statements('/cached/things')
+        assert count
+        etag = response.headers['ETag']
+        response, count = self.count_statements('/cached/things')
+        assert count == 0
+        assert response.headers['ETag'] == etag
+        assert response.headers['Last-Modified']
+        assert len(response.json_body) == 1
+
+    def test_collection_get_cached_not_modified(self):
+        """Thing collection GET /cached/things with the cached ETag"""
+        self.create_thing()
+        etag = self.webserver.get('/cached/things').headers['ETag']
+        response, count = self.count_statements(
+            '/cached/things', headers={'If-None-Match': etag}, status=304)
+        assert count == 0
+        assert response.headers['ETag'] == etag
+
+    def test_collection_get_cached_not_modified_since(self):
+        """Thing collection GET /cached/things with If-Modified-Since"""
+        self.create_thing()
+        last_modified = self.webserver.get(
+            '/cached/things').headers['Last-Modified']
+        self.webserver.get(
+            '/cached/things', headers={'If-Modified-Since': last_modified},
+            status=304)
+
+    def test_collection_get_invalidated_by_the_write_methods(
+        self, monkeypatch
+    ):
+        """Example collection POST /examples with an overwritten create
+        which calls the default one
+        """
+        self.registry.Example.insert(name='air')
+        self.webserver.get('/cached/examples')
+        resource = [cls for cls in RESOURCES
+                    if cls.__name__ == 'ExampleResource'][0]
+
+        def create(self, Model, params):
+            params['name'] = params['name'].upper()
+            return super(resource, self).create(Model, params)
+
+        monkeypatch.setattr(resource, 'create', create)
+        self.webserver.post_json('/examples', [{'name': 'bar'}])
+        response = self.webserver.get('/cached/examples')
+        assert sorted(x['name'] for x in response.json_body) == [
+            'BAR', 'air']
+
+
+class TestCrudResourceTextSearch:
+    """Test CrudResource class from
+    test_bloks/test_1/views.py:ExampleResourceWithTextIndexes.
+    """
+
+    @pytest.fixture(autouse=True)
+    def transact(self, request, registry_rest_api_1, webserver):
+        transaction = registry_rest_api_1.begin_nested()
+        request.addfinalizer(transaction.rollback)
+        self.registry = registry_rest_api_1
+        self.webserver = webserver
+        return
+
+    def test_collection_get_search_with_btree(self):
+        """Example collection GET /search/examples?filter[name][search]=ai"""
+        self.registry.Example.insert(name='air')
+        self.registry.Example.insert(name='bair')
+        response = self.webserver.get(
+            '/search/examples?filter[name][search]=ai')
+        assert response.status_code == 200
+        assert [x['name'] for x in response.json_body] == ['air']
+
+    def test_collection_get_icontains(self):
+        """Example collection GET /search/examples?filter[name][icontains]"""
+        self.registry.Example.insert(name='air')
+        self.registry.Example.insert(name='bair')
+        response = self.webserver.get(
+            '/search/examples?filter[name][icontains]=AI&order_by[name]=asc')
+        assert response.status_code == 200
+        assert [x['name'] for x in response.json_body] == ['air', 'bair']
+
+    def test_unknown_text_index(self):
+        with pytest.raises(ValueError):
+            type('BadResource', (CrudResource,), {
+                'text_indexes': {'name': 'unknown'}})
@@ -0,0 +1,249 @@
+# This file is a part of the AnyBlok / Pyramid / REST api project
+#
+# This Source Code Form is subject to the terms of the Mozilla Public License,
+# v. 2.0. If a copy of the MPL was not distributed with this file,You can
+# obtain one at http://mozilla.org/MPL/2.0/.
+import pytest
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from uuid import UUID, uuid4
+from pyramid.httpexceptions import HTTPNotFound
+from anyblok_pyramid_rest_api import crud_resource
+from anyblok_pyramid_rest_api.job import (
+    run_job, get_job, get_job_runner, ThreadJobRunner, JobRequest)
+
+
+class MockJobRunner:
+    """Keep the submitted jobs, the test executes them"""
+
+    def __init__(self):
+        self.jobs = []
+
+    def submit(self, registry, job_uuid):
+        self.jobs.append(job_uuid)
+
+
+class TestJob:
+    """Test the asynchronous actions of test_bloks/test_11/views.py"""
+
+    @pytest.fixture(autouse=True)
+    def transact(self, request, registry_rest_api_11, webserver,
+                 monkeypatch):
+        transaction = registry_rest_api_11.begin_nested()
+        self.registry = registry_rest_api_11
+        self.runner = MockJobRunner()
+        monkeypatch.setattr(crud_resource, 'get_job_runner',
+                            lambda settings: self.runner)
+
+        def rollback():
+            try:
+                transaction.rollback()
+            except Exception:
+                pass
+
+        request.addfinalizer(rollback)
+        self.webserver = webserver
+        return
+
+    def create_customer(self, name="bob"):
+        return self.registry.Customer.insert(name=name)
+
+    def enqueue(self, path, body=None):
+        return self.webserver.post_json(path, body or {}, status=202)
+
+    def test_enqueue_job(self):
+        customer = self.create_customer()
+        response = self.enqueue(
+            '/customers/v11/%d/execute/rename' % customer.id,
+            {'name': 'alice'})
+        assert response.status_code == 202
+        assert response.json_body['status'] == 'pending'
+        job_uuid = UUID(response.json_body['id'])
+        assert response.headers['Location'].endswith('/jobs/%s' % job_uuid)
+        assert self.runner.jobs == [job_uuid]
+        job = self.registry.RestApi.Job.query().get(job_uuid)
+        assert job.action == 'rename'
+        assert job.path == {'id': str(customer.id)}
+        assert job.body == {'name': 'alice'}
+        assert customer.name == 'bob'
+
+    def test_run_job(self):
+        customer = self.create_customer()
+        response = self.enqueue(
+            '/customers/v11/%d/execute/rename' % customer.id,
+            {'name': 'alice'})
+        run_job(self.registry, self.runner.jobs[0])
+        response = self.webserver.get(response.headers['Location'])
+        assert response.json_body['status'] == 'done'
+        assert response.json_body['result'] == {'old': 'bob', 'new': 'alice'}
+        assert self.registry.Customer.query().get(customer.id).name == (
+            'alice')
+
+    def test_run_collection_job(self):
+        self.create_customer()
+        self.create_customer(name='alice')
+        response = self.webserver.get(
+            '/customers/v11/execute/count', status=202)
+        run_job(self.registry, self.runner.jobs[0])
+        response = self.webserver.get(response.headers['Location'])
+        assert response.json_body['result'] == 2
+
+    def test_job_run_once(self):
+        customer = self.create_customer()
+        self.enqueue('/customers/v11/%d/execute/rename' % customer.id,
+                     {'name': 'alice'})
+        run_job(self.registry, self.runner.jobs[0])
+        customer.name = 'bob'
+        run_job(self.registry, self.runner.jobs[0])
+        assert customer.name == 'bob'
+
+    def test_failed_job(self):
+        customer = self.create_customer()
+        response = self.enqueue(
+            '/customers/v11/%d/execute/fail' % customer.id)
+        run_job(self.registry, self.runner.jobs[0])
+        response = self.webserver.get(response.headers['Location'])
+        assert response.json_body['status'] == 'failed'
+        assert response.json_body['error'] == 'The action failed'
+        assert 'result' not in response.json_body
+
+    def test_enqueue_job_bad_body(self):
+        customer = self.create_customer()
+        self.webserver.post_json(
+            '/customers/v11/%d/execute/rename' % customer.id, {},
+            status=400)
+        assert self.runner.jobs == []
+        assert not self.registry.RestApi.Job.query().count()
+
+    def test_get_unknown_job(self):
+        self.webserver.get('/jobs/%s' % uuid4(), status=404)
+
+    def test_get_job_bad_uuid(self):
+        self.webserver.get('/jobs/not-an-uuid', status=404)
+
+    def get_job(self, job, userid=None):
+        request = SimpleNamespace(
+            matchdict={'uuid': str(job.uuid)},
+            anyblok=SimpleNamespace(registry=self.registry),
+            authenticated_userid=userid)
+        return get_job(request)
+
+    def insert_job(self, **kwargs):
+        return self.registry.RestApi.Job.insert(
+            resource='module:Resource', action='action', **kwargs)
+
+    def test_get_job_of_the_user(self):
+        job = self.insert_job(userid='1')
+        assert self.get_job(job, userid=1)['id'] == str(job.uuid)
+        assert self.get_job(job, userid='1')['id'] == str(job.uuid)
+
+    def test_get_job_of_another_user(self):
+        job = self.insert_job(userid='1')
+        with pytest.raises(HTTPNotFound):
+            self.get_job(job, userid=2)
+
+    def test_get_job_of_a_user_not_authenticated(self):
+        job = self.insert_job(userid='0')
+        with pytest.raises(HTTPNotFound):
+            self.get_job(job)
+
+    def test_get_job_without_owner(self):
+        job = self.insert_job()
+        assert self.get_job(job)['id'] == str(job.uuid)
+        assert self.get_job(job, userid='1')['id'] == str(job.uuid)
+
+    def test_fail_stale_jobs(self):
+        Job = self.registry.RestApi.Job
+        old = datetime.now() - timedelta(hours=2)
+        pending = self.insert_job()
+        running = self.insert_job(status='running')
+        done = self.insert_job(status='done')
+        recent = self.insert_job()
+        Job.query().filter(Job.uuid != recent.uuid).update(
+            dict(edit_date=old), synchronize_session=False)
+        assert Job.fail_stale_jobs(3600) == 2
+        self.registry.expire_all()
+        assert pending.status == 'failed'
+        assert pending.error == 'The job was interrupted'
+        assert running.status == 'failed'
+        assert done.status == 'done'
+        assert recent.status == 'pending'
+        run_job(self.registry, pending.uuid)
+        assert pending.status == 'failed'
+
+    def test_enqueue_job_without_job_model(self, monkeypatch):
+        monkeypatch.delitem(
+            self.registry.loaded_namespaces, 'Model.RestApi.Job')
+        fail = self.webserver.get('/customers/v11/execute/count', status=501)
+        assert fail.json_body['errors'][0]['description'] == (
+            "The asynchronous action 'count' needs the blok rest-api-job")
+        assert self.runner.jobs == []
+
+    def test_job_request(self):
+        customer = self.create_customer()
+        self.enqueue('/customers/v11/%d/execute/rename' % customer.id,
+                     {'name': 'alice'})
+        job = self.registry.RestApi.Job.query().get(self.runner.jobs[0])
+        request = JobRequest(self.registry, job)
+        assert request.matchdict == {'id': str(customer.id)}
+        request.response.headers['X-Test'] = 'test'
+        called = []
+        request.add_finished_callback(called.append)
+        request.process_finished_callbacks()
+        assert called == [request]
+        assert request.finished_callbacks == []
+
+
+class TestThreadJobRunner:
+    """Test the jobs executed by the pool of threads with
+    test_bloks/test_11/views.py
+    """
+
+    @pytest.fixture(autouse=True)
+    def transact(self, request, registry_rest_api_11, webserver,
+                 monkeypatch):
+        transaction = registry_rest_api_11.begin_nested()
+        self.registry = registry_rest_api_11
+        self.runner = ThreadJobRunner(max_workers=1)
+        monkeypatch.setattr(crud_resource, 'get_job_runner',
+                            lambda settings: self.runner)
+
+        def rollback():
+            self.runner.executor.shutdown(wait=True)
+            try:
+                transaction.rollback()
+            except Exception:
+                pass
+
+        request.addfinalizer(rollback)
+        self.webserver = webserver
+        return
+
+    def test_run_job_in_a_thread(self):
+        customer = self.registry.Customer.insert(name='bob')
+        response = self.webserver.post_json(
+            '/customers/v11/%d/execute/rename' % customer.id,
+            {'name': 'alice'}, status=202)
+        # wait the end of the job
+        self.runner.executor.shutdown(wait=True)
+        response = self.webserver.get(response.headers['Location'])
+        assert response.json_body['status'] == 'done'
+        assert response.json_body['result'] == {'old': 'bob', 'new': 'alice'}
+
+    def test_failed_job_in_a_thread(self):
+        customer = self.registry.Customer.insert(name='bob')
+        response = self.webserver.post_json(
+            '/customers/v11/%d/execute/fail' % customer.id, {}, status=202)
+        self.runner.executor.shutdown(wait=True)
+        response = self.webserver.get(response.headers['Location'])
+        assert response.json_body['status'] == 'failed'
+        assert response.json_body['error'] == 'The action failed'
+
+
+class TestJobRunner:
+
+    def test_runner_by_max_workers(self):
+        runner = get_job_runner({'rest_api.jobs.max_workers': '2'})
+        assert get_job_runner({'rest_api.jobs.max_workers': 2}) is runner
+        assert runner.executor._max_workers == 2
+        assert get_job_runner({}) is not runner
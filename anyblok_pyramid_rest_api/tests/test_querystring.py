@@ -7,7 +7,11 @@
 # v. 2.0. If a copy of the MPL was not distributed with this file,You can
 # obtain one at http://mozilla.org/MPL/2.0/.
 import pytest
-from anyblok_pyramid_rest_api.querystring import QueryString
+from sqlalchemy import event
+from anyblok_pyramid_rest_api.querystring import (
+    QueryString, OPERATORS, encode_cursor)
+from anyblok_pyramid_rest_api.cache import LRUCache
+from anyblok_pyramid_rest_api.adapter import Adapter
 from anyblok.column import Integer, String
 from anyblok.relationship import Many2One
 from .conftest import init_registry_with_bloks
@@ -184,6 +188,141 @@ class TestQueryString:
             "Filter 'in' except a comma separated string value" in
             request.errors.messages)
 
+    def test_querystring_update_filter_ne(self, registry_blok):
+        registry = registry_blok
+        request = MockRequest(self)
+        model = registry.System.Blok
+        query = model.query()
+        qs = QueryString(request, model)
+        Q = query.filter(qs.update_filter(model, 'name', 'ne', 'anyblok-core'))
+        assert 'anyblok-core' not in Q.all().name
+        assert 'anyblok-test' in Q.all().name
+
+    def test_querystring_update_filter_not_in(self, registry_blok):
+        registry = registry_blok
+        request = MockRequest(self)
+        model = registry.System.Blok
+        query = model.query()
+        qs = QueryString(request, model)
+        Q = query.filter(qs.update_filter(
+            model, 'name', 'not_in', 'anyblok-core,anyblok-test'))
+        names = Q.all().name
+        assert 'anyblok-core' not in names
+        assert 'anyblok-test' not in names
+        assert query.count() == Q.count() + 2
+
+    def test_querystring_update_filter_startswith(self, registry_blok):
+        registry = registry_blok
+        request = MockRequest(self)
+        model = registry.System.Blok
+        query = model.query()
+        qs = QueryString(request, model)
+        Q = query.filter(qs.update_filter(
+            model, 'name', 'startswith', 'anyblok-co'))
+        assert Q.all().name == ['anyblok-core']
+
+    def test_querystring_update_filter_startswith_escape(self, registry_blok):
+        registry = registry_blok
+        request = MockRequest(self)
+        model = registry.System.Blok
+        query = model.query()
+        qs = QueryString(request, model)
+        Q = query.filter(qs.update_filter(model, 'name', 'startswith', '%'))
+        assert Q.count() == 0
+
+    def test_querystring_update_filter_or_startswith(self, registry_blok):
+        registry = registry_blok
+        request = MockRequest(self)
+        model = registry.System.Blok
+        query = model.query()
+        qs = QueryString(request, model)
+        Q = query.filter(qs.update_filter(
+            model, 'name', 'or-startswith', 'anyblok-co, anyblok-te'))
+        names = Q.all().name
+        assert len(names) == 2
+        assert 'anyblok-core' in names
+        assert 'anyblok-test' in names
+
+    def test_querystring_update_filter_or_unknown_operator(self,
+                                                           registry_blok):
+        registry = registry_blok
+        request = MockRequest(self)
+        model = registry.System.Blok
+        qs = QueryString(request, model)
+        assert qs.update_filter(model, 'name', 'or-in', 'a,b') is None
+        assert "Filter 'or-in' does not exist." in request.errors.messages
+
+    def test_querystring_from_filter_by_with_adapter_operator(
+        self, registry_blok
+    ):
+        registry = registry_blok
+        request = MockRequest(self)
+        model = registry.System.Blok
+        query = model.query()
+
+        class BlokAdapter(Adapter):
+
+            @Adapter.operator('endswith', kind='pattern')
+            def endswith_operator(self, column, value):
+                return column.endswith(value, autoescape=True)
+
+        adapter = BlokAdapter(registry, model)
+        adapter.load_decorators()
+        qs = QueryString(request, model, adapter=adapter)
+        qs.filter_by = [dict(key='name', op='endswith', value='-core')]
+        Q = qs.from_filter_by(query)
+        assert Q.all().name == ['anyblok-core']
+        assert not request.errors.messages
+
+    @pytest.mark.parametrize('op,value,names', [
+        ('istartswith', 'ANYBLOK-CO', ['anyblok-core']),
+        ('endswith', '-core', ['anyblok-core']),
+        ('iendswith', '-CORE', ['anyblok-core']),
+        ('contains', 'blok-co', ['anyblok-core']),
+        ('icontains', 'BLOK-CO', ['anyblok-core']),
+        ('contains', '%', []),
+        ('pattern', 'anyblok-c%e', ['anyblok-core']),
+        ('ipattern', 'ANYBLOK-C%E', ['anyblok-core']),
+    ])
+    def test_querystring_update_filter_like_modes(self, registry_blok, op,
+                                                  value, names):
+        registry = registry_blok
+        request = MockRequest(self)
+        model = registry.System.Blok
+        query = model.query()
+        qs = QueryString(request, model)
+        Q = query.filter(qs.update_filter(model, 'name', op, value))
+        assert Q.all().name == names
+
+    @pytest.mark.parametrize('text_indexes', [
+        {},
+        {'name': 'btree'},
+        {'name': 'fulltext'},
+        {'name': ('fulltext', 'simple')},
+    ])
+    def test_querystring_update_filter_search(self, registry_blok,
+                                              text_indexes):
+        registry = registry_blok
+        request = MockRequest(self)
+        model = registry.System.Blok
+        query = model.query()
+        qs = QueryString(request, model, text_indexes=text_indexes)
+        value = 'anyblok' if text_indexes.get('name') == 'btree' else 'core'
+        Q = query.filter(qs.update_filter(model, 'name', 'search', value))
+        assert 'anyblok-core' in Q.all().name
+
+    def test_querystring_get_text_index(self, registry_blok):
+        registry = registry_blok
+        request = MockRequest(self)
+        model = registry.System.Blok
+        qs = QueryString(request, model, text_indexes={
+            'name': 'btree', 'author': ('fulltext', 'english')})
+        assert qs.get_text_index(model, 'name') == ('btree', 'simple')
+        assert qs.get_text_index(model, 'author') == ('fulltext', 'english')
+        assert qs.get_text_index(model, 'version') == (None, None)
+        assert qs.get_text_index(
+            registry.System.Model, 'name') == (None, None)
+
     def test_querystring_from_filter_by_ok(self, registry_blok):
         registry = registry_blok
         request = MockRequest(self)
@@ -687,6 +826,207 @@ class TestQueryStringOnInteger:
         model.insert(number=11)
         assert len(Q.all()) == 2
 
+    def test_querystring_update_filter_in_typed(self,
+                                                registry_blok_with_integer):
+        registry = registry_blok_with_integer
+        request = MockRequest(self)
+        model = registry.Exemple
+        query = model.query()
+        qs = QueryString(request, model)
+        condition = qs.update_filter(model, 'number', 'in', '9,11')
+        assert condition.right.value == [9, 11]
+        Q = query.filter(condition)
+        model.insert(number=9)
+        model.insert(number=10)
+        model.insert(number=11)
+        assert sorted(Q.all().number) == [9, 11]
+
+    def test_querystring_update_filter_in_bad_type(self,
+                                                   registry_blok_with_integer):
+        registry = registry_blok_with_integer
+        request = MockRequest(self)
+        model = registry.Exemple
+        qs = QueryString(request, model)
+        assert qs.update_filter(model, 'number', 'in', '9,nine') is None
+        assert (
+            "Filter 'number': 'nine' is not a valid Integer" in
+            request.errors.messages)
+
+    def test_querystring_update_filter_eq_typed(self,
+                                                registry_blok_with_integer):
+        registry = registry_blok_with_integer
+        request = MockRequest(self)
+        model = registry.Exemple
+        qs = QueryString(request, model)
+        condition = qs.update_filter(model, 'number', 'eq', '10')
+        assert condition.right.value == 10
+
+    def test_querystring_update_filter_out_of_range(
+        self, registry_blok_with_integer
+    ):
+        registry = registry_blok_with_integer
+        request = MockRequest(self)
+        model = registry.Exemple
+        qs = QueryString(request, model)
+        assert qs.update_filter(
+            model, 'number', 'gt', '99999999999999999999') is None
+        assert (
+            "Filter 'number': '99999999999999999999' is not a valid Integer"
+            in request.errors.messages)
+
+    def test_querystring_coercer_is_cached(self, registry_blok_with_integer):
+        registry = registry_blok_with_integer
+        model = registry.Exemple
+        qs = QueryString(MockRequest(self), model)
+        coercer = qs.get_coercer(model, 'number', model.number)
+        assert coercer[0] == 'Integer'
+        qs = QueryString(MockRequest(self), model)
+        assert qs.get_coercer(model, 'number', model.number) is coercer
+
+    def test_querystring_from_filter_by_bad_value_without_sql(
+        self, registry_blok_with_integer
+    ):
+        registry = registry_blok_with_integer
+        request = MockRequest(self)
+        model = registry.Exemple
+        qs = QueryString(request, model)
+        qs.filter_by = [dict(key='number', op='eq', value='ten')]
+        statements = []
+
+        def before_cursor_execute(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        query = model.query()
+        # the description of the field is read once by registry
+        qs.get_coercer(model, 'number', model.number)
+        connection = registry.session.connection()
+        event.listen(
+            connection, 'before_cursor_execute', before_cursor_execute)
+        try:
+            qs.from_filter_by(query)
+        finally:
+            event.remove(
+                connection, 'before_cursor_execute', before_cursor_execute)
+
+        assert statements == []
+        assert (
+            "Filter 'number': 'ten' is not a valid Integer" in
+            request.errors.messages)
+
+    def test_querystring_update_filter_or_gt(self, registry_blok_with_integer):
+        registry = registry_blok_with_integer
+        request = MockRequest(self)
+        model = registry.Exemple
+        query = model.query()
+        qs = QueryString(request, model)
+        Q = query.filter(qs.update_filter(model, 'number', 'or-gt', '12, 9'))
+        model.insert(number=9)
+        model.insert(number=10)
+        model.insert(number=11)
+        assert sorted(Q.all().number) == [10, 11]
+
+    def test_querystring_update_filter_between(self,
+                                               registry_blok_with_integer):
+        registry = registry_blok_with_integer
+        request = MockRequest(self)
+        model = registry.Exemple
+        query = model.query()
+        qs = QueryString(request, model)
+        Q = query.filter(qs.update_filter(model, 'number', 'between', '9,10'))
+        model.insert(number=8)
+        model.insert(number=9)
+        model.insert(number=10)
+        model.insert(number=11)
+        assert sorted(Q.all().number) == [9, 10]
+
+    def test_querystring_update_filter_between_bad_values(
+        self, registry_blok_with_integer
+    ):
+        registry = registry_blok_with_integer
+        request = MockRequest(self)
+        model = registry.Exemple
+        qs = QueryString(request, model)
+        assert qs.update_filter(model, 'number', 'between', '9') is None
+        assert (
+            "Filter 'between' except two comma separated values" in
+            request.errors.messages)
+
+    def test_querystring_update_filter_is_null(self,
+                                               registry_blok_with_integer):
+        registry = registry_blok_with_integer
+        request = MockRequest(self)
+        model = registry.Exemple
+        query = model.query()
+        qs = QueryString(request, model)
+        Q_null = query.filter(
+            qs.update_filter(model, 'number', 'is_null', 'true'))
+        Q_not_null = query.filter(
+            qs.update_filter(model, 'number', 'is_null', 'false'))
+        model.insert(number=9)
+        model.insert()
+        assert Q_null.count() == 1
+        assert Q_not_null.all().number == [9]
+
+    def test_querystring_update_filter_is_null_bad_value(
+        self, registry_blok_with_integer
+    ):
+        registry = registry_blok_with_integer
+        request = MockRequest(self)
+        model = registry.Exemple
+        qs = QueryString(request, model)
+        assert qs.update_filter(model, 'number', 'is_null', 'maybe') is None
+        assert "'maybe' is not a boolean" in request.errors.messages
+
+    def test_querystring_from_cursor_coerce_the_values(
+        self, registry_blok_with_integer
+    ):
+        registry = registry_blok_with_integer
+        model = registry.Exemple
+        ids = [model.insert(number=x).id for x in range(4)]
+        request = MockRequest(self)
+        qs = QueryString(request, model)
+        qs.cursor = encode_cursor([str(ids[1])])
+        Q = qs.from_cursor(model.query())
+        assert request.errors.messages == []
+        assert ids[1] in Q.statement.compile().params.values()
+        assert Q.all().id == ids[2:]
+
+    def test_querystring_from_cursor_with_nullable_order_by(
+        self, registry_blok_with_integer
+    ):
+        registry = registry_blok_with_integer
+        model = registry.Exemple
+        request = MockRequest(self)
+        qs = QueryString(request, model)
+        qs.order_by = [dict(key='number', op='asc')]
+        qs.cursor = ''
+        qs.from_cursor(model.query())
+        assert request.errors.messages == [
+            "The cursor pagination needs order_by on the not nullable "
+            "columns of the model, 'number' is nullable"]
+
+    def test_querystring_from_cursor_with_null_value(
+        self, registry_blok_with_integer
+    ):
+        registry = registry_blok_with_integer
+        model = registry.Exemple
+        request = MockRequest(self)
+        qs = QueryString(request, model)
+        qs.cursor = encode_cursor([None])
+        qs.from_cursor(model.query())
+        assert request.errors.messages == ['Invalid cursor %r' % qs.cursor]
+
+    def test_querystring_from_cursor_with_bad_value(
+        self, registry_blok_with_integer
+    ):
+        registry = registry_blok_with_integer
+        model = registry.Exemple
+        request = MockRequest(self)
+        qs = QueryString(request, model)
+        qs.cursor = encode_cursor(['ten'])
+        qs.from_cursor(model.query())
+        assert request.errors.messages == ['Invalid cursor %r' % qs.cursor]
+
 
 @pytest.fixture(scope="class")
 def registry_blok_with_m2o(request, bloks_loaded):
@@ -728,6 +1068,33 @@ class TestQueryStringWithM2O:
         model.insert(test=t1)
         assert len(Q.all()) == 2
 
+    def test_querystring_join_is_shared_by_filters_and_orders(
+        self, registry_blok_with_m2o
+    ):
+        registry = registry_blok_with_m2o
+        request = MockRequest(self)
+        model = registry.Test3
+        qs = QueryString(request, model)
+        qs.filter_by = [
+            dict(key='test2.test.name', op='ne', value='other'),
+            dict(key='test2.other', op='eq', value='o1'),
+        ]
+        qs.composite_filter_by = [dict(filters=[[
+            dict(key='test2.test.name', op='eq', value='test'),
+            dict(key='test2.other', op='eq', value='o1'),
+        ]], mode='include')]
+        qs.order_by = [dict(key='test2.test.name', op='desc')]
+        Q = qs.update_sqlalchemy_query(model.query())
+        assert not request.errors.messages
+        assert str(Q).count('JOIN') == 2
+        assert set(qs.joins) == {('test2',), ('test2', 'test')}
+        t1 = registry.Test(name='test')
+        t2 = registry.Test(name='other')
+        model.insert(test2=registry.Test2.insert(test=t1, other='o1'))
+        model.insert(test2=registry.Test2.insert(test=t2, other='o1'))
+        model.insert(test2=registry.Test2.insert(test=t1, other='o2'))
+        assert len(Q.all()) == 1
+
     def test_querystring_from_filter_by_with_relationship_bad_key(
         self, registry_blok_with_m2o
     ):
@@ -795,6 +1162,96 @@ class TestQueryStringWithM2O:
         Model = qs.get_remote_model_for(registry.Test2, 'test')
         assert Model is registry.Test
 
+    def test_querystring_get_remote_model_for_is_cached(
+        self, registry_blok_with_m2o
+    ):
+        registry = registry_blok_with_m2o
+        request = MockRequest(self)
+        qs = QueryString(request, registry.Test2)
+        QueryString.REMOTE_MODELS.clear(registry)
+        assert qs.get_remote_model_for(registry.Test2, 'test') is registry.Test
+        assert qs.get_remote_model_for(registry.Test, 'name') is None
+        remote_models = QueryString.REMOTE_MODELS.get_cache(registry)
+        assert remote_models == {
+            ('Model.Test2', 'test'): 'Model.Test',
+            ('Model.Test', 'name'): None,
+        }
+
+    def test_querystring_plan_is_shared_by_shape(
+        self, registry_blok_with_m2o
+    ):
+        registry = registry_blok_with_m2o
+        model = registry.Test2
+        plans = LRUCache(10)
+        request = MockRequest(self)
+        request.params = {'filter[test.name][eq]': 'test'}
+        qs = QueryString(request, model, plans=plans)
+        qs.from_filter_by(model.query())
+        assert len(plans) == 1
+        assert qs.plan[('Model.Test2', ('test', 'name'))] == [
+            registry.Test2, registry.Test]
+
+        model.insert(test=registry.Test.insert(name='other'))
+        request = MockRequest(self)
+        request.params = {'filter[test.name][eq]': 'other'}
+        qs2 = QueryString(request, model, plans=plans)
+        assert qs2.plan is qs.plan
+
+        def get_remote_model_for(*args):
+            raise Exception('The plan should be used')
+
+        qs2.get_remote_model_for = get_remote_model_for
+        Q = qs2.from_filter_by(model.query())
+        assert len(Q.all()) == 1
+
+    def test_querystring_plan_keeps_the_joins_and_the_operators(
+        self, registry_blok_with_m2o
+    ):
+        registry = registry_blok_with_m2o
+        model = registry.Test2
+        plans = LRUCache(10)
+        request = MockRequest(self)
+        request.params = {'filter[test.name][eq]': 'test'}
+        qs = QueryString(request, model, plans=plans)
+        qs.from_filter_by(model.query())
+        assert qs.plan[('operator', 'eq')] == OPERATORS['eq']
+        assert qs.plan[('to_many', 'Model.Test2', ('test', 'name'))] is None
+
+        request = MockRequest(self)
+        request.params = {'filter[test.name][eq]': 'other'}
+        qs2 = QueryString(request, model, plans=plans)
+
+        def find_operator(op):
+            raise Exception('The plan should be used')
+
+        qs2.find_operator = find_operator
+        qs2.get_alias = find_operator
+        model.insert(test=registry.Test.insert(name='other'))
+        Q = qs2.from_filter_by(model.query())
+        assert qs2.joins[('test',)] is qs.joins[('test',)]
+        assert len(Q.all()) == 1
+
+    def test_querystring_plan_by_shape(self, registry_blok_with_m2o):
+        registry = registry_blok_with_m2o
+        model = registry.Test2
+        plans = LRUCache(10)
+        request = MockRequest(self)
+        request.params = {'filter[test.name][eq]': 'test'}
+        qs = QueryString(request, model, plans=plans)
+        request = MockRequest(self)
+        request.params = {'filter[test.name][like]': 'test'}
+        qs2 = QueryString(request, model, plans=plans)
+        assert qs2.plan is not qs.plan
+        assert len(plans) == 2
+
+    def test_querystring_is_to_many(self, registry_blok_with_m2o):
+        registry = registry_blok_with_m2o
+        qs = QueryString(MockRequest(self), registry.Test2)
+        assert qs.is_to_many(registry.Test2, 'test') is False
+        assert qs.is_to_many(registry.System.Blok, 'name') is False
+        field_types = QueryString.FIELD_TYPES.get_cache(registry)
+        assert field_types[('Model.Test2', 'test')] == 'Many2One'
+
     def test_querystring_get_remote_model_for_without_relationship(
         self, registry_blok_with_m2o
     ):
@@ -881,3 +1338,30 @@ class TestQueryStringWithM2O:
         )]
         Q = qs.from_composite_filter_by(query)
         assert Q.one().id == x.id
+
+    def test_querystring_from_fields(self, registry_blok_with_m2o):
+        registry = registry_blok_with_m2o
+        request = MockRequest(self)
+        model = registry.Test2
+        model.insert(test=registry.Test(name='test'), other='foo')
+        registry.expire_all()
+        qs = QueryString(request, model)
+        qs.fields = ['other']
+        entry = qs.from_fields(model.query()).one()
+        assert 'other' in entry.__dict__
+        assert 'test_id' not in entry.__dict__
+
+    def test_querystring_from_fields_with_relationship(
+        self, registry_blok_with_m2o
+    ):
+        registry = registry_blok_with_m2o
+        request = MockRequest(self)
+        model = registry.Test2
+        model.insert(test=registry.Test(name='test'), other='foo')
+        registry.expire_all()
+        qs = QueryString(request, model)
+        qs.fields = ['test']
+        entry = qs.from_fields(model.query()).one()
+        assert 'test_id' in entry.__dict__
+        assert 'other' not in entry.__dict__
+        assert entry.test.name == 'test'
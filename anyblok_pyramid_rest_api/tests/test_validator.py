@@ -0,0 +1,146 @@
+# This file is a part of the AnyBlok / Pyramid / REST api project
+#
+# This Source Code Form is subject to the terms of the Mozilla Public License,
+# v. 2.0. If a copy of the MPL was not distributed with this file,You can
+# obtain one at http://mozilla.org/MPL/2.0/.
+import pytest
+from timeit import timeit
+from anyblok_pyramid_rest_api.validator import (
+    deserialize_querystring, tokenize_querystring_key,
+    parse_key_with_one_element, parse_key_with_two_elements)
+
+
+PARAMS = [
+    ('filter[name][like]', 'a'),
+    ('~filter[test.name][eq]', '1'),
+    ('order_by[name]', 'asc'),
+    ('composite-filter[a:b][eq:eq]', '1:2'),
+    ('context[lang]', 'fr'),
+    ('tag', 'green'),
+    ('primary-keys[id]', '1,2'),
+]
+
+
+def get_params(count):
+    params = {}
+    for index in range(count):
+        key, value = PARAMS[index % len(PARAMS)]
+        if '[' in key:
+            # one distinct key by entry
+            key = key.replace('[', '[k%d' % index, 1)
+
+        params[key] = value
+
+    return params
+
+
+class TestDeserializeQueryString:
+
+    def test_parse_key_with_two_elements(self):
+        assert parse_key_with_two_elements('filter[a.b][eq]') == ('a.b', 'eq')
+
+    def test_parse_key_with_one_element(self):
+        assert parse_key_with_one_element('order_by[name]') == 'name'
+
+    def test_tokenize_filter(self):
+        assert tokenize_querystring_key('filter[a.b][eq]') == (
+            'filter', 'include', 'a.b', 'eq')
+        assert tokenize_querystring_key('~filter[a][in]') == (
+            'filter', 'exclude', 'a', 'in')
+
+    def test_tokenize_composite_filter(self):
+        assert tokenize_querystring_key('~composite-filter[a:b][eq:lt]') == (
+            'composite-filter', 'exclude', 'a:b', 'eq:lt')
+
+    def test_tokenize_one_element(self):
+        assert tokenize_querystring_key('primary-keys[id]') == (
+            'primary-keys', 'include', 'id', None)
+        assert tokenize_querystring_key('context[lang]') == (
+            'context', 'include', 'lang', None)
+        assert tokenize_querystring_key('order_by[name]') == (
+            'order_by', 'include', 'name', None)
+
+    def test_tokenize_unknown(self):
+        assert tokenize_querystring_key('unknown')[0] is None
+        assert tokenize_querystring_key('filter[a]')[0] is None
+        assert tokenize_querystring_key('~order_by[name]')[0] is None
+
+    def test_deserialize_querystring(self):
+        res = deserialize_querystring({
+            'filter[name][like]': 'a',
+            '~filter[number][in]': '1,2',
+            'composite-filter[a:b][eq:eq]': '1:2',
+            '~primary-keys[id]': '3',
+            'context[lang]': 'fr',
+            'order_by[name]': 'desc',
+            'tag': 'green',
+            'tags': 'red,blue',
+            'limit': '10',
+            'offset': '5',
+        })
+        assert res['filter_by'] == [
+            dict(key='name', op='like', value='a', mode='include'),
+            dict(key='number', op='in', value='1,2', mode='exclude'),
+        ]
+        assert res['composite_filter_by'] == [{
+            'filters': [[dict(key='a', value='1', op='eq'),
+                         dict(key='b', value='2', op='eq')]],
+            'mode': 'include',
+        }]
+        assert res['filter_by_primary_keys'] == {
+            'filters': [[dict(key='id', value='3')]],
+            'mode': 'exclude',
+        }
+        assert res['context'] == {'lang': 'fr'}
+        assert res['order_by'] == [dict(key='name', op='desc')]
+        assert res['tags'] == ['green', 'red', 'blue']
+        assert res['limit'] == 10
+        assert res['offset'] == 5
+
+    def test_deserialize_querystring_deprecated_order_by(self):
+        with pytest.warns(DeprecationWarning):
+            res = deserialize_querystring({'order_by[asc]': 'name'})
+
+        assert res['order_by'] == [dict(key='name', op='asc')]
+
+    def test_filter_operators_deprecated(self):
+        from anyblok_pyramid_rest_api import validator
+
+        with pytest.warns(DeprecationWarning):
+            operators = validator.FILTER_OPERATORS
+
+        assert 'eq' in operators
+        assert 'between' in operators
+        assert 'or-ilike' in operators
+        assert 'or-in' not in operators
+
+    def test_deserialize_querystring_bad_key(self):
+        with pytest.raises(KeyError):
+            deserialize_querystring({'unknown': 'value'})
+
+        with pytest.raises(KeyError):
+            deserialize_querystring({'~context[lang]': 'fr'})
+
+    @pytest.mark.parametrize('count', [1, 10, 100])
+    def test_deserialize_querystring_many_params(self, count):
+        params = get_params(count)
+        res = deserialize_querystring(params)
+        # only the last primary-keys entry is kept
+        primary_keys = len([x for x in params if x.startswith('primary')])
+        parsed = (
+            len(res['filter_by']) + len(res['composite_filter_by']) +
+            len(res['order_by']) + len(res['context']) + len(res['tags']) +
+            primary_keys)
+        assert parsed == len(params)
+
+    @pytest.mark.benchmark
+    @pytest.mark.parametrize('count', [1, 10, 100])
+    def test_deserialize_querystring_benchmark(self, count, record_property):
+        params = get_params(count)
+        number = max(10000 // count, 1)
+        duration = timeit(lambda: deserialize_querystring(params),
+                          number=number)
+        record_property('deserialize_querystring_params', len(params))
+        record_property('deserialize_querystring_params_by_second',
+                        round(len(params) * number / duration))
+        assert duration > 0
@@ -8,6 +8,7 @@
 # obtain one at http://mozilla.org/MPL/2.0/.
 from cornice.validators import extract_cstruct
 from marshmallow import ValidationError, INCLUDE
+from functools import lru_cache
 import warnings
 from logging import getLogger
 import re
@@ -15,25 +16,74 @@ import re
 logger = getLogger(__name__)
 
 
-FILTER_OPERATORS = [
-    'eq', 'like', 'ilike', 'lt', 'lte', 'gt', 'gte',
-    'in', 'or-like', 'or-ilike', 'or-lt', 'or-lte', 'or-gt', 'or-gte'
-]
 ORDER_BY_OPERATORS = ['asc', 'desc']
 
 
+def __getattr__(name):
+    # FILTER_OPERATORS is kept for compatibility, computed from the
+    # operators of the querystring, adapters included
+    if name == 'FILTER_OPERATORS':
+        from .querystring import OPERATORS, OR_KINDS
+
+        warnings.warn(
+            "deprecated: replace FILTER_OPERATORS by the keys of "
+            "anyblok_pyramid_rest_api.querystring.OPERATORS",
+            DeprecationWarning, stacklevel=2)
+        operators = list(OPERATORS)
+        return operators + [
+            'or-' + op for op in operators if OPERATORS[op][0] in OR_KINDS]
+
+    raise AttributeError(
+        "module %r has no attribute %r" % (__name__, name))
+
+
+KEY_WITH_TWO_ELEMENTS = re.compile(r".*\[(.*)\]\[(.*)\]")
+KEY_WITH_ONE_ELEMENT = re.compile(r".*\[(.*)\]")
+QUERYSTRING_KEY = re.compile(
+    r"(?P<mode>~?)(?:"
+    r"(?P<two>filter|composite-filter)\[(?P<key>.*)\]\[(?P<op>.*)\]|"
+    r"(?P<one>primary-keys|context|order_by)\[(?P<element>.*)\]"
+    r")$")
+
+
+@lru_cache(maxsize=1024)
+def tokenize_querystring_key(k):
+    """Split the key of an entry of the querystring
+
+    The keys are the same from a request to another, the tokens are cached
+
+    :param k: key of the querystring, ex: ``~filter[name][eq]``
+    :rtype: tuple (name or None if the key is unknown, mode, key, op)
+    """
+    match = QUERYSTRING_KEY.match(k)
+    if match is None:
+        return None, None, None, None
+
+    mode = "exclude" if match.group('mode') else "include"
+    if match.group('two'):
+        return match.group('two'), mode, match.group('key'), match.group('op')
+
+    name = match.group('one')
+    if name != 'primary-keys' and match.group('mode'):
+        # only the filters can be excluded
+        return None, None, None, None
+
+    return name, mode, match.group('element'), None
+
+
 def parse_key_with_two_elements(filter_):
-    pattern = ".*\\[(.*)\\]\\[(.*)\\]"
-    return re.match(pattern, filter_).groups()
+    return KEY_WITH_TWO_ELEMENTS.match(filter_).groups()
 
 
 def parse_key_with_one_element(filter_):
-    pattern = ".*\\[(.*)\\]"
-    return re.match(pattern, filter_).groups()[0]
+    return KEY_WITH_ONE_ELEMENT.match(filter_).groups()[0]
 
 
 def get_order_by(k, v):
-    key = parse_key_with_one_element(k)
+    return get_order_by_from_key(parse_key_with_one_element(k), v)
+
+
+def get_order_by_from_key(key, v):
     if key in ('asc', 'desc') and v not in ('asc', 'desc'):
         warnings.warn((
             "deprecated: replace order_by[%(key)s]=%(op)s by"
@@ -85,7 +135,9 @@ def deserialize_querystring(params=None):  # noqa C901
     value dict (filter_by).
     Item whose key starts with 'order_by[*' will be parse to a key, operator
     dict(order_by).
-    'limit' and 'offset' are kept as is.
+    'limit', 'offset' and 'cursor' are kept as is.
+    'include' is a comma separated list of the relationships to load.
+    'fields' is a comma separated list of the fields to serialize.
     All other keys are added to 'filter_by' with 'eq' as default operator.
 
     # TODO: Use marshmallow pre-validation feature
@@ -104,48 +156,48 @@ def deserialize_querystring(params=None):  # noqa C901
     context = {}
     limit = None
     offset = 0
-    for param in params.items():
-        k, v = param
-        # TODO  better regex or something?
-        if k.startswith("filter[") or k.startswith("~filter["):
-            key, op = parse_key_with_two_elements(k)
-            filter_by.append(dict(
-                key=key, op=op, value=v,
-                mode=("exclude" if k[0] == '~' else "include")))
-        elif k.startswith("primary-keys[") or k.startswith("~primary-keys["):
-            key = parse_key_with_one_element(k)
-            filter_by_primary_keys = deserialize_querystring_composite_filters(
-                key, None, v, mode=("exclude" if k[0] == '~' else "include"))
-        elif (
-            k.startswith("composite-filter[") or
-            k.startswith("~composite-filter[")
-        ):
-            key, op = parse_key_with_two_elements(k)
-            composite_filter_by.append(
-                deserialize_querystring_composite_filters(
-                    key, op, v, mode=("exclude" if k[0] == '~' else "include")
-                ))
-        elif k.startswith("context["):
-            key = parse_key_with_one_element(k)
-            context[key] = v
-        elif k == "tag":
-            tags.append(v)
-        elif k == "tags":
-            tags.extend(v.split(','))
-        elif k.startswith("order_by["):
-            # Ordering
-            order_by.append(get_order_by(k, v))
-        elif k == 'limit':
+    cursor = None
+    include = []
+    fields = []
+    for k, v in params.items():
+        if k == 'limit':
             # TODO check to allow positive integer only if value
             limit = int(v) if v else None
         elif k == 'offset':
             # TODO check to allow positive integer only
             offset = int(v)
+        elif k == 'cursor':
+            cursor = v
+        elif k == "tag":
+            tags.append(v)
+        elif k == "tags":
+            tags.extend(v.split(','))
+        elif k == 'include':
+            include.extend(x for x in v.split(',') if x)
+        elif k == 'fields':
+            fields.extend(x for x in v.split(',') if x)
         else:
-            raise KeyError('Bad querystring : %s=%s' % (k, v))
+            name, mode, key, op = tokenize_querystring_key(k)
+            if name == 'filter':
+                filter_by.append(dict(key=key, op=op, value=v, mode=mode))
+            elif name == 'composite-filter':
+                composite_filter_by.append(
+                    deserialize_querystring_composite_filters(
+                        key, op, v, mode=mode))
+            elif name == 'primary-keys':
+                filter_by_primary_keys = (
+                    deserialize_querystring_composite_filters(
+                        key, None, v, mode=mode))
+            elif name == 'context':
+                context[key] = v
+            elif name == 'order_by':
+                order_by.append(get_order_by_from_key(key, v))
+            else:
+                raise KeyError('Bad querystring : %s=%s' % (k, v))
 
     return dict(filter_by=filter_by, composite_filter_by=composite_filter_by,
-                order_by=order_by, limit=limit, offset=offset,
+                order_by=order_by, limit=limit, offset=offset, cursor=cursor,
+                include=include, fields=fields,
                 filter_by_primary_keys=filter_by_primary_keys,
                 tags=tags, context=context)
 
@@ -250,6 +302,14 @@ def collection_delete_validator(request, deserializer=None, klass=None,
         deserializer = extract_cstruct
 
     base = deserializer(request)
+    if (
+        getattr(klass, 'allow_collection_delete_by_filter', False) and
+        not base.get('body') and request.params
+    ):
+        # the entries to delete are found by the filters of the querystring
+        request.validated['body'] = []
+        return
+
     # validate the body
     model_name = klass.get_model_name(request, base)
     schema = klass.get_validator_schema(
@@ -36,6 +36,13 @@ test_requirements = [
     # TODO: put package test requirements here
 ]
 
+console_scripts = [
+    ('anyblok_rest_api_warm_up='
+     'anyblok_pyramid_rest_api.scripts:warm_up'),
+]
+bloks = [
+    'rest-api-job=anyblok_pyramid_rest_api.bloks.job:RestApiJob',
+]
 anyblok_pyramid_includeme = [
     'pyramid_cornice=anyblok_pyramid_rest_api.pyramid_config:pyramid_cornice',
 ]
@@ -50,6 +57,7 @@ test_bloks = [
     'test_rest_api_8=anyblok_pyramid_rest_api.test_bloks.test_8:TestBlok8',
     'test_rest_api_9=anyblok_pyramid_rest_api.test_bloks.test_9:TestBlok9',
     'test_rest_api_10=anyblok_pyramid_rest_api.test_bloks.test_10:TestBlok10',
+    'test_rest_api_11=anyblok_pyramid_rest_api.test_bloks.test_11:TestBlok11',
 ]
 
 setup(
@@ -62,6 +70,8 @@ setup(
     url='https://github.com/AnyBlok/anyblok-pyramid-rest-api',
     packages=find_packages(),
     entry_points={
+        'console_scripts': console_scripts,
+        'bloks': bloks,
         'anyblok_pyramid.includeme': anyblok_pyramid_includeme,
         'test_bloks': test_bloks,
     },